@@ -0,0 +1,68 @@
+"""
+Co-culture dFBA with fixed steps versus adaptive steps (community.CoCulture.StepControl):
+LP solves and largest biomass error against a fine fixed-step reference. Uses the
+prey model and a copy of it with the predation reactions as predator.
+"""
+
+import argparse
+import time
+
+import common
+import numpy as np
+from community.CoCulture import CoCulture, Predation, Species, StepControl
+from community.predation import add_predation
+
+MEDIUM = {"glc__D_e": 20.0, "o2_e": 15.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-b", "--biomass", default="BIOMASS_Ec_iML1515_core_75p37M")
+    parser.add_argument("-t", "--tf", type=float, default=10.0)
+    parser.add_argument("--reference", type=float, default=0.002, help="reference dt")
+    args = parser.parse_args()
+
+    prey = common.load_model(args.model)
+    predator = add_predation(prey.copy(), skip_missing=True)
+    community = CoCulture(
+        [
+            Species("prey", prey, args.biomass),
+            Species("pred", predator, args.biomass),
+        ],
+        initial_concentrations=MEDIUM,
+        predation=Predation("pred", "prey"),
+    )
+
+    reference = community.simulate(args.tf, args.reference)
+    grid = np.linspace(0, args.tf, 501)
+
+    def error(result):
+        return max(
+            np.max(
+                np.abs(
+                    np.interp(grid, result.time, result.biomass[:, i])
+                    - np.interp(grid, reference.time, reference.biomass[:, i])
+                )
+            )
+            for i in range(len(result.species))
+        )
+
+    runs = [(f"fixed dt={dt}", dict(dt=dt)) for dt in (0.5, 0.1, 0.02)]
+    runs += [
+        (f"adaptive rtol={rtol}", dict(dt=0.1, step_control=StepControl(rtol=rtol)))
+        for rtol in (0.2, 0.05, 0.01)
+    ]
+    print(f"reference dt={args.reference}: {reference.n_solves} solves")
+    for name, kwargs in runs:
+        start = time.perf_counter()
+        result = community.simulate(args.tf, **kwargs)
+        print(
+            f"{name:20s} steps {len(result.time) - 1:5d} | solves {result.n_solves:5d} | "
+            f"rejected {result.n_rejected:3d} | {time.perf_counter() - start:6.2f} s | "
+            f"max biomass error {error(result):.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-solve overhead of the solver backends. Solves the LP relaxation of the iMAT
+problem repeatedly, where file I/O, process start-up and model transfer dominate, and
+a small MILP (a subset of the classified reactions) under each backend.
+"""
+
+import argparse
+import time
+
+import common
+import pulp
+from methods.iMAT import iMAT
+from methods.SolverBackend import BACKENDS, SolverOptions
+
+
+def time_solves(solver, options, repeats, mip):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        solver.prob.solve(options.create(mip=mip))
+        times.append(time.perf_counter() - start)
+    return min(times), pulp.value(solver.prob.objective)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    parser.add_argument(
+        "--milpReactions",
+        type=int,
+        default=100,
+        help="classified reactions in the small MILP",
+    )
+    args = parser.parse_args()
+
+    model = common.load_model(args.model)
+    mapper, _ = common.synthetic_setup(model)
+    full = iMAT(
+        metabolicModel=model,
+        RH=mapper.RH,
+        RM=mapper.RM,
+        RL=mapper.RL,
+        epsilon=1.0,
+        oxygenLevel=None,
+    )
+    full.build_problem()
+    n = args.milpReactions // 2
+    small = iMAT(
+        metabolicModel=model,
+        RH=mapper.RH[:n],
+        RM=[],
+        RL=mapper.RL[:n],
+        epsilon=1.0,
+        oxygenLevel=None,
+    )
+    small.build_problem()
+
+    print(
+        f"{'backend':>8} {'LP relaxation [s]':>18} {'LP obj':>9} "
+        f"{'small MILP [s]':>15} {'MILP obj':>9}"
+    )
+    for backend in BACKENDS:
+        options = SolverOptions(backend=backend, msg=False)
+        try:
+            options.create()
+        except ValueError as e:
+            print(f"{backend:>8} skipped: {e}")
+            continue
+        t_lp, obj_lp = time_solves(full, options, args.repeats, mip=False)
+        t_milp, obj_milp = time_solves(small, options, args.repeats, mip=True)
+        print(
+            f"{backend:>8} {t_lp:>18.3f} {obj_lp:>9.1f} {t_milp:>15.3f} {obj_milp:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Build time of the iMAT/weighted_iMAT MILP: PuLP expressions (build_problem) versus the
+vectorized sparse builder (build_sparse_problem). Also checks that both give the same problem.
+"""
+
+import argparse
+import time
+
+import common
+from methods.iMAT import iMAT
+from methods.weighted_iMAT import weighted_iMAT
+from methods.SparseMILPBuilder import stoichiometric_matrix
+from problems import same_problem
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model = common.load_model(args.model)
+    mapper, result = common.synthetic_setup(model)
+    print(
+        f"{len(model.reactions)} reactions, {len(model.metabolites)} metabolites, "
+        f"RH={len(mapper.RH)} RM={len(mapper.RM)} RL={len(mapper.RL)}"
+    )
+    start = time.perf_counter()
+    stoichiometric_matrix(model)
+    print(f"one-off stoichiometric matrix extraction: {time.perf_counter() - start:.3f} s")
+
+    for cls in (iMAT, weighted_iMAT):
+        solver = cls(
+            metabolicModel=model,
+            RH=mapper.RH,
+            RM=mapper.RM,
+            RL=mapper.RL,
+            epsilon=1.0,
+            oxygenLevel=None,
+            **common.solver_kwargs(cls.__name__, mapper, result),
+        )
+        t_pulp = timed(solver.build_problem, args.repeats)
+        pulp_prob = solver.prob
+        t_sparse = timed(solver.build_sparse_problem, args.repeats)
+        print(
+            f"{cls.__name__:>14}: pulp {t_pulp:.3f} s | sparse {t_sparse:.3f} s | "
+            f"speed-up {t_pulp / t_sparse:.1f}x | same problem: "
+            f"{same_problem(pulp_prob, solver.prob)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
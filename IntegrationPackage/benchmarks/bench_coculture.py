@@ -0,0 +1,87 @@
+"""
+Co-culture dFBA: the notebook loop (cobra bounds, model.optimize and a dict
+environment per step) versus community.CoCulture. The M. xanthus model is not in the
+repository, a copy of the prey model with the predation reactions plays the predator.
+"""
+
+import argparse
+import time
+
+import common
+import numpy as np
+from community.CoCulture import CoCulture, Predation, Species
+from community.predation import add_predation
+
+MEDIUM = {"glc__D_e": 20.0, "o2_e": 15.0}
+
+
+def notebook_loop(prey, predator, biomass_id, n_steps, dt):
+    """Sequential loop of notebooks/compart_model.ipynb, with a proper mass balance"""
+    y = dict(MEDIUM)
+    b_prey, b_pred = 0.01, 0.01
+    for _ in range(n_steps):
+        fluxes, growth = {}, {}
+        for name, model, biomass in (("prey", prey, b_prey), ("pred", predator, b_pred)):
+            for met, c in y.items():
+                rct = model.reactions.get_by_id("EX_" + met)
+                rct.lower_bound = -10 * c / (5 + c)
+            if name == "pred":
+                model.reactions.EX_Biomass_e.lower_bound = -10 * b_prey / (5 + b_prey)
+            solution = model.optimize()
+            ok = solution.status == "optimal"
+            growth[name] = solution.fluxes[biomass_id] if ok else 0.0
+            fluxes[name] = solution.fluxes if ok else None
+            if ok:
+                for rct in model.exchanges:
+                    met = rct.id[3:]
+                    if met in y:
+                        y[met] = max(y[met] + solution.fluxes[rct.id] * biomass * dt, 0.0)
+        predation = fluxes["pred"]["EX_Biomass_e"] if fluxes["pred"] is not None else 0.0
+        b_prey, b_pred = (
+            max(b_prey + growth["prey"] * b_prey * dt + predation * b_pred * dt, 0.0),
+            b_pred + growth["pred"] * b_pred * dt,
+        )
+    return b_prey, b_pred
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-b", "--biomass", default="BIOMASS_Ec_iML1515_core_75p37M")
+    parser.add_argument("-t", "--tf", type=float, default=10.0)
+    parser.add_argument("--dt", type=float, default=0.1)
+    args = parser.parse_args()
+
+    prey = common.load_model(args.model)
+    predator = add_predation(prey.copy(), skip_missing=True)
+    n_steps = int(round(args.tf / args.dt))
+
+    start = time.perf_counter()
+    with prey, predator:
+        b_loop = notebook_loop(prey, predator, args.biomass, n_steps, args.dt)
+    t_loop = time.perf_counter() - start
+
+    community = CoCulture(
+        [
+            Species("prey", prey, args.biomass),
+            Species("pred", predator, args.biomass),
+        ],
+        initial_concentrations=MEDIUM,
+        predation=Predation("pred", "prey"),
+    )
+    start = time.perf_counter()
+    result = community.simulate(args.tf, args.dt)
+    t_engine = time.perf_counter() - start
+
+    print(
+        f"{n_steps} steps, 2 species: notebook loop {t_loop:.2f} s | "
+        f"CoCulture {t_engine:.2f} s | speed-up {t_loop / t_engine:.1f}x"
+    )
+    print(
+        f"final biomass loop {np.round(b_loop, 4)} | "
+        f"CoCulture {np.round(result.biomass[-1], 4)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
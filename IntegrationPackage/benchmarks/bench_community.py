@@ -0,0 +1,75 @@
+"""
+Community steady state in one merged LP (community.CommunityModel). Checks that a
+community of one species grows as fast as its FBA, then solves the predation
+scenario: maximal community growth rate by bisection, and abundances at fixed growth
+rates with one LP each, once more with a minimal predator abundance. The M. xanthus
+model is not in the repository, a copy of the prey model with the predation
+reactions and without glucose uptake plays the predator.
+"""
+
+import argparse
+import time
+
+import common
+from community.CoCulture import Predation, Species
+from community.CommunityModel import CommunityModel
+from community.predation import add_predation
+
+
+def rounded(abundance):
+    return {name: round(value, 4) for name, value in abundance.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-b", "--biomass", default="BIOMASS_Ec_iML1515_core_75p37M")
+    parser.add_argument("--glucose", type=float, default=10.0)
+    parser.add_argument("--minPredator", type=float, default=0.2)
+    args = parser.parse_args()
+
+    prey = common.load_model(args.model)
+    prey.reactions.EX_glc__D_e.lower_bound = -args.glucose
+    predator = add_predation(prey.copy(), skip_missing=True)
+    predator.reactions.EX_glc__D_e.bounds = (0.0, 0.0)
+
+    fba = prey.slim_optimize()
+    start = time.perf_counter()
+    single = CommunityModel([Species("prey", prey, args.biomass)]).optimize()
+    print(
+        f"one species: FBA {fba:.6f} | community {single.growth_rate:.6f} "
+        f"({single.n_solves} LPs, {time.perf_counter() - start:.2f} s)"
+    )
+
+    for min_abundance in (None, {"pred": args.minPredator}):
+        start = time.perf_counter()
+        community = CommunityModel(
+            [
+                Species("prey", prey, args.biomass),
+                Species("pred", predator, args.biomass),
+            ],
+            predation=Predation("pred", "prey"),
+            min_abundance=min_abundance,
+        )
+        t_build = time.perf_counter() - start
+        start = time.perf_counter()
+        result = community.optimize()
+        print(
+            f"predation, min. abundance {min_abundance}, {community.shape[0]} rows x "
+            f"{community.shape[1]} columns (built in {t_build:.2f} s): growth "
+            f"{result.growth_rate:.6f}, abundance {rounded(result.abundance)}, "
+            f"predation {result.predation_flux:.4f} "
+            f"({result.n_solves} LPs, {time.perf_counter() - start:.2f} s)"
+        )
+        for growth_rate in (0.25 * result.growth_rate, 0.5 * result.growth_rate):
+            start = time.perf_counter()
+            fixed = community.solve(growth_rate)
+            print(
+                f"  at growth {growth_rate:.4f}: {fixed.status}, abundance "
+                f"{rounded(fixed.abundance)}, predation {fixed.predation_flux:.4f} "
+                f"({time.perf_counter() - start:.2f} s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Time to get the model-aligned expression columns of a DE table: the former per-gene
+alignment loop (file read again per column, as generate_RNASeqDf changed its input)
+versus one vectorized alignment of all columns and the expression cache. There is no
+M. xanthus model in this repository, the benchmark builds one reaction per three
+MXAN genes of the file.
+"""
+
+import argparse
+import tempfile
+import time
+
+import common  # noqa: F401 (import path)
+import numpy as np
+import pandas as pd
+from cobra import Model, Reaction
+from utils.ExpressionCache import ExpressionCache, read_aligned_expression
+from utils.read_file import sniff_format
+
+COLUMNS = ["baseMean", "log2FoldChange", "lfcSE", "stat", "pvalue", "padj"]
+
+
+def legacy_align(metabolicModel, expression_df, geneColName, expressionColName):
+    """
+    generate_RNASeqDf before the vectorized alignment
+    """
+    expression_df.set_index(geneColName, inplace=True)
+    genes = []
+    missingGenes = []
+    for g in metabolicModel.genes:
+        if not g.id.startswith("MXAN"):
+            continue
+        (genes if g.id in expression_df.index else missingGenes).append(g.id)
+    expression_df = expression_df.loc[genes, [expressionColName]]
+    new_entries = pd.DataFrame(index=missingGenes, columns=[expressionColName])
+    return pd.concat([expression_df, new_entries])
+
+
+def mxan_model(path, geneColName):
+    sep, decimal = sniff_format(path)
+    ids = pd.read_csv(path, sep=sep, decimal=decimal)[geneColName].dropna()
+    ids = ids[ids.str.startswith("MXAN")].tolist()
+    model = Model("mxan")
+    reactions = [Reaction(f"R{i}") for i in range(0, len(ids), 3)]
+    model.add_reactions(reactions)
+    for k, rct in enumerate(reactions):
+        rct.gene_reaction_rule = " or ".join(ids[3 * k : 3 * k + 3])
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-f", "--expressionFile", default="data/RNA_seq_DE_result/M1_vs_Ecol.csv"
+    )
+    parser.add_argument("-g", "--geneColName", default="orgdb_old_MXAN")
+    args = parser.parse_args()
+
+    model = mxan_model(args.expressionFile, args.geneColName)
+    sep, decimal = sniff_format(args.expressionFile)
+    print(f"{len(model.genes)} genes, {len(COLUMNS)} columns")
+
+    start = time.perf_counter()
+    legacy = {}
+    for col in COLUMNS:
+        df = pd.read_csv(args.expressionFile, sep=sep, decimal=decimal)
+        legacy[col] = legacy_align(model, df, args.geneColName, col)
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    aligned = read_aligned_expression(
+        args.expressionFile, model, args.geneColName, COLUMNS
+    )
+    t_vector = time.perf_counter() - start
+
+    cache = ExpressionCache(cache_dir=tempfile.mkdtemp())
+    cache.load(args.expressionFile, model, args.geneColName, COLUMNS)
+    start = time.perf_counter()
+    cache.load(args.expressionFile, model, args.geneColName, COLUMNS)
+    t_cache = time.perf_counter() - start
+
+    same = all(
+        legacy[col].index.equals(aligned.index)
+        and np.allclose(
+            legacy[col][col].astype(float), aligned[col], equal_nan=True
+        )
+        for col in COLUMNS
+    )
+    print(
+        f"per column loop {t_legacy:.3f} s | vectorized {t_vector:.3f} s | "
+        f"cached {t_cache:.4f} s | same values: {same}"
+    )
+
+
+if __name__ == "__main__":
+    main()
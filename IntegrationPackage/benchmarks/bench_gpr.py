@@ -0,0 +1,80 @@
+"""
+GPR evaluation: per-reaction GPR parsing/evaluation (the former GPRMapper path, still
+used by get_reaction_expression) versus the compiled rules cached per model.
+Also checks that both give the same classes and scores.
+"""
+
+import argparse
+import time
+
+import common
+import numpy as np
+from cobra.core.gene import GPR
+from utils.GPRMapper import GPRMapper, compile_gprs
+
+
+def classes_per_reaction(mapper):
+    """The former create_reaction_classes: three cobra GPR evaluations per reaction"""
+    df = mapper.expression_df
+    active = df.index[df["discretization"] == 1].tolist()
+    inactive = df.index[df["discretization"] == -1].tolist()
+    moderate = df.index[df["discretization"] == 0].tolist()
+    RL, RM, RH = [], [], []
+    for rct in mapper.metabolicModel.reactions:
+        gpr = GPR().from_string(mapper._filter_gpr(str(rct.gpr)))
+        if not gpr.eval(inactive):
+            RL.append(rct.id)
+        elif not gpr.eval(inactive + moderate):
+            RM.append(rct.id)
+        elif not gpr.eval(active + moderate + inactive):
+            RH.append(rct.id)
+    return RL, RM, RH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-s", "--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    model = common.load_model(args.model)
+    start = time.perf_counter()
+    compile_gprs(model, ignore_human=True)
+    print(
+        f"{len(model.reactions)} reactions, one-off compilation: "
+        f"{time.perf_counter() - start:.3f} s"
+    )
+
+    t_old, t_new, same = 0.0, 0.0, True
+    for seed in range(args.samples):
+        _, result = common.synthetic_setup(model, seed=seed)
+        mapper = GPRMapper(model, result.dataframe, ignore_human=True)
+
+        start = time.perf_counter()
+        RL, RM, RH = classes_per_reaction(mapper)
+        scores = {
+            rid: mapper.get_reaction_expression(
+                str(model.reactions.get_by_id(rid).gpr)
+            )
+            for rid in RH + RM
+        }
+        t_old += time.perf_counter() - start
+
+        start = time.perf_counter()
+        classes = mapper.create_reaction_classes()
+        expressions = mapper.reaction_expressions()
+        t_new += time.perf_counter() - start
+
+        same &= (classes.RL, classes.RM, classes.RH) == (RL, RM, RH)
+        same &= all(np.isclose(scores[rid], expressions[rid]) for rid in scores)
+
+    print(
+        f"classes + scores per expression column: per reaction "
+        f"{t_old / args.samples * 1e3:.1f} ms | compiled "
+        f"{t_new / args.samples * 1e3:.2f} ms | speed-up {t_old / t_new:.0f}x | "
+        f"same result: {same}"
+    )
+
+
+if __name__ == "__main__":
+    main()
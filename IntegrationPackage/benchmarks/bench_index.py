@@ -0,0 +1,112 @@
+"""
+Time of the binary variables and rH/rL constraints of the iMAT/weighted_iMAT MILP
+(the part of build_problem after the mass balance) with the former builders (two
+reactions.get_by_id per reaction, membership tests in concatenated class lists)
+versus the reaction index (utils.ReactionIndex). Also checks that both give the
+same problem.
+"""
+
+import argparse
+import time
+
+import common
+import pulp
+from methods.BasePulpVarConfig import BasePulpVarConfig
+from methods.iMAT import iMAT
+from methods.weighted_iMAT import weighted_iMAT
+from problems import pulp_rows, same_row
+
+
+def legacy_constraints(solver):
+    """
+    Binaries, constraints and objective as before the reaction index
+    """
+    weighted = isinstance(solver, weighted_iMAT)
+    if weighted:
+        solver._create_weight_variables()
+    classified = solver.RH + solver.RM + solver.RL if weighted else solver.RH + solver.RL
+    solver.y_vars = {}
+    for rid in classified:
+        y_tot = pulp.LpVariable(f"y_tot_{rid}", cat="Binary")
+        y_f = pulp.LpVariable(f"yf_{rid}", cat="Binary")
+        y_r = pulp.LpVariable(f"yr_{rid}", cat="Binary")
+        solver.prob += y_tot == y_f + y_r, f"y_tot_def_{rid}"
+        solver.y_vars[rid] = (y_tot, y_f, y_r)
+    for rid in classified:
+        v = solver.v_vars[rid]
+        lb = solver.metabolicModel.reactions.get_by_id(rid).lower_bound
+        ub = solver.metabolicModel.reactions.get_by_id(rid).upper_bound
+        y_f = solver.y_vars[rid][1]
+        y_r = solver.y_vars[rid][2]
+        if rid in (solver.RH + solver.RM if weighted else solver.RH):
+            solver.prob += v + y_f * (lb - solver.epsilon) >= lb, f"rH_forward_{rid}"
+            solver.prob += v + y_r * (ub + solver.epsilon) <= ub, f"rH_reverse_{rid}"
+        else:
+            prefix = solver._inactive_prefix
+            solver.prob += lb * (1 - y_f) <= v, f"{prefix}leftHandSide_{rid}"
+            solver.prob += v <= (1 - y_f) * ub, f"{prefix}rightHandSide_{rid}"
+    solver._add_objective_function()
+
+
+def indexed_constraints(solver):
+    if isinstance(solver, weighted_iMAT):
+        solver._create_weight_variables()
+        solver._create_binary_variables()
+        solver._add_weighted_iMAT_constraints()
+    else:
+        solver._create_binary_variables()
+        solver._add_iMAT_constraints()
+    solver._add_objective_function()
+
+
+def timed_constraints(solver, build, repeats):
+    """
+    Fastest of repeats builds, each on a new mass balance skeleton
+    """
+    times = []
+    for _ in range(repeats):
+        BasePulpVarConfig.build_problem(solver)
+        start = time.perf_counter()
+        build(solver)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model = common.load_model(args.model)
+    mapper, result = common.synthetic_setup(model)
+    print(
+        f"{len(model.reactions)} reactions, "
+        f"RH={len(mapper.RH)} RM={len(mapper.RM)} RL={len(mapper.RL)}"
+    )
+    for cls in (iMAT, weighted_iMAT):
+        solver = cls(
+            metabolicModel=model,
+            RH=mapper.RH,
+            RM=mapper.RM,
+            RL=mapper.RL,
+            epsilon=1.0,
+            oxygenLevel=None,
+            reaction_index=mapper.classes.index,
+            **common.solver_kwargs(cls.__name__, mapper, result),
+        )
+        t_legacy = timed_constraints(solver, legacy_constraints, args.repeats)
+        legacy = pulp_rows(solver.prob)
+        t_index = timed_constraints(solver, indexed_constraints, args.repeats)
+        current = pulp_rows(solver.prob)
+        same = legacy.keys() == current.keys() and all(
+            same_row(legacy[k], current[k]) for k in legacy
+        )
+        print(
+            f"{cls.__name__:>14}: before {t_legacy:.3f} s | reaction index "
+            f"{t_index:.3f} s | speed-up {t_legacy / t_index:.1f}x | same problem: {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Time-to-target-gap of an epsilon/quantile sweep with and without MIP starts from the
+nearest solved neighbour. Both runs use the resident problem and the same solve order.
+"""
+
+import argparse
+import itertools
+import time
+
+import common
+import pulp
+from methods.iMAT import iMAT
+from methods.weighted_iMAT import weighted_iMAT
+from utils.order_grid import order_grid, nearest_point
+
+
+def sweep(model, method, points, warm, gap, time_limit):
+    solver = None
+    solutions = {}
+    rows = []
+    for epsilon, quantiles in points:
+        mapper, result = common.synthetic_setup(model, quantiles)
+        kwargs = common.solver_kwargs(method.__name__, mapper, result)
+        if solver is None:
+            solver = method(
+                metabolicModel=model,
+                RH=mapper.RH,
+                RM=mapper.RM,
+                RL=mapper.RL,
+                epsilon=epsilon,
+                oxygenLevel=None,
+                **kwargs,
+            )
+            solver.build_resident_problem()
+        else:
+            solver.update_parameters(
+                RH=mapper.RH, RM=mapper.RM, RL=mapper.RL, epsilon=epsilon, **kwargs
+            )
+        neighbour = nearest_point((epsilon, quantiles), list(solutions))
+        start = solutions.get(neighbour) if warm else None
+        cbc = pulp.PULP_CBC_CMD(
+            msg=0, gapRel=gap, timeLimit=time_limit, warmStart=start is not None
+        )
+        t = time.perf_counter()
+        _, fluxes, y_values, _ = solver.solve(cbc, warm_start=start)
+        elapsed = time.perf_counter() - t
+        rows.append((epsilon, quantiles, elapsed, pulp.value(solver.prob.objective)))
+        solutions[(epsilon, quantiles)] = (fluxes, y_values)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-m", "--model", default="E_coli_model.json")
+    parser.add_argument("--method", choices=["iMAT", "weighted_iMAT"], default="iMAT")
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.1, 1.0])
+    parser.add_argument(
+        "--quantiles", nargs="+", default=["40,70", "40,75", "45,75"], help="qL,qH pairs"
+    )
+    parser.add_argument("--gap", type=float, default=0.05)
+    parser.add_argument("--time-limit", type=float, default=60)
+    args = parser.parse_args()
+
+    model = common.load_model(args.model)
+    method = {"iMAT": iMAT, "weighted_iMAT": weighted_iMAT}[args.method]
+    quantiles = [tuple(int(q) for q in pair.split(",")) for pair in args.quantiles]
+    points = order_grid(list(itertools.product(args.epsilons, quantiles)))
+
+    results = {}
+    for warm in (False, True):
+        results[warm] = sweep(model, method, points, warm, args.gap, args.time_limit)
+
+    print(
+        f"{'epsilon':>8} {'quantiles':>10} {'cold [s]':>9} {'warm [s]':>9} "
+        f"{'cold obj':>9} {'warm obj':>9}"
+    )
+    for (eps, q, t_cold, o_cold), (_, _, t_warm, o_warm) in zip(results[False], results[True]):
+        print(
+            f"{eps:>8} {str(q):>10} {t_cold:>9.1f} {t_warm:>9.1f} "
+            f"{o_cold:>9.1f} {o_warm:>9.1f}"
+        )
+    total_cold = sum(r[2] for r in results[False])
+    total_warm = sum(r[2] for r in results[True])
+    print(f"total: cold {total_cold:.1f} s, warm {total_warm:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
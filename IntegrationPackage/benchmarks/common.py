@@ -0,0 +1,50 @@
+"""
+Shared setup for the benchmark scripts. Run the scripts from the repository root, e.g.
+
+    python IntegrationPackage/benchmarks/bench_build.py -m E_coli_model.json
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# problem comparison shared with the tests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+
+import numpy as np
+import pandas as pd
+from utils.Discretizer import Discretizer
+from utils.GPRMapper import GPRMapper
+from utils.ModelLoader import read_model
+
+
+def load_model(path: str):
+    return read_model(path)
+
+
+def synthetic_setup(model, quantiles=(40, 70), seed: int = 0):
+    """
+    Discretizes a reproducible log-normal expression vector over all model genes and
+    classifies the reactions. Returns (gpr_mapper, discretization_result).
+    The E. coli model has no matching RNA-seq data in this repository.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {"expression": rng.lognormal(3, 2, len(model.genes))},
+        index=[g.id for g in model.genes],
+    )
+    result = Discretizer("quantile", list(quantiles)).run(df)
+    mapper = GPRMapper(model, result.dataframe, ignore_human=True)
+    mapper.create_reaction_classes()
+    return mapper, result
+
+
+def solver_kwargs(method: str, mapper, result):
+    kwargs = {}
+    if method == "weighted_iMAT":
+        kwargs = dict(
+            gpr_mapper=mapper,
+            lower_threshold_scaled=result.scaled_thresholds[0],
+            upper_threshold_scaled=result.scaled_thresholds[1],
+        )
+    return kwargs
@@ -1,4 +1,6 @@
 import argparse
+from pathlib import Path
+from methods.SolverBackend import BACKENDS
 
 
 def build_parser():
@@ -6,7 +8,9 @@ def build_parser():
     subparser = parser.add_subparsers(
         dest="method",
         required=True,
-        help="Chose integration method. Following are available: iMAT, weighted_iMAT",
+        help="Chose integration method. Following are available: iMAT, weighted_iMAT, "
+        "sweep (sensitivity analysis), export (parquet results to tsv), "
+        "screen (knockout screen)",
     )
 
     # iMAT
@@ -21,6 +25,146 @@ def build_parser():
     add_shared_args(weighted_imat_parser)
     add_iMAT_shared_args(weighted_imat_parser)
 
+    # sensitivity analysis
+    sweep_parser = subparser.add_parser(
+        "sweep", help="Run a sensitivity analysis on a process pool"
+    )
+    sweep_parser.add_argument(
+        "-c",
+        "--config",
+        type=str,
+        default=str(Path(__file__).parent / "conf" / "SensAnalysis.py"),
+        help="Path to the sensitivity analysis config (default: conf/SensAnalysis.py)",
+    )
+    sweep_parser.add_argument(
+        "-n",
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of worker processes, overrides num_processes of the config. "
+        "Default: the available cores are split into workers and threads",
+    )
+    sweep_parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="Output directory, overrides outputDir of the config",
+    )
+    sweep_parser.add_argument(
+        "--noResume",
+        action="store_true",
+        help="Run all tasks, also those already recorded in "
+        "<output>/sweep_manifest.tsv",
+    )
+    sweep_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile every task, writes <output>/profile.jsonl and the summary "
+        "<output>/profile_summary.tsv (also profile = True in the config)",
+    )
+    sweep_parser.add_argument(
+        "--timeLimit",
+        type=float,
+        default=None,
+        help="Time limit per solve in seconds, overrides time_limit of the config",
+    )
+    sweep_parser.add_argument(
+        "--mipGap",
+        type=float,
+        default=None,
+        help="Relative MIP gap at which the solver stops, overrides mip_gap of the "
+        "config",
+    )
+    sweep_parser.add_argument(
+        "--nodeLimit",
+        type=int,
+        default=None,
+        help="Maximal number of branch-and-bound nodes per solve, overrides "
+        "node_limit of the config",
+    )
+    sweep_parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Solver threads per worker, overrides threads of the config. Default: "
+        "the available cores are split into workers and threads",
+    )
+    sweep_parser.add_argument(
+        "--budgetRounds",
+        type=int,
+        default=None,
+        help="Number of times tasks stopped by the time or node limit are run again "
+        "with larger limits, overrides budget_rounds of the config (default: 1)",
+    )
+
+    # parquet result store to tsv files
+    export_parser = subparser.add_parser(
+        "export", help="Export a parquet result store to tsv files"
+    )
+    export_parser.add_argument(
+        "-r",
+        "--results",
+        type=str,
+        required=True,
+        help="Directory of the result store, e.g. <sweep output>/results",
+    )
+    export_parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        required=True,
+        help="Output directory, files are written to output/method/cell_type/",
+    )
+
+    # combinatorial knockout screen
+    screen_parser = subparser.add_parser(
+        "screen", help="Screen pairs (or triples) of reaction knockouts for growth"
+    )
+    screen_parser.add_argument(
+        "-m", "--model", required=True, type=str, help="Path to cobra.Model file"
+    )
+    screen_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Output directory for knockout_screen.tsv and no_solution.txt",
+    )
+    screen_parser.add_argument(
+        "-r",
+        "--reactions",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Reactions to knock out, default all exchange reactions",
+    )
+    screen_parser.add_argument(
+        "-k",
+        "--maxSize",
+        type=int,
+        default=2,
+        help="Largest number of knockouts per combination, 3 for triples (default: 2)",
+    )
+    screen_parser.add_argument(
+        "--minGrowth",
+        type=float,
+        default=1e-6,
+        help="Smallest objective value of a viable combination (default: 1e-6)",
+    )
+    screen_parser.add_argument(
+        "-n",
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of worker processes, default the available cores",
+    )
+    screen_parser.add_argument(
+        "--noModelCache",
+        action="store_true",
+        help="Parse the model file instead of loading the cached snapshot",
+    )
+
     return parser
 
 
@@ -46,9 +190,30 @@ def add_shared_args(p):
         type=str,
         help="Column name containing expression values",
     )
+    p.add_argument(
+        "--idColNames",
+        nargs="+",
+        default=None,
+        help="Further gene id columns of the expression file (e.g. Gene_name GeneID). "
+        "With --geneColName they form the id mapping table for gene ids that differ "
+        "from the model",
+    )
     p.add_argument(
         "-m", "--model", required=True, type=str, help="Path to cobra.Model file"
     )
+    p.add_argument(
+        "--noModelCache",
+        action="store_true",
+        help="Parse the model file instead of loading the cached snapshot "
+        "(cache directory: $INTEGRATION_MODEL_CACHE or ~/.cache/IntegrationPackage/models)",
+    )
+    p.add_argument(
+        "--noExpressionCache",
+        action="store_true",
+        help="Read the expression file instead of loading the cached model-aligned table "
+        "(cache directory: $INTEGRATION_EXPRESSION_CACHE or "
+        "~/.cache/IntegrationPackage/expression)",
+    )
     p.add_argument(
         "-o",
         "--output",
@@ -94,3 +259,96 @@ def add_iMAT_shared_args(p):
         default=None,
         help="Value for oxygen exchange reaction EX_o2_e",
     )
+    p.add_argument(
+        "-b",
+        "--builder",
+        choices=["pulp", "sparse"],
+        type=str,
+        default="pulp",
+        help="Problem builder: pulp (PuLP expressions, solved with CBC) or sparse "
+        "(vectorized sparse matrices, solved in-process with HiGHS). Default: pulp",
+    )
+    p.add_argument(
+        "--reduce",
+        action="store_true",
+        help="Reduce the problem before solving (pulp builder): leaves out blocked "
+        "reactions (cached per model) and binaries that can not be 1 or do not "
+        "change the objective",
+    )
+    p.add_argument(
+        "-s",
+        "--solver",
+        choices=BACKENDS,
+        type=str,
+        default="cbc",
+        help="MILP solver backend: cbc (subprocess), highs (in-process, needs highspy) "
+        "or glpk (in-process). Default: cbc",
+    )
+    p.add_argument(
+        "--timeLimit",
+        type=float,
+        default=None,
+        help="Time limit per solve in seconds",
+    )
+    p.add_argument(
+        "--mipGap",
+        type=float,
+        default=None,
+        help="Relative MIP gap at which the solver stops, e.g. 0.01",
+    )
+    p.add_argument(
+        "--nodeLimit",
+        type=int,
+        default=None,
+        help="Maximal number of branch-and-bound nodes per solve (cbc and highs). "
+        "A solve stopped by the time or node limit writes its best solution",
+    )
+    p.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of solver threads (cbc and highs)",
+    )
+    p.add_argument(
+        "--poolSize",
+        type=int,
+        default=1,
+        help="Number of alternative optimal solutions to enumerate with integer cuts "
+        "(pulp builder only). With more than 1 the reaction activity frequencies "
+        "over the pool are written to <result>_pool.tsv. Default: 1",
+    )
+    p.add_argument(
+        "--poolGap",
+        type=float,
+        default=0.0,
+        help="Relative distance to the optimum of the pool solutions, e.g. 0.01 "
+        "(default: 0, only optimal solutions)",
+    )
+    p.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="FILE",
+        help="Time the pipeline stages and count problem size, solver nodes and MIP "
+        "gap. The profile is printed as JSON, or appended as JSON line to FILE",
+    )
+    p.add_argument(
+        "--noSolutionCache",
+        action="store_true",
+        help="Solve the problem even if one with the same model, method, epsilon, "
+        "reaction classes and oxygen level was solved before (cache directory: "
+        "$INTEGRATION_SOLUTION_CACHE or ~/.cache/IntegrationPackage/solutions)",
+    )
+    p.add_argument(
+        "--noPrecheck",
+        action="store_true",
+        help="Solve the MILP without checking the flux bounds for feasibility first",
+    )
+    p.add_argument(
+        "--precheckRelaxation",
+        action="store_true",
+        help="Also solve the LP relaxation before the MILP. Only needed for problems "
+        "with constraints beyond the flux bounds: otherwise the relaxation is "
+        "feasible whenever the bounds are",
+    )
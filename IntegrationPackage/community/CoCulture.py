@@ -0,0 +1,639 @@
+"""
+Dynamic FBA of a co-culture in a shared environment (e.g. E. coli prey and
+M. xanthus predator), replacing the simulation loop of notebooks/compart_model.ipynb.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from cobra import Model
+
+# Fluxes closer than this to a bound are at the bound, about the feasibility
+# tolerance of the solvers
+TOLERANCE = 1e-6
+
+
+@dataclass
+class Species:
+    """
+    name: Name of the species
+    model: cobra.Model, its bounds define the medium (closed exchanges stay closed)
+    biomass_reaction: Id of the growth reaction
+    initial_biomass: Biomass at t = 0 (gDW/L)
+    vmax, km: Michaelis-Menten uptake of the limited metabolites,
+        lower bound = -vmax * c / (km + c)
+    """
+
+    name: str
+    model: Model
+    biomass_reaction: str
+    initial_biomass: float = 0.01
+    vmax: float = 10.0
+    km: float = 5.0
+
+
+@dataclass
+class Predation:
+    """
+    The predator takes up prey biomass through an exchange reaction
+    (see community.predation.add_predation). Its uptake is limited by the prey biomass
+    like a metabolite, and the uptake flux times the predator biomass is removed
+    from the prey.
+
+    predator, prey: Species names
+    exchange: Biomass exchange reaction of the predator model
+    """
+
+    predator: str
+    prey: str
+    exchange: str = "EX_Biomass_e"
+    vmax: float = 10.0
+    km: float = 5.0
+
+
+@dataclass
+class StepControl:
+    """
+    Adaptive step size of CoCulture.simulate. A step ends at the depletion of a
+    metabolite instead of clamping it to 0 afterwards, and the values
+    acting on the bounds (limited metabolites, prey biomass) change by at most
+    rtol * value + atol per step. While the active exchanges stay the same the step
+    grows by the factor grow, up to dt_max. A step after which the set of active
+    exchanges changed is repeated with half the size, down to dt_min.
+
+    dt_min, dt_max: Limits of the step size (h)
+    rtol, atol: Allowed relative and absolute change per step
+    grow: Growth factor of the step size
+    switch_tol: Fluxes below this count as inactive when comparing active exchanges
+    """
+
+    dt_min: float = 1e-2
+    dt_max: float = 1.0
+    rtol: float = 0.05
+    atol: float = 1e-3
+    grow: float = 1.5
+    switch_tol: float = 1e-3
+
+
+@dataclass
+class CoCultureResult:
+    """
+    Trajectories of a simulation, rows are time points.
+
+    time: (steps + 1)
+    biomass: (steps + 1, species)
+    concentrations: (steps + 1, metabolites) environment, in metabolite_ids order
+    growth_rates: (steps, species) growth flux of each step
+    exchange_fluxes: species name -> (steps, exchanges) fluxes of exchange_ids[name]
+    fluxes: species name -> (steps, reactions) all fluxes, if recorded
+    n_solves: Number of LP solves, solutions that stayed optimal are reused
+    n_rejected: Number of repeated steps (adaptive step size)
+    """
+
+    species: List[str]
+    metabolite_ids: List[str]
+    exchange_ids: Dict[str, List[str]]
+    time: np.ndarray
+    biomass: np.ndarray
+    concentrations: np.ndarray
+    growth_rates: np.ndarray
+    exchange_fluxes: Dict[str, np.ndarray]
+    fluxes: Dict[str, np.ndarray] = field(default_factory=dict)
+    n_solves: int = 0
+    n_rejected: int = 0
+
+    def biomass_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.biomass, index=self.time, columns=self.species)
+
+    def concentration_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.concentrations, index=self.time, columns=self.metabolite_ids
+        )
+
+    def exchange_frame(self, species: str) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.exchange_fluxes[species],
+            index=self.time[1:],
+            columns=self.exchange_ids[species],
+        )
+
+
+@dataclass
+class _Solution:
+    growth: float
+    exchange_fluxes: np.ndarray
+    predation_flux: float = 0.0
+    fluxes: Optional[np.ndarray] = None
+    # nan if the species was not solved (no biomass, infeasible)
+    objective: float = np.nan
+
+
+class _SpeciesLP:
+    """
+    Solver side of one species: exchange variables, their environment indices, the
+    bounds currently set on the solver and the last optimal solution.
+    """
+
+    def __init__(
+        self,
+        species: Species,
+        env_index: Dict[str, int],
+        limited,
+        exclude,
+        predation: Optional[Predation] = None,
+    ):
+        model = species.model
+        self.species = species
+        self.model = model
+        self.exchanges = [rct for rct in model.exchanges if rct.id not in exclude]
+        self.exchange_ids = [rct.id for rct in self.exchanges]
+        self.env = np.array(
+            [env_index[_exchange_metabolite(rct)] for rct in self.exchanges], dtype=int
+        )
+        self.limited = np.array(
+            [_exchange_metabolite(rct) in limited for rct in self.exchanges], dtype=bool
+        )
+        self.model_lb = np.array([rct.lower_bound for rct in self.exchanges])
+        self.model_ub = np.array([rct.upper_bound for rct in self.exchanges])
+        self.forward = [rct.forward_variable for rct in self.exchanges]
+        self.reverse = [rct.reverse_variable for rct in self.exchanges]
+        self.lb = self.model_lb.copy()
+
+        # predator only: uptake of prey biomass
+        self.predation = predation
+        self.predation_reaction = (
+            model.reactions.get_by_id(predation.exchange) if predation else None
+        )
+        self.predation_lb = (
+            self.predation_reaction.lower_bound if predation else None
+        )
+
+        # variable names of (biomass, exchanges, predation), read at once after a solve
+        reactions = [model.reactions.get_by_id(species.biomass_reaction)]
+        reactions += self.exchanges
+        if predation:
+            reactions.append(self.predation_reaction)
+        self.forward_names = [rct.forward_variable.name for rct in reactions]
+        self.reverse_names = [rct.reverse_variable.name for rct in reactions]
+
+        self.solution: Optional[_Solution] = None
+        self.n_solves = 0
+
+    def set_bounds(self, concentrations: np.ndarray, prey_biomass: float = 0.0):
+        """
+        Sets the Michaelis-Menten lower bounds of the limited exchanges (and of the
+        predation exchange), only bounds that changed are passed to the solver.
+        The last solution stays optimal if every changed bound was inactive before
+        and after the change, otherwise it is dropped.
+        """
+        c = np.maximum(concentrations[self.env], 0.0)
+        kinetic = -self.species.vmax * c / (self.species.km + c)
+        lb = np.where(self.limited, np.maximum(self.model_lb, kinetic), self.model_lb)
+        changed = np.flatnonzero(lb != self.lb)
+        for j in changed:
+            _set_reaction_bounds(self.forward[j], self.reverse[j], lb[j], self.model_ub[j])
+        if self.solution is not None and np.any(
+            self.solution.exchange_fluxes[changed]
+            <= np.maximum(self.lb[changed], lb[changed]) + TOLERANCE
+        ):
+            self.solution = None
+        self.lb = lb
+
+        if self.predation is not None:
+            p, rct = self.predation, self.predation_reaction
+            lb = max(rct.lower_bound, -p.vmax * prey_biomass / (p.km + prey_biomass))
+            if lb != self.predation_lb:
+                _set_reaction_bounds(
+                    rct.forward_variable, rct.reverse_variable, lb, rct.upper_bound
+                )
+                if (
+                    self.solution is not None
+                    and self.solution.predation_flux
+                    <= max(lb, self.predation_lb) + TOLERANCE
+                ):
+                    self.solution = None
+                self.predation_lb = lb
+
+    def solve(self, record: bool = False) -> _Solution:
+        """
+        Returns the last solution if it is still optimal, otherwise solves the LP
+        (warm started from the current basis). Infeasible problems give zero fluxes.
+
+        :param record: Also read all fluxes
+        """
+        if self.solution is not None and (not record or self.solution.fluxes is not None):
+            return self.solution
+        objective = self.model.slim_optimize(error_value=np.nan)
+        self.n_solves += 1
+        if self.model.solver.status != "optimal":
+            self.solution = None
+            return self.zero_solution(record)
+
+        primal = self.model.solver.primal_values
+        fluxes = np.array([primal[f] for f in self.forward_names]) - np.array(
+            [primal[r] for r in self.reverse_names]
+        )
+        n = len(self.exchanges)
+        self.solution = _Solution(
+            growth=fluxes[0],
+            exchange_fluxes=fluxes[1 : n + 1],
+            predation_flux=fluxes[n + 1] if self.predation else 0.0,
+            fluxes=self.all_fluxes(primal) if record else None,
+            objective=objective,
+        )
+        return self.solution
+
+    def zero_solution(self, record: bool = False) -> _Solution:
+        return _Solution(
+            growth=0.0,
+            exchange_fluxes=np.zeros(len(self.exchanges)),
+            fluxes=np.zeros(len(self.model.reactions)) if record else None,
+        )
+
+    def all_fluxes(self, primal) -> np.ndarray:
+        return np.array(
+            [
+                primal[rct.forward_variable.name] - primal[rct.reverse_variable.name]
+                for rct in self.model.reactions
+            ]
+        )
+
+    def restore(self):
+        """
+        Puts the bounds of the cobra reactions back on the solver
+        """
+        for rct in self.exchanges:
+            rct.bounds = rct.bounds
+        if self.predation_reaction is not None:
+            rct = self.predation_reaction
+            rct.bounds = rct.bounds
+
+
+def _exchange_metabolite(rct) -> str:
+    return next(iter(rct.metabolites)).id
+
+
+def _set_reaction_bounds(forward, reverse, lb: float, ub: float):
+    # same split into forward and reverse variable as cobra.Reaction.bounds
+    forward.set_bounds(lb=max(lb, 0.0), ub=max(ub, 0.0))
+    reverse.set_bounds(lb=max(-ub, 0.0), ub=max(-lb, 0.0))
+
+
+def _active_set(lps: List[_SpeciesLP], solutions: List[_Solution], tol) -> np.ndarray:
+    """
+    Direction (-1, 0, 1) of growth, predation and the limited exchanges
+    """
+    values = np.concatenate(
+        [[s.growth, s.predation_flux] for s in solutions]
+        + [s.exchange_fluxes[lp.limited] for lp, s in zip(lps, solutions)]
+    )
+    return np.sign(values) * (np.abs(values) > tol)
+
+
+class _Trajectory:
+    """
+    Arrays of a simulation, the capacity doubles when they are full
+    """
+
+    def __init__(self, lps: List[_SpeciesLP], n_metabolites: int, steps: int, record):
+        self.lps = lps
+        self.record = record
+        self.n = 0
+        self.time = np.zeros(steps + 1)
+        self.biomass = np.zeros((steps + 1, len(lps)))
+        self.concentrations = np.zeros((steps + 1, n_metabolites))
+        self.growth = np.zeros((steps, len(lps)))
+        self.exchange_fluxes = [
+            np.zeros((steps, len(lp.exchanges)), dtype=np.float32) for lp in lps
+        ]
+        self.fluxes = (
+            [np.zeros((steps, len(lp.model.reactions)), dtype=np.float32) for lp in lps]
+            if record
+            else []
+        )
+
+    def _grow(self):
+        def double(a):
+            return np.concatenate([a, np.zeros_like(a[: max(len(a) - 1, 1)])])
+
+        self.time = double(self.time)
+        self.biomass = double(self.biomass)
+        self.concentrations = double(self.concentrations)
+        self.growth = double(self.growth)
+        self.exchange_fluxes = [double(a) for a in self.exchange_fluxes]
+        self.fluxes = [double(a) for a in self.fluxes]
+
+    def start(self, concentrations, biomass):
+        self.biomass[0], self.concentrations[0] = biomass, concentrations
+
+    def append(self, t, concentrations, biomass, solutions: List[_Solution]):
+        """
+        Adds a time point, solutions are the fluxes of the step before it
+        """
+        if self.n == len(self.growth):
+            self._grow()
+        k = self.n
+        self.time[k + 1] = t
+        self.biomass[k + 1], self.concentrations[k + 1] = biomass, concentrations
+        for i, solution in enumerate(solutions):
+            self.growth[k, i] = solution.growth
+            self.exchange_fluxes[i][k] = solution.exchange_fluxes
+            if self.record:
+                self.fluxes[i][k] = solution.fluxes
+        self.n += 1
+
+    def result(self, species, metabolite_ids, n_rejected=0) -> CoCultureResult:
+        n = self.n
+        return CoCultureResult(
+            species=species,
+            metabolite_ids=metabolite_ids,
+            exchange_ids={lp.species.name: lp.exchange_ids for lp in self.lps},
+            time=self.time[: n + 1],
+            biomass=self.biomass[: n + 1],
+            concentrations=self.concentrations[: n + 1],
+            growth_rates=self.growth[:n],
+            exchange_fluxes={
+                lp.species.name: a[:n] for lp, a in zip(self.lps, self.exchange_fluxes)
+            },
+            fluxes={lp.species.name: a[:n] for lp, a in zip(self.lps, self.fluxes)},
+            n_solves=sum(lp.n_solves for lp in self.lps),
+            n_rejected=n_rejected,
+        )
+
+
+@dataclass
+class CoCulture:
+    """
+    Dynamic FBA of several species sharing one environment.
+
+    species: List of Species
+    initial_concentrations: metabolite id -> concentration (mmol/L) at t = 0,
+        metabolites not given start at 0
+    limited: Metabolite ids with concentration dependent uptake,
+        default: the keys of initial_concentrations. Other exchanges keep their
+        model bounds, their secretions are still tracked.
+    predation: Optional Predation between two of the species
+    """
+
+    species: List[Species]
+    initial_concentrations: Dict[str, float]
+    limited: Optional[List[str]] = None
+    predation: Optional[Predation] = None
+
+    def __post_init__(self):
+        names = [s.name for s in self.species]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Species names must be unique, got {names}")
+        self._predator = self._prey = None
+        if self.predation is not None:
+            for name in (self.predation.predator, self.predation.prey):
+                if name not in names:
+                    raise ValueError(f"Unknown species {name} in predation")
+            self._predator = names.index(self.predation.predator)
+            self._prey = names.index(self.predation.prey)
+        if self.limited is None:
+            self.limited = list(self.initial_concentrations)
+
+        # environment: all exchanged metabolites, in order of appearance
+        exclude = {self.predation.exchange} if self.predation else set()
+        self.metabolite_ids: List[str] = []
+        for s in self.species:
+            for rct in s.model.exchanges:
+                met = _exchange_metabolite(rct)
+                if rct.id not in exclude and met not in self.metabolite_ids:
+                    self.metabolite_ids.append(met)
+        self._env_index = {met: i for i, met in enumerate(self.metabolite_ids)}
+        unknown = set(self.initial_concentrations) - set(self._env_index)
+        if unknown:
+            raise ValueError(f"Metabolites without exchange reaction: {sorted(unknown)}")
+        # concentrations that act on bounds, the others only track exchanges
+        self._limited_index = np.array(
+            [self._env_index[met] for met in self.limited if met in self._env_index],
+            dtype=int,
+        )
+
+    def _initial_state(self):
+        concentrations = np.zeros(len(self.metabolite_ids))
+        for met, value in self.initial_concentrations.items():
+            concentrations[self._env_index[met]] = value
+        biomass = np.array([s.initial_biomass for s in self.species], dtype=float)
+        return concentrations, biomass
+
+    def _species_lps(self) -> List[_SpeciesLP]:
+        exclude = {self.predation.exchange} if self.predation else set()
+        return [
+            _SpeciesLP(
+                s,
+                self._env_index,
+                set(self.limited),
+                exclude,
+                self.predation if i == self._predator else None,
+            )
+            for i, s in enumerate(self.species)
+        ]
+
+    def _solve_species(self, lp, i, concentrations, biomass, record) -> _Solution:
+        if biomass[i] <= 0:
+            return lp.zero_solution(record)
+        prey_biomass = biomass[self._prey] if i == self._predator else 0.0
+        lp.set_bounds(concentrations, prey_biomass)
+        return lp.solve(record)
+
+    def _biomass_rates(self, solutions: List[_Solution], biomass) -> np.ndarray:
+        rates = np.array([s.growth for s in solutions]) * biomass
+        if self.predation is not None:
+            # predation_flux <= 0 is the uptake of prey biomass
+            rates[self._prey] += (
+                solutions[self._predator].predation_flux * biomass[self._predator]
+            )
+        return rates
+
+    def _step(self, lps, concentrations, biomass, dt, record):
+        """
+        One explicit Euler step. The species are solved in list order, each one sees
+        the environment updated by the previous ones (as in the notebook).
+        Returns the new (concentrations, biomass) and the solutions.
+        """
+        concentrations = concentrations.copy()
+        solutions = []
+        for i, lp in enumerate(lps):
+            solution = self._solve_species(lp, i, concentrations, biomass, record)
+            solutions.append(solution)
+            np.add.at(concentrations, lp.env, solution.exchange_fluxes * biomass[i] * dt)
+            np.maximum(concentrations, 0.0, out=concentrations)
+        biomass = biomass + self._biomass_rates(solutions, biomass) * dt
+        return concentrations, np.maximum(biomass, 0.0), solutions
+
+    def _solve_all(self, lps, concentrations, biomass, record) -> List[_Solution]:
+        """
+        Solves all species on the same state
+        """
+        return [
+            self._solve_species(lp, i, concentrations, biomass, record)
+            for i, lp in enumerate(lps)
+        ]
+
+    def _integrate(self, lps, solutions, concentrations, biomass, h):
+        """
+        Integrates a step of length h with the fluxes of the solutions held constant:
+        exponential growth, exchanges proportional to the biomass integral
+        (static optimization approach, Varma & Palsson 1994).
+        Returns the new (concentrations, biomass), not clamped.
+        """
+        growth = np.array([s.growth for s in solutions])
+        # integral of the biomass over the step
+        exposure = biomass * np.where(
+            np.abs(growth) * h > 1e-12,
+            np.expm1(growth * h) / np.where(growth == 0, 1.0, growth),
+            h,
+        )
+        new_biomass = biomass * np.exp(growth * h)
+        if self.predation is not None:
+            new_biomass[self._prey] += (
+                solutions[self._predator].predation_flux * exposure[self._predator]
+            )
+        new_concentrations = concentrations.copy()
+        for i, (lp, solution) in enumerate(zip(lps, solutions)):
+            np.add.at(new_concentrations, lp.env, solution.exchange_fluxes * exposure[i])
+        return new_concentrations, new_biomass
+
+    def _watched(self, concentrations, biomass) -> np.ndarray:
+        """
+        Values that act on the bounds: limited metabolites and the prey biomass
+        """
+        values = concentrations[self._limited_index]
+        if self.predation is not None:
+            values = np.append(values, biomass[self._prey])
+        return values
+
+    def _step_limit(self, control: StepControl, lps, solutions, concentrations, biomass, h):
+        """
+        Shrinks the step h until the values acting on the bounds change by at most
+        rtol * value + atol and the step ends at the first depletion
+        """
+        values = self._watched(concentrations, biomass)
+        allowed = control.rtol * np.abs(values) + control.atol
+        for _ in range(4):
+            new_values = self._watched(
+                *self._integrate(lps, solutions, concentrations, biomass, h)
+            )
+            ratio = np.max(np.abs(new_values - values) / allowed, initial=0.0)
+            depleted = (new_values < 0) & (values > 0)
+            if depleted.any():
+                # fraction of the step until the first depletion
+                fraction = values[depleted] / (values[depleted] - new_values[depleted])
+                ratio = max(ratio, 1.0 / np.min(fraction))
+            if ratio <= 1.0:
+                break
+            h /= ratio
+        return h
+
+    def simulate(
+        self,
+        tf: float,
+        dt: float = 0.5,
+        record_fluxes: bool = False,
+        step_control: Optional[StepControl] = None,
+        fva=None,
+    ):
+        """
+        Simulates from t = 0 to tf. Without step_control the steps are fixed (dt),
+        with it dt is the first step and the step size adapts (see StepControl);
+        all species are then solved on the state at the start of a step.
+        The models' solver bounds are restored afterwards.
+
+        :param record_fluxes: Also keep all fluxes of every step (float32)
+        :param step_control: Optional StepControl for adaptive steps
+        :param fva: Optional community.DynamicFVA.DynamicFVA, runs FVA on every solved
+            time point (index into CoCultureResult.time)
+        :return: CoCultureResult
+        """
+        if dt <= 0 or tf <= 0:
+            raise ValueError("tf and dt must be positive")
+        lps = self._species_lps()
+        concentrations, biomass = self._initial_state()
+        steps = (
+            math.ceil(tf / dt - 1e-9)
+            if step_control is None
+            else math.ceil(tf / step_control.dt_max) + 16
+        )
+        trajectory = _Trajectory(lps, len(concentrations), steps, record_fluxes)
+        trajectory.start(concentrations, biomass)
+        n_rejected = 0
+        if fva is not None:
+            fva.start(lps)
+        try:
+            if step_control is None:
+                t = 0.0
+                for _ in range(steps):
+                    step = min(dt, tf - t)
+                    concentrations, biomass, solutions = self._step(
+                        lps, concentrations, biomass, step, record_fluxes
+                    )
+                    if fva is not None:
+                        fva.run(trajectory.n, t, lps, solutions)
+                    t += step
+                    trajectory.append(t, concentrations, biomass, solutions)
+            else:
+                n_rejected = self._simulate_adaptive(
+                    lps, trajectory, concentrations, biomass, tf, dt, step_control, fva
+                )
+        finally:
+            for lp in lps:
+                lp.restore()
+            if fva is not None:
+                fva.close()
+
+        return trajectory.result(
+            [s.name for s in self.species], self.metabolite_ids, n_rejected
+        )
+
+    def _simulate_adaptive(
+        self,
+        lps,
+        trajectory,
+        concentrations,
+        biomass,
+        tf,
+        dt,
+        control: StepControl,
+        fva=None,
+    ) -> int:
+        """
+        Adaptive steps, returns the number of rejected steps
+        """
+        record = trajectory.record
+        t, h, n_rejected = 0.0, min(dt, control.dt_max), 0
+        solutions = self._solve_all(lps, concentrations, biomass, record)
+        active = _active_set(lps, solutions, control.switch_tol)
+        if fva is not None:
+            fva.run(0, t, lps, solutions)
+        while tf - t > 1e-9 * tf:
+            step = self._step_limit(
+                control, lps, solutions, concentrations, biomass, min(h, tf - t)
+            )
+            step = min(max(step, control.dt_min), tf - t)
+            new_concentrations, new_biomass = self._integrate(
+                lps, solutions, concentrations, biomass, step
+            )
+            np.maximum(new_concentrations, 0.0, out=new_concentrations)
+            np.maximum(new_biomass, 0.0, out=new_biomass)
+            new_solutions = self._solve_all(lps, new_concentrations, new_biomass, record)
+            new_active = _active_set(lps, new_solutions, control.switch_tol)
+            changed = not np.array_equal(new_active, active)
+            if changed and step > control.dt_min:
+                # repeat the step to locate the switch
+                h = max(step / 2, control.dt_min)
+                n_rejected += 1
+                continue
+
+            t += step
+            trajectory.append(t, new_concentrations, new_biomass, solutions)
+            h = step if changed else min(step * control.grow, control.dt_max)
+            concentrations, biomass = new_concentrations, new_biomass
+            solutions, active = new_solutions, new_active
+            if fva is not None and tf - t > 1e-9 * tf:
+                fva.run(trajectory.n, t, lps, solutions)
+        return n_rejected
@@ -0,0 +1,321 @@
+"""
+Steady state of a community in one LP (SteadyCom), instead of solving each species
+separately and passing the results through the environment as in
+notebooks/compart_model.ipynb.
+
+The species models are merged into one sparse problem. The fluxes of species k are
+scaled by its abundance X_k (fraction of the community biomass),
+V_k = X_k * v_k, so its bounds become lb * X_k <= V_k <= ub * X_k. All species grow
+with the community growth rate mu, V_k[biomass] = mu * X_k, and sum(X_k) = 1.
+The exchange reactions of the species secrete into (or take up from) a shared
+extracellular pool, one metabolite per exchange metabolite id, which is balanced by
+one community exchange.
+
+With predation the prey additionally replaces the biomass taken by the predator:
+V_prey[biomass] = mu * X_prey + P, and P enters the pool as the metabolite of the
+predation exchange of the predator (Biomass_e, see community.predation).
+
+The highest mu with a feasible LP is found by bisection.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from cobra.util.array import create_stoichiometric_matrix
+from scipy import sparse
+from scipy.optimize import linprog
+from community.CoCulture import Predation, Species, _exchange_metabolite
+
+# Dual simplex solves the feasible LPs fastest, but can take minutes to prove
+# infeasibility close to the maximal growth rate. After this time (s) the LP is
+# solved with the interior point method instead.
+SIMPLEX_TIME_LIMIT = 1.0
+
+
+@dataclass
+class CommunityResult:
+    """
+    Community steady state, fluxes are per gDW of community biomass unless noted.
+
+    status: optimal or infeasible (not even growth rate 0 is feasible)
+    growth_rate: Community growth rate (1/h), nan if infeasible
+    abundance: Species name -> fraction of the community biomass
+    fluxes: Species name -> fluxes per gDW of the species (v = V / X, 0 if X = 0)
+    exchange_fluxes: Community exchange per pool metabolite (> 0 secretion)
+    predation_flux: Prey biomass taken up by the predator (gDW/gDW/h)
+    n_solves: Number of LP solves
+    """
+
+    status: str
+    growth_rate: float
+    abundance: Dict[str, float] = field(default_factory=dict)
+    fluxes: Dict[str, pd.Series] = field(default_factory=dict)
+    exchange_fluxes: Optional[pd.Series] = None
+    predation_flux: float = 0.0
+    n_solves: int = 0
+
+
+@dataclass
+class CommunityModel:
+    """
+    species: Species of the community (only name, model and biomass_reaction are
+        used). The exchange bounds of a model limit the uptake per gDW of the species.
+    predation: Optional predator-prey coupling, the predator model needs the
+        predation exchange (community.predation.add_predation)
+    medium: Exchange reaction id -> maximal uptake of the community per gDW of
+        community biomass, exchanges not given are only limited by the species
+    max_predation_rate: Optional limit of the predation flux per gDW of prey
+    min_abundance: Species name -> smallest fraction of the community biomass, e.g.
+        to keep the predator in the community
+    """
+
+    species: List[Species]
+    predation: Optional[Predation] = None
+    medium: Optional[Dict[str, float]] = None
+    max_predation_rate: Optional[float] = None
+    min_abundance: Optional[Dict[str, float]] = None
+
+    def __post_init__(self):
+        names = [sp.name for sp in self.species]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Species names must be unique: {names}")
+        if self.predation is not None:
+            for name in (self.predation.predator, self.predation.prey):
+                if name not in names:
+                    raise ValueError(f"Predation species {name} not in the community")
+        unknown = set(self.min_abundance or {}) - set(names)
+        if unknown:
+            raise ValueError(
+                f"Species of min_abundance not in the community: {unknown}"
+            )
+        self._build()
+
+    def _build(self):
+        blocks = [
+            create_stoichiometric_matrix(sp.model, array_type="lil")
+            for sp in self.species
+        ]
+        n_rct = [b.shape[1] for b in blocks]
+        n_met = [b.shape[0] for b in blocks]
+        self.reaction_ids = {
+            sp.name: [rct.id for rct in sp.model.reactions] for sp in self.species
+        }
+        offsets = np.concatenate([[0], np.cumsum(n_rct)])
+        n_species = len(self.species)
+        x_col = offsets[-1]  # abundances X_1..X_K
+
+        # shared pool, in order of first appearance
+        pool: Dict[str, int] = {}
+        pool_exchange: Dict[str, str] = {}
+        exchange_cols = []  # (pool index, column)
+        for k, sp in enumerate(self.species):
+            position = {rct.id: j for j, rct in enumerate(sp.model.reactions)}
+            for rct in sp.model.exchanges:
+                met = _exchange_metabolite(rct)
+                if met not in pool:
+                    pool[met] = len(pool)
+                    pool_exchange[met] = rct.id
+                exchange_cols.append((pool[met], offsets[k] + position[rct.id]))
+        self.pool_ids = list(pool)
+        self.pool_exchange_ids = [pool_exchange[met] for met in self.pool_ids]
+        w_col = x_col + n_species  # community exchanges
+        p_col = w_col + len(pool)  # predation flux
+        n_cols = p_col + (self.predation is not None)
+
+        # equality rows: mass balances | pool balances | biomass | sum(X) = 1
+        rows, cols, data = [], [], []
+        row = 0
+        for k, block in enumerate(blocks):
+            coo = block.tocoo()
+            rows.append(coo.row + row)
+            cols.append(coo.col + offsets[k])
+            data.append(coo.data)
+            row += n_met[k]
+        pool_row = row
+        pool_idx, ex_cols = (
+            np.array(exchange_cols, dtype=int).T if exchange_cols else ([], [])
+        )
+        rows += [pool_row + np.asarray(pool_idx), pool_row + np.arange(len(pool))]
+        cols += [np.asarray(ex_cols), w_col + np.arange(len(pool))]
+        data += [np.ones(len(pool_idx)), -np.ones(len(pool))]
+        row += len(pool)
+
+        species_index = {sp.name: k for k, sp in enumerate(self.species)}
+        biomass_cols = np.array(
+            [
+                offsets[k] + self.reaction_ids[sp.name].index(sp.biomass_reaction)
+                for k, sp in enumerate(self.species)
+            ]
+        )
+        biomass_row = row
+        rows += [biomass_row + np.arange(n_species)] * 2
+        cols += [biomass_cols, x_col + np.arange(n_species)]
+        # -mu * X_k, mu is set per solve
+        data += [np.ones(n_species), np.zeros(n_species)]
+        # positions of the mu entries in the concatenated data
+        self._mu_entries = sum(len(d) for d in data[:-1]) + np.arange(n_species)
+        row += n_species
+        if self.predation is not None:
+            predator = self.species[species_index[self.predation.predator]]
+            exchange = predator.model.reactions.get_by_id(self.predation.exchange)
+            prey = species_index[self.predation.prey]
+            # prey growth replaces the biomass taken by the predator
+            biomass_e = pool[_exchange_metabolite(exchange)]
+            rows += [[biomass_row + prey], [pool_row + biomass_e]]
+            cols += [[p_col], [p_col]]
+            data += [[-1.0], [1.0]]
+        rows.append(np.full(n_species, row))
+        cols.append(x_col + np.arange(n_species))
+        data.append(np.ones(n_species))
+        row += 1
+        self._A_eq = sparse.coo_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(row, n_cols),
+        )
+        self._b_eq = np.zeros(row)
+        self._b_eq[-1] = 1.0
+
+        # inequality rows: V <= ub * X and lb * X <= V for non-zero finite bounds,
+        # zero bounds are column bounds
+        rows, cols, data = [], [], []
+        col_lb = np.zeros(n_cols)
+        col_ub = np.full(n_cols, np.inf)
+        row = 0
+        for k, sp in enumerate(self.species):
+            lb = np.array([rct.lower_bound for rct in sp.model.reactions], dtype=float)
+            ub = np.array([rct.upper_bound for rct in sp.model.reactions], dtype=float)
+            v_cols = offsets[k] + np.arange(n_rct[k])
+            col_lb[v_cols] = np.where(lb < 0, -np.inf, 0.0)
+            col_ub[v_cols] = np.where(ub > 0, np.inf, 0.0)
+            for sign, bound in ((1.0, ub), (-1.0, lb)):
+                j = np.flatnonzero((bound != 0) & np.isfinite(bound))
+                r = row + np.arange(len(j))
+                rows += [r, r]
+                cols += [v_cols[j], np.full(len(j), x_col + k)]
+                data += [np.full(len(j), sign), -sign * bound[j]]
+                row += len(j)
+        col_ub[x_col : x_col + n_species] = 1.0
+        for name, value in (self.min_abundance or {}).items():
+            col_lb[x_col + species_index[name]] = value
+        medium = self.medium or {}
+        unknown = set(medium) - set(pool_exchange.values())
+        if unknown:
+            raise ValueError(
+                f"Medium exchanges not in the community: {sorted(unknown)}"
+            )
+        for met, i in pool.items():
+            col_lb[w_col + i] = -medium.get(pool_exchange[met], np.inf)
+        if self.predation is not None:
+            # prey biomass only comes from predation
+            col_lb[w_col + biomass_e] = 0.0
+        if self.predation is not None and self.max_predation_rate is not None:
+            rows += [[row], [row]]
+            cols += [[p_col], [x_col + species_index[self.predation.prey]]]
+            data += [[1.0], [-self.max_predation_rate]]
+            row += 1
+        self._A_ub = sparse.coo_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(row, n_cols),
+        ).tocsr()
+        self._b_ub = np.zeros(row)
+        self._bounds = np.column_stack([col_lb, col_ub])
+
+        self._offsets = offsets
+        self._x_col, self._w_col, self._p_col = x_col, w_col, p_col
+        self.n_solves = 0
+
+    @property
+    def shape(self):
+        """
+        (rows, columns) of the merged problem
+        """
+        return (
+            self._A_eq.shape[0] + self._A_ub.shape[0],
+            self._A_eq.shape[1],
+        )
+
+    def _solve(self, growth_rate: float) -> Optional[np.ndarray]:
+        """
+        Solution of the LP at a fixed growth rate, None if infeasible
+        """
+        A_eq = self._A_eq.copy()
+        A_eq.data[self._mu_entries] = -growth_rate
+        problem = dict(
+            c=np.zeros(A_eq.shape[1]),
+            A_ub=self._A_ub,
+            b_ub=self._b_ub,
+            A_eq=A_eq.tocsr(),
+            b_eq=self._b_eq,
+            bounds=self._bounds,
+        )
+        self.n_solves += 1
+        result = linprog(
+            **problem, method="highs-ds", options={"time_limit": SIMPLEX_TIME_LIMIT}
+        )
+        if result.status == 1:
+            result = linprog(**problem, method="highs-ipm")
+        return result.x if result.status == 0 else None
+
+    def solve(self, growth_rate: float) -> CommunityResult:
+        """
+        Abundances and fluxes of the community at a fixed growth rate (one LP)
+        """
+        self.n_solves = 0
+        x = self._solve(growth_rate)
+        if x is None:
+            return CommunityResult("infeasible", np.nan, n_solves=self.n_solves)
+        return self._result(growth_rate, x)
+
+    def optimize(
+        self, tol: float = 1e-6, max_growth: Optional[float] = None
+    ) -> CommunityResult:
+        """
+        Maximal community growth rate by bisection on the growth rate
+
+        :param tol: Bisection stops when the interval is smaller than
+            tol * max(1, growth rate)
+        :param max_growth: Upper limit of the search, default the largest upper bound
+            of the biomass reactions
+        """
+        self.n_solves = 0
+        if max_growth is None:
+            max_growth = max(
+                sp.model.reactions.get_by_id(sp.biomass_reaction).upper_bound
+                for sp in self.species
+            )
+        best = self._solve(0.0)
+        if best is None:
+            return CommunityResult("infeasible", np.nan, n_solves=self.n_solves)
+        low, high = 0.0, float(max_growth)
+        x = self._solve(high)
+        if x is not None:
+            return self._result(high, x)
+        while high - low > tol * max(1.0, low):
+            mid = 0.5 * (low + high)
+            x = self._solve(mid)
+            if x is None:
+                high = mid
+            else:
+                low, best = mid, x
+        return self._result(low, best)
+
+    def _result(self, growth_rate: float, x: np.ndarray) -> CommunityResult:
+        abundance = x[self._x_col : self._x_col + len(self.species)]
+        fluxes = {}
+        for k, sp in enumerate(self.species):
+            V = x[self._offsets[k] : self._offsets[k + 1]]
+            v = V / abundance[k] if abundance[k] > 0 else np.zeros_like(V)
+            fluxes[sp.name] = pd.Series(v, index=self.reaction_ids[sp.name])
+        return CommunityResult(
+            status="optimal",
+            growth_rate=growth_rate,
+            abundance={sp.name: float(a) for sp, a in zip(self.species, abundance)},
+            fluxes=fluxes,
+            exchange_fluxes=pd.Series(
+                x[self._w_col : self._w_col + len(self.pool_ids)],
+                index=self.pool_exchange_ids,
+            ),
+            predation_flux=float(x[self._p_col]) if self.predation else 0.0,
+            n_solves=self.n_solves,
+        )
@@ -0,0 +1,286 @@
+"""
+Flux variability analysis along a co-culture simulation (the FVA option of
+notebooks/compart_model.ipynb), solved in a process pool and written per time point
+into a Parquet store.
+"""
+
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from cobra import Model
+from optlang.symbolics import Zero
+from community.CoCulture import TOLERANCE, _set_reaction_bounds
+from utils.ResultStore import _require_pyarrow
+from utils.cores import available_cores
+from utils.warm_start import solve_from_basis
+
+# Worker state: FVA copies of the species models and the dynamic bounds set on them
+_models: List[Model] = []
+_bounds: List[Dict[str, Tuple[float, float]]] = []
+
+
+def _init_worker(models: List[Model]):
+    """
+    Adds the objective threshold constraint to the models and clears their objective
+    """
+    global _models, _bounds
+    _models, _bounds = models, [{} for _ in models]
+    for model in models:
+        threshold = model.problem.Constraint(
+            model.solver.objective.expression, lb=None, name="fva_objective"
+        )
+        model.add_cons_vars([threshold])
+        model.objective = model.problem.Objective(Zero, direction="max", sloppy=True)
+        # first solve, scales glpk problems
+        model.slim_optimize(error_value=np.nan)
+
+
+def _fva_chunk(task):
+    """
+    Minimizes and maximizes the reactions of one chunk.
+
+    :param task: (species, fraction index, indices, reaction ids, threshold,
+        dynamic bounds (reaction id -> (lb, ub)))
+    :return: (species, fraction index, indices, ranges (n, 2), values (n, 2, k + 1))
+        values are the dynamic fluxes and the objective of each solution
+    """
+    species, f, indices, reaction_ids, threshold, bounds = task
+    model = _models[species]
+    current = _bounds[species]
+    for rid, (lb, ub) in bounds.items():
+        if current.get(rid) != (lb, ub):
+            rct = model.reactions.get_by_id(rid)
+            _set_reaction_bounds(rct.forward_variable, rct.reverse_variable, lb, ub)
+            current[rid] = (lb, ub)
+    constraint = model.constraints.fva_objective
+    constraint.lb = threshold
+    dynamic = [model.reactions.get_by_id(rid) for rid in bounds]
+
+    objective = model.solver.objective
+    ranges = np.full((len(reaction_ids), 2), np.nan)
+    values = np.full((len(reaction_ids), 2, len(dynamic) + 1), np.nan)
+    for k, rid in enumerate(reaction_ids):
+        rct = model.reactions.get_by_id(rid)
+        objective.set_linear_coefficients(
+            {rct.forward_variable: 1, rct.reverse_variable: -1}
+        )
+        for d, direction in enumerate(("min", "max")):
+            objective.direction = direction
+            if solve_from_basis(model):
+                ranges[k, d] = objective.value
+                values[k, d, :-1] = [
+                    r.forward_variable.primal - r.reverse_variable.primal
+                    for r in dynamic
+                ]
+                values[k, d, -1] = constraint.primal
+        objective.set_linear_coefficients(
+            {rct.forward_variable: 0, rct.reverse_variable: 0}
+        )
+    return species, f, indices, ranges, values
+
+
+@dataclass
+class _FVAState:
+    """
+    Last FVA of one species and fraction
+    """
+
+    lbs: np.ndarray
+    threshold: float
+    ranges: np.ndarray
+    values: np.ndarray
+
+
+@dataclass
+class DynamicFVA:
+    """
+    FVA of every species on each solved time point of CoCulture.simulate, for several
+    fractions of the optimum. The min/max problems are split into chunks of reactions
+    and solved in a process pool. The workers keep their LPs between time points, so
+    the solves start from the basis of the previous ones.
+
+    A range is copied from the previous time point when its solutions stay optimal:
+    every bound that changed since (dynamic exchange bounds, objective threshold)
+    was inactive in them before and after the change.
+
+    Each time point is written as its own Parquet file (needs pyarrow):
+
+        root/species=<name>/step-<step>.parquet
+
+    with the columns step, time, fraction, reaction_id, minimum, maximum.
+
+    root: Directory of the store
+    fractions: Fractions of the optimum (FVA_optimum of the notebook)
+    reactions: Optional species name -> reaction ids, default all reactions
+    processes: Worker processes, default the available cores, 1 solves in this process
+    chunk_size: Reactions per task
+    """
+
+    root: Path
+    fractions: List[float] = field(default_factory=lambda: [1.0, 0.95])
+    reactions: Optional[Dict[str, List[str]]] = None
+    processes: Optional[int] = None
+    chunk_size: int = 100
+    n_solved: int = field(default=0, init=False)
+    n_skipped: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        _require_pyarrow()
+        self.root = Path(self.root)
+        self._pool = None
+
+    def start(self, lps):
+        """
+        Starts the workers with copies of the species models
+        """
+        for lp in lps:
+            if lp.model.solver.objective.direction != "max":
+                raise ValueError(f"{lp.species.name}: FVA needs a maximized objective")
+        self._names = [lp.species.name for lp in lps]
+        self._reaction_ids = [
+            (self.reactions or {}).get(lp.species.name)
+            or [rct.id for rct in lp.model.reactions]
+            for lp in lps
+        ]
+        self._previous: Dict[Tuple[int, int], _FVAState] = {}
+        models = [lp.model.copy() for lp in lps]
+        processes = self.processes or len(available_cores())
+        if processes > 1:
+            self._pool = Pool(processes, initializer=_init_worker, initargs=(models,))
+        else:
+            _init_worker(models)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    @staticmethod
+    def _dynamic_bounds(lp) -> Dict[str, Tuple[float, float]]:
+        """
+        Bounds that change during the simulation: limited exchanges and predation
+        """
+        bounds = {
+            lp.exchange_ids[j]: (lp.lb[j], lp.model_ub[j])
+            for j in np.flatnonzero(lp.limited)
+        }
+        if lp.predation_reaction is not None:
+            bounds[lp.predation_reaction.id] = (
+                lp.predation_lb,
+                lp.predation_reaction.upper_bound,
+            )
+        return bounds
+
+    def _unchanged(self, previous: _FVAState, lbs, threshold) -> np.ndarray:
+        """
+        Reactions whose min and max solutions of the previous time point stay optimal
+        """
+        changed = lbs != previous.lbs
+        inactive = np.all(
+            previous.values[:, :, :-1][:, :, changed]
+            > np.maximum(previous.lbs[changed], lbs[changed]) + TOLERANCE,
+            axis=2,
+        )
+        if threshold != previous.threshold:
+            inactive &= previous.values[:, :, -1] > (
+                max(threshold, previous.threshold) + TOLERANCE
+            )
+        return np.all(inactive & ~np.isnan(previous.ranges), axis=1)
+
+    def run(self, step: int, time: float, lps, solutions):
+        """
+        FVA of all species with the bounds of their last solve
+        """
+        tasks, states = [], {}
+        for i, (lp, solution) in enumerate(zip(lps, solutions)):
+            if np.isnan(solution.objective):
+                continue
+            bounds = self._dynamic_bounds(lp)
+            lbs = np.array([lb for lb, _ in bounds.values()])
+            reaction_ids = self._reaction_ids[i]
+            n = len(reaction_ids)
+            for f, fraction in enumerate(self.fractions):
+                threshold = fraction * solution.objective
+                previous = self._previous.get((i, f))
+                if previous is None:
+                    todo = np.arange(n)
+                    ranges = np.full((n, 2), np.nan)
+                    values = np.full((n, 2, len(bounds) + 1), np.nan)
+                else:
+                    todo = np.flatnonzero(~self._unchanged(previous, lbs, threshold))
+                    ranges, values = previous.ranges.copy(), previous.values.copy()
+                states[i, f] = _FVAState(lbs, threshold, ranges, values)
+                self.n_solved += len(todo)
+                self.n_skipped += n - len(todo)
+                for start in range(0, len(todo), self.chunk_size):
+                    indices = todo[start : start + self.chunk_size]
+                    tasks.append(
+                        (
+                            i,
+                            f,
+                            indices,
+                            [reaction_ids[j] for j in indices],
+                            threshold,
+                            bounds,
+                        )
+                    )
+
+        results = (
+            self._pool.imap_unordered(_fva_chunk, tasks)
+            if self._pool is not None
+            else map(_fva_chunk, tasks)
+        )
+        for i, f, indices, ranges, values in results:
+            states[i, f].ranges[indices] = ranges
+            states[i, f].values[indices] = values
+        self._previous.update(states)
+
+        for i in sorted({i for i, _ in states}):
+            self._write(
+                i, step, time, [states[i, f].ranges for f in range(len(self.fractions))]
+            )
+
+    def _write(self, species: int, step: int, time: float, ranges: List[np.ndarray]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        reaction_ids = self._reaction_ids[species]
+        n_rows = len(reaction_ids) * len(self.fractions)
+        ranges = np.concatenate(ranges)
+        table = pa.table(
+            {
+                "step": pa.array(np.full(n_rows, step, dtype=np.int32)),
+                "time": pa.array(np.full(n_rows, time)),
+                "fraction": pa.array(
+                    np.repeat(self.fractions, len(reaction_ids)).astype(np.float32)
+                ),
+                "reaction_id": pa.array(
+                    reaction_ids * len(self.fractions), pa.string()
+                ).dictionary_encode(),
+                "minimum": pa.array(ranges[:, 0]),
+                "maximum": pa.array(ranges[:, 1]),
+            }
+        )
+        directory = self.root / f"species={self._names[species]}"
+        directory.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, directory / f"step-{step:06d}.parquet")
+
+
+def read_fva(root, species: str, filters: Optional[list] = None) -> pd.DataFrame:
+    """
+    Reads the FVA ranges of one species with memory mapping.
+
+    :param root: Directory of the store
+    :param filters: Optional pyarrow filters, e.g. [("fraction", "==", 1.0)]
+    :return: DataFrame with the columns step, time, fraction, reaction_id, minimum,
+        maximum
+    """
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    directory = Path(root) / f"species={species}"
+    return pq.read_table(directory, memory_map=True, filters=filters).to_pandas()
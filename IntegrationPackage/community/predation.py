@@ -0,0 +1,82 @@
+"""
+Predation reactions of notebooks/compart_model.ipynb: the predator takes up prey
+biomass (Biomass_e) and degrades it into extracellular metabolites.
+"""
+
+from typing import Dict
+import cobra
+from cobra import Model
+
+# Products of one unit of prey biomass, from notebooks/compart_model.ipynb
+PREDATION_STOICHIOMETRY: Dict[str, float] = {
+    "spmd_e": 0.006744,
+    "pheme_e": 0.000223,
+    "val_L_e": 0.411184,
+    "ile_L_e": 0.282306,
+    "leu_L_e": 0.437778,
+    "lys_L_e": 0.333448,
+    "his_L_e": 0.092056,
+    "gly_cys_L_e": 0.024805,
+    "cgly_e": 0.1,
+    "pro_L_e": 0.214798,
+    "alaala_e": 0.2495745,
+    "gam_e": 1.2e-03,
+    "glu_L_e": 0.255712,
+    "met_L_e": 0.149336,
+    "thr_L_e": 0.246506,
+    "fum_e": 1.2e-04,
+    "orn_e": 1.0e-05,
+    "acald_e": 0.1,
+    "acac_e": 0.1,
+    "pi_e": 0.1,
+    "zn2_e": 0.000324,
+    "mn2_e": 0.000658,
+    "mg2_e": 0.008253,
+    "k_e": 0.18569,
+    "cu2_e": 0.000674,
+    "cobalt2_e": 2.4e-05,
+    "cl_e": 0.004952,
+    "ca2_e": 0.004952,
+    "so4_e": 0.004126,
+}
+
+
+def add_predation(
+    model: Model,
+    stoichiometry: Dict[str, float] = None,
+    skip_missing: bool = False,
+) -> Model:
+    """
+    Adds Biomass_e, its exchange reaction EX_Biomass_e and PR_BIOMASS
+    (Biomass_e -> products) to the predator model, in place.
+
+    :param stoichiometry: metabolite id -> coefficient, default PREDATION_STOICHIOMETRY
+    :param skip_missing: Leave out products that are not in the model instead of
+        raising a ValueError
+    :return: The model
+    """
+    stoichiometry = stoichiometry or PREDATION_STOICHIOMETRY
+    missing = [met for met in stoichiometry if met not in model.metabolites]
+    if missing and not skip_missing:
+        raise ValueError(f"Predation products not in the model: {missing}")
+
+    biomass_e = cobra.Metabolite(
+        "Biomass_e", formula="BIOMASS", name="Biomass [e]", compartment="e"
+    )
+    model.add_metabolites([biomass_e])
+    model.add_boundary(biomass_e, type="exchange")
+
+    reaction = cobra.Reaction("PR_BIOMASS", name="Predation Biomass")
+    reaction.bounds = (0.0, 1000.0)
+    reaction.add_metabolites(
+        {
+            biomass_e: -1,
+            **{
+                model.metabolites.get_by_id(met): coefficient
+                for met, coefficient in stoichiometry.items()
+                if met not in missing
+            },
+        }
+    )
+    model.add_reactions([reaction])
+    return model
@@ -5,44 +5,40 @@ import numpy as np
 # cell types or biological processes. Each element in the `exprColNames` list corresponds to a
 # specific type of gene expression data, such as 'AP..cycling', 'BP', 'DL.neurons', etc. These names
 # are used to identify and extract specific expression data from the dataset for further analysis or
-# processing.
+# processing. Output directories per cell type are derived from these names ('AP..cycling' -> AP_cycling).
 exprColNames = ['AP..cycling', 'AP..cycling.II', 'AP..cycling.III','BP', 'BP..cycling', 'DL.neurons', 'DL.neurons.II', 'UL..differentiating', 'UL..migrating']
-celltype_names = ['AP_cycling', 'AP_cycling_2', 'AP_cycling_3','BP', 'BP_cycling', 'DL_neurons', 'DL_neurons_2', 'UL_differentiating', 'UL_migrating']
-methods = ["iMAT", 'triple_weighted_iMAT']
-outputpaths = ['regular_iMAT', 'weighted_iMAT', 'triple_weighted_iMAT']
-oxygen_levels = []
+methods = ["iMAT", "weighted_iMAT"]
 geneColName = 'ensembl_gene_id'
-inputDir = ['.Data/SensitivityData']    #Directory to files with expression data
-metabolicModel = ['./mitoMammal/Model_test_IMSH_glucoseImport.sbml']
-discretization = ['quantile']
-outputpaths = ['regular_iMAT', 'weighted_iMAT']
+inputDir = './Data/SensitivityData'    #Directory to files with expression data
+filePattern = '*.tsv'
+metabolicModel = './mitoMammal/Model_test_IMSH_glucoseImport.sbml'
+model_cache = True    # load the model from a snapshot cache (utils/ModelLoader.py)
+expression_cache = True    # load the model-aligned expression columns from a snapshot cache (utils/ExpressionCache.py)
+solution_cache = True    # reuse the result of a run with the same reaction classes (utils/SolutionCache.py)
+discretization = 'quantile'
+outputDir = './sensitivityAnalysis_output'    # results in outputDir/method/celltype
+output_format = 'tsv'    # 'parquet' batches the results in outputDir/results (needs pyarrow)
+results_per_file = 50    # runs per parquet file
+profile = False    # stage timings and solver statistics per task in outputDir/profile.jsonl
+precheck = True    # skip the MILP if the flux bounds are infeasible
+precheck_relaxation = False    # also check the LP relaxation (feasible whenever the bounds are, unless constraints were added)
 # Parameter Ranges
 epsilon_range = np.logspace(-3, 1, 5)
 lower_q_range = np.linspace(1, 75, 7)
 upper_q_range = np.linspace(25, 99, 7)
-oxygen_levels = None
+oxygen_levels = None    # list of EX_o2_e values, None keeps the model bounds
 
-# Grid Search
-
-    print(f'Total parameter combinations: {len(param_grid)}')
-    # Expression Files
-    expr_folder = Path('./Data/SensitivityData')
-    expr_files = list(expr_folder.glob("*.tsv"))
-
-    # Generate all tasks
-    params = []
-    for exprFile in expr_files:
-        for c, exprColName in enumerate(exprColNames):  #per celltype
-            for i, method in enumerate(methods):
-                for epsilon, lower_q, upper_q in param_grid:
-                    params.append((method, outputpaths[i], exprColName, celltype_names[c], mdl, str(exprFile), geneColName, epsilon, lower_q, upper_q))
-
-    # Parallelization
-    num_processes = 16
-    print(f"Total tasks to run: {len(params)}")
-
-    with Pool(processes=num_processes) as pool:
-        pool.map(run_single_case, params)
-
-    print("Done!")
-    
\ No newline at end of file
+# Parallelization, None splits the available cores (affinity, cgroup quota) into
+# workers and solver threads
+num_processes = None
+max_threads = 8    # solver threads per worker at most
+pin_workers = True    # pin each worker to its own cores
+adaptive_threads = True    # repeated long-running tasks get fewer workers with more threads
+# Solver, per solve
+solver = 'cbc'
+time_limit = None    # seconds, solves stopped by a limit write their best solution
+mip_gap = None
+node_limit = None    # branch-and-bound nodes
+threads = None    # per solve, None: cores per worker
+budget_rounds = 1    # times tasks stopped by the time or node limit are run again at the end
+budget_growth = 4    # factor of the time and node limit per round
@@ -0,0 +1,208 @@
+"""
+Combinatorial knockout screen of exchange (or any) reactions: finds the pairs (and
+optionally triples) of knockouts without a solution, like
+results/Others/no_solution_V2.txt. Started with: main.py screen -m model.json
+"""
+
+import itertools
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from optlang.interface import OPTIMAL
+from utils.ModelLoader import load_model, read_model
+from utils.cores import available_cores
+
+# Fluxes with a smaller absolute value are treated as zero
+TOLERANCE = 1e-6
+
+
+@dataclass(frozen=True)
+class KnockoutResult:
+    """
+    Result of one knockout combination
+
+    status: "viable", "no_growth" (growth below min_growth), "infeasible" or
+        "lethal_subset" (not solved, a subset is already lethal)
+    growth: Objective value, nan if infeasible
+    support: Candidate indices with non-zero flux in the solution
+    solved: False if the result was derived from a subset without solving
+    """
+
+    status: str
+    growth: float
+    support: FrozenSet[int] = frozenset()
+    solved: bool = True
+
+    @property
+    def lethal(self) -> bool:
+        return self.status != "viable"
+
+
+# Worker state, set per process by _init_worker
+_model = None
+_candidates: List = []
+_min_growth = TOLERANCE
+
+
+def _init_worker(model_path, reaction_ids, min_growth, model_cache=True):
+    """
+    Pool initializer, reads the model once per worker. All combinations of a worker
+    are solved on this one model and its solver instance.
+    """
+    global _model, _candidates, _min_growth
+    _model = load_model(model_path) if model_cache else read_model(model_path)
+    _candidates = [_model.reactions.get_by_id(rid) for rid in reaction_ids]
+    _min_growth = min_growth
+
+
+def _solve_knockout(combination: Tuple[int, ...]) -> KnockoutResult:
+    """
+    Optimizes the model with the candidates of the combination knocked out. The
+    bounds are changed in place and reset when leaving the model context.
+    """
+    with _model:
+        for i in combination:
+            _candidates[i].knock_out()
+        growth = _model.slim_optimize(error_value=np.nan)
+        if _model.solver.status != OPTIMAL:
+            return KnockoutResult("infeasible", np.nan)
+        primal = _model.solver.primal_values
+    support = frozenset(
+        i
+        for i, rct in enumerate(_candidates)
+        if abs(primal[rct.forward_variable.name] - primal[rct.reverse_variable.name])
+        > TOLERANCE
+    )
+    status = "viable" if growth >= _min_growth else "no_growth"
+    return KnockoutResult(status, growth, support)
+
+
+def _solve_chunk(combinations: List[Tuple[int, ...]]):
+    return [(c, _solve_knockout(c)) for c in combinations]
+
+
+def _derive(
+    combination: Tuple[int, ...], results: Dict[Tuple[int, ...], KnockoutResult]
+) -> Optional[KnockoutResult]:
+    """
+    Result of a combination from its subsets with one knockout less, None if it has
+    to be solved. A lethal subset makes the combination lethal. A subset whose
+    solution carries no flux through the remaining candidate keeps that solution
+    optimal, so the combination has the growth of the subset.
+    """
+    subsets = []
+    for k, i in enumerate(combination):
+        subset = combination[:k] + combination[k + 1 :]
+        result = results.get(subset)
+        if result is None or result.lethal:
+            # supersets of lethal combinations are not solved, they are lethal too
+            return KnockoutResult("lethal_subset", np.nan, solved=False)
+        subsets.append((i, result))
+    for i, result in subsets:
+        if i not in result.support:
+            return KnockoutResult(
+                result.status, result.growth, result.support, solved=False
+            )
+    return None
+
+
+def _chunks(items: list, n_chunks: int) -> List[list]:
+    size = max(1, -(-len(items) // max(1, n_chunks)))
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def screen_knockouts(
+    model_path,
+    reaction_ids: Optional[List[str]] = None,
+    max_size: int = 2,
+    min_growth: float = TOLERANCE,
+    processes: Optional[int] = None,
+    model_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Screens all knockout combinations of up to max_size candidates, size by size.
+    A combination is only solved if it can not be derived from its subsets (see
+    _derive), combinations with a lethal subset get the status lethal_subset.
+
+    :param model_path: Path to the model file
+    :param reaction_ids: Candidates, default all exchange reactions of the model
+    :param max_size: Largest combination size, 2 for pairs, 3 for triples
+    :param min_growth: Smallest objective value of a viable combination
+    :param processes: Number of worker processes, default the available cores
+        (utils.cores.available_cores)
+    :param model_cache: Load the model through the model cache
+    :return: DataFrame with the columns knockouts ("EX_a + EX_b"), size, status,
+        growth, solved. The unknocked model is the row of size 0.
+    """
+    if max_size < 1:
+        raise ValueError(f"max_size must be at least 1, got {max_size}")
+    model = load_model(model_path) if model_cache else read_model(model_path)
+    if reaction_ids is None:
+        reaction_ids = [rct.id for rct in model.exchanges]
+    missing = [rid for rid in reaction_ids if rid not in model.reactions]
+    if missing:
+        raise ValueError(f"Reactions not in the model: {', '.join(missing)}")
+    reaction_ids = list(dict.fromkeys(reaction_ids))
+
+    processes = processes or len(available_cores())
+    results: Dict[Tuple[int, ...], KnockoutResult] = {}
+    start = time.perf_counter()
+    with Pool(
+        processes=processes,
+        initializer=_init_worker,
+        initargs=(model_path, reaction_ids, min_growth, model_cache),
+    ) as pool:
+        for size in range(max_size + 1):
+            todo, n_derived = [], 0
+            for combination in itertools.combinations(range(len(reaction_ids)), size):
+                result = _derive(combination, results) if size > 1 else None
+                if result is None:
+                    todo.append(combination)
+                else:
+                    results[combination] = result
+                    n_derived += 1
+            for chunk in pool.imap_unordered(_solve_chunk, _chunks(todo, 4 * processes)):
+                results.update(chunk)
+            print(
+                f"size {size}: {len(todo)} solved, {n_derived} derived, "
+                f"elapsed {time.perf_counter() - start:.0f}s",
+                flush=True,
+            )
+        pool.close()
+        pool.join()
+
+    return pd.DataFrame(
+        [
+            (
+                " + ".join(reaction_ids[i] for i in combination),
+                len(combination),
+                result.status,
+                result.growth,
+                result.solved,
+            )
+            for combination, result in sorted(
+                results.items(), key=lambda item: (len(item[0]), item[0])
+            )
+        ],
+        columns=["knockouts", "size", "status", "growth", "solved"],
+    )
+
+
+def write_screen(table: pd.DataFrame, output_dir):
+    """
+    Writes the table to output_dir/knockout_screen.tsv and the lethal combinations
+    with more than one knockout to output_dir/no_solution.txt, one per line. Like
+    results/Others/no_solution_V2.txt this includes the combinations that contain a
+    lethal single knockout (status lethal_subset).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_dir / "knockout_screen.tsv", sep="\t", index=False)
+    lethal = table[(table["status"] != "viable") & (table["size"] > 1)]
+    (output_dir / "no_solution.txt").write_text(
+        "".join(f"{knockouts}\n" for knockouts in lethal["knockouts"])
+    )
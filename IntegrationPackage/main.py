@@ -1,103 +1,502 @@
 import argparse
 import cli
+import pulp
 from pathlib import Path
 from methods.IMATConfig import IMATConfig
 from methods.iMAT import iMAT
 from methods.weighted_iMAT import weighted_iMAT
+from methods.SolverBackend import SolverOptions
 from utils.CreateOutput import CreateOutput
-from cobra.io import read_sbml_model
-from utils.generate_RNASeqDf import generate_RNASeqDf
-from utils.read_file import read_expression_file
+from utils.ModelLoader import file_hash, load_model, read_model
+from utils.ExpressionCache import load_expression, read_aligned_expression
+from utils.RunProfile import RunProfile
+from utils.SolutionCache import SolutionCache, solution_key
 
 
-def run_single(args):
-    model = read_sbml_model(args.model)
-    df = read_expression_file(args.expressionFile)
-    expression_df = generate_RNASeqDf(
-        model, df, args.geneColName, args.expressionColName
-    )
+def prepare_config(
+    model, expression_df, discretization, quantiles, epsilon, profile=None
+):
     config = IMATConfig(
         expression_df=expression_df,
-        discretization_method=args.discretization,
-        quantiles=args.quantiles,
-        epsilon=args.epsilon,
+        discretization_method=discretization,
+        quantiles=quantiles,
+        epsilon=epsilon,
         metabolicModel=model,
     )
-    config.prepare()
-
-    if args.method == "iMAT":
-        solver = iMAT(
-            metabolicModel=config.metabolicModel,
-            RH=config.RH,
-            RM=config.RM,
-            RL=config.RL,
-            epsilon=config.epsilon,
-            oxygenLevel=args.oxygenLevel,
-        )
+    config.prepare(profile)
+    return config
+
 
-    elif args.method == "weighted_iMAT":
-        solver = weighted_iMAT(
-            metabolicModel=config.metabolicModel,
-            RH=config.RH,
-            RM=config.RM,
-            RL=config.RL,
-            epsilon=config.epsilon,
-            oxygenLevel=args.oxygenLevel,
+def method_parameters(method, config):
+    """
+    Method specific solver fields taken from a prepared IMATConfig
+    """
+    if method == "weighted_iMAT":
+        return dict(
             gpr_mapper=config.gpr_mapper,
             lower_threshold_scaled=config.lower_threshold_scaled,
             upper_threshold_scaled=config.upper_threshold_scaled,
         )
+    return {}
+
+
+def create_solver(method, config, oxygenLevel):
+    methods = {"iMAT": iMAT, "weighted_iMAT": weighted_iMAT}
+    return methods[method](
+        metabolicModel=config.metabolicModel,
+        RH=config.RH,
+        RM=config.RM,
+        RL=config.RL,
+        epsilon=config.epsilon,
+        oxygenLevel=oxygenLevel,
+        reaction_index=config.reaction_index,
+        **method_parameters(method, config),
+    )
+
+
+def solver_options(args):
+    return SolverOptions(
+        backend=args.solver,
+        time_limit=args.timeLimit,
+        gap=args.mipGap,
+        node_limit=args.nodeLimit,
+        threads=args.threads,
+    )
+
+
+def output_writer(
+    solver,
+    config,
+    method,
+    output_dir,
+    fluxes,
+    y_values,
+    c_values,
+    solution_status=None,
+    gap=None,
+):
+    """
+    CreateOutput of a solution, an infeasible problem has empty fluxes and y_values
+    """
+    return CreateOutput(
+        output_dir=output_dir,
+        method=method,
+        prob=getattr(solver, "prob", None),
+        RH=config.RH,
+        RM=config.RM,
+        RL=config.RL,
+        flux_distribution=fluxes,
+        y_values=y_values,
+        c_values=c_values,
+        epsilon=config.epsilon,
+        oxygenLevel=solver.oxygenLevel,
+        expression_df=config.expression_df,
+        discretization_method=config.discretization_method,
+        quantiles=config.quantiles,
+        classes=getattr(config, "classes", None),
+        solution_status=solution_status,
+        gap=gap,
+    )
+
+
+def infeasible_by_precheck(
+    solver,
+    config,
+    method,
+    output_dir,
+    options,
+    fileName=None,
+    profile=None,
+    relaxation=False,
+):
+    """
+    Runs the feasibility precheck of the problem (BasePulpVarConfig.precheck), with
+    relaxation also on the LP relaxation.
+    An infeasible problem is written to the infeasible combinations with the check
+    that failed. Returns the failed check, None if the problem passed.
+    """
+    profile = profile or RunProfile(enabled=False)
+    with profile.stage("precheck"):
+        reason = solver.precheck(options=options, relaxation=relaxation)
+    if reason is None:
+        return None
+    profile.count(status="Infeasible", precheck=reason)
+    with profile.stage("output"):
+        genOutput = output_writer(solver, config, method, output_dir, {}, {}, None)
+        genOutput.handle_infeasibility(fileName=fileName, reason=reason)
+    return reason
 
-    solver.build_problem()
+
+def lookup_solution(solution_cache, model_hash, solver, options, profile=None):
+    """
+    Looks the problem of solver up in the SolutionCache, before it is built.
+    Returns (key, result), result is None if the problem was not solved before.
+    """
+    profile = profile or RunProfile(enabled=False)
+    with profile.stage("solution_cache"):
+        key = solution_key(model_hash, solver, options)
+        result = solution_cache.get(key)
+    profile.count(cached=result is not None)
+    return key, result
+
+
+def write_cached(
+    result, solver, config, method, output_dir, fileName=None, sink=None, profile=None
+):
+    """
+    Writes the output of a SolutionCache result like solve_and_write.
+    Returns (fluxes, y_values) of the solution, None if the problem is infeasible.
+    """
+    profile = profile or RunProfile(enabled=False)
+    profile.count(status=result["status"])
+    with profile.stage("output"):
+        if result["status"] == "Infeasible":
+            genOutput = output_writer(solver, config, method, output_dir, {}, {}, None)
+            genOutput.handle_infeasibility(fileName=fileName, reason=result["reason"])
+            return None
+        genOutput = output_writer(
+            solver,
+            config,
+            method,
+            output_dir,
+            result["fluxes"],
+            result["y_values"],
+            result["c_values"],
+            solution_status="optimal",
+            gap=result.get("gap"),
+        )
+        genOutput.create_output(fileName=fileName, sink=sink)
+    return result["fluxes"], result["y_values"]
+
+
+def solve_and_write(
+    solver,
+    config,
+    method,
+    output_dir,
+    options,
+    warm_start=None,
+    fileName=None,
+    sink=None,
+    profile=None,
+    precheck=True,
+    solution_cache=None,
+    cache_key=None,
+    write_incomplete=True,
+    precheck_relaxation=False,
+):
+    """
+    Solves the problem and writes the output, to a tsv file or to sink if given.
+    Returns (fluxes, y_values) of the solution, None if the problem is infeasible.
+    A solve stopped by the time or node limit returns its best solution
+    (solver.solution_status is feasible), its MIP gap is written with a result sink.
+    Raises TimeoutError if the limits are reached without a solution, the run is then
+    written to the infeasible combinations with reason "limit".
+    With a RunProfile the solve and output are timed and the solver statistics
+    counted.
+
+    :param precheck: Check the flux bounds first and skip the MILP if they are
+        infeasible
+    :param precheck_relaxation: Check the LP relaxation as well
+    :param solution_cache: SolutionCache that stores the result under cache_key
+        (see lookup_solution)
+    :param write_incomplete: Write the output of a solve stopped by the limits, if
+        False it is only returned (e.g. when the run is repeated with larger limits)
+    """
+    profile = profile or RunProfile(enabled=False)
+    if solution_cache is None:
+        cache_key = None
+    reason = None
+    if precheck:
+        reason = infeasible_by_precheck(
+            solver,
+            config,
+            method,
+            output_dir,
+            options,
+            fileName,
+            profile,
+            relaxation=precheck_relaxation,
+        )
+    if reason is not None:
+        if cache_key is not None:
+            solution_cache.put_infeasible(cache_key, reason)
+        return None
     try:
-        status, fluxes, sol_y_values, sol_c_values = solver.solve()
-        genOutput = CreateOutput(
-            output_dir=args.output,
-            method=args.method,
-            prob=solver.prob,
-            RH=config.RH,
-            RM=config.RM,
-            RL=config.RL,
-            flux_distribution=fluxes,
-            y_values=sol_y_values,
-            c_values=sol_c_values,
-            epsilon=config.epsilon,
-            oxygenLevel=solver.oxygenLevel,
-            expression_df=config.expression_df,
-            discretization_method=config.discretization_method,
-            quantiles=config.quantiles,
+        with profile.solver_log(options) as options, profile.stage("solve"):
+            status, fluxes, sol_y_values, sol_c_values = solver.solve(
+                warm_start=warm_start, options=options
+            )
+        profile.count(
+            status=pulp.LpStatus[status],
+            solution=solver.solution_status,
+            **solver.solver_statistics,
         )
-        genOutput.create_output()
+        gap = solver.solver_statistics["gap"]
+        if cache_key is not None:
+            solution_cache.put_solution(
+                cache_key,
+                status,
+                fluxes,
+                sol_y_values,
+                sol_c_values,
+                solution_status=solver.solution_status,
+                gap=gap,
+            )
+        if solver.solution_status == "feasible" and not write_incomplete:
+            return fluxes, sol_y_values
+        with profile.stage("output"):
+            genOutput = output_writer(
+                solver,
+                config,
+                method,
+                output_dir,
+                fluxes,
+                sol_y_values,
+                sol_c_values,
+                solution_status=solver.solution_status,
+                gap=gap,
+            )
+            genOutput.create_output(fileName=fileName, sink=sink)
+        return fluxes, sol_y_values
+    except TimeoutError:
+        profile.count(status="NoSolution", solution="none", **solver.solver_statistics)
+        if write_incomplete:
+            with profile.stage("output"):
+                genOutput = output_writer(
+                    solver, config, method, output_dir, {}, {}, None
+                )
+                genOutput.handle_infeasibility(fileName=fileName, reason="limit")
+        raise
     except InterruptedError:
         # infeasible Problem
-        genOutput = CreateOutput(
-            output_dir=args.output,
-            method=config.discretization_method,
-            prob=solver.prob,
-            RH=config.RH,
-            RM=config.RM,
-            RL=config.RL,
-            flux_distribution={},
-            y_values={},
-            c_values=None,
-            epsilon=config.epsilon,
-            oxygenLevel=args.oxygenLevel,
-            expression_df=config.expression_df,
-            discretization_method=args.discretization,
-            quantiles=config.quantiles,
+        profile.count(status="Infeasible", **solver.solver_statistics)
+        if cache_key is not None:
+            solution_cache.put_infeasible(cache_key)
+        with profile.stage("output"):
+            genOutput = output_writer(solver, config, method, output_dir, {}, {}, None)
+            genOutput.handle_infeasibility(fileName=fileName)
+
+
+def solve_pool_and_write(
+    solver,
+    config,
+    method,
+    output_dir,
+    options,
+    n_solutions,
+    gap=0.0,
+    fileName=None,
+    precheck=True,
+    precheck_relaxation=False,
+):
+    """
+    Enumerates up to n_solutions alternative optima, writes the first one as flux
+    file and the activity frequencies of the pool as <flux file>_pool.tsv.
+    Returns the pool, None if the problem is infeasible.
+    """
+    if precheck and infeasible_by_precheck(
+        solver,
+        config,
+        method,
+        output_dir,
+        options,
+        fileName,
+        relaxation=precheck_relaxation,
+    ):
+        return None
+    try:
+        pool = solver.enumerate_solutions(n_solutions, gap=gap, options=options)
+    except InterruptedError:
+        genOutput = output_writer(solver, config, method, output_dir, {}, {}, None)
+        genOutput.handle_infeasibility(fileName=fileName)
+        return None
+    except TimeoutError:
+        genOutput = output_writer(solver, config, method, output_dir, {}, {}, None)
+        genOutput.handle_infeasibility(fileName=fileName, reason="limit")
+        return None
+    fluxes, y_values = pool[0]
+    genOutput = output_writer(
+        solver,
+        config,
+        method,
+        output_dir,
+        fluxes,
+        y_values,
+        solver.c_values,
+        solution_status=solver.solution_status,
+        gap=solver.solver_statistics["gap"],
+    )
+    genOutput.create_output(fileName=fileName)
+    file = genOutput.create_pool_output(pool, fileName=fileName)
+    print(f"{len(pool)} solutions in the pool: {file}")
+    return pool
+
+
+def read_input_model(args):
+    """
+    Reads the model of the CLI arguments, through the model cache unless disabled
+    """
+    return read_model(args.model) if args.noModelCache else load_model(args.model)
+
+
+def read_input_expression(args, model):
+    """
+    Reads the expression column of the CLI arguments aligned with the model, through
+    the expression cache unless disabled
+    """
+    read = read_aligned_expression if args.noExpressionCache else load_expression
+    return read(
+        args.expressionFile,
+        model,
+        args.geneColName,
+        args.expressionColName,
+        args.idColNames,
+    )
+
+
+def input_solution_cache(args):
+    """
+    SolutionCache of the CLI arguments, None if disabled
+    """
+    return None if args.noSolutionCache else SolutionCache()
+
+
+def profile_fields(args, epsilon, quantiles):
+    """
+    Fields of the run written with its RunProfile
+    """
+    return dict(
+        method=args.method,
+        expressionFile=args.expressionFile,
+        expressionColName=args.expressionColName,
+        epsilon=epsilon,
+        quantiles=quantiles,
+        solver=args.solver,
+    )
+
+
+def run_single(args):
+    profile = RunProfile(enabled=args.profile is not None)
+    with profile.stage("read_model"):
+        model = read_input_model(args)
+    with profile.stage("read_expression"):
+        expression_df = read_input_expression(args, model)
+    config = prepare_config(
+        model,
+        expression_df,
+        args.discretization,
+        args.quantiles,
+        args.epsilon,
+        profile=profile,
+    )
+    solver = create_solver(args.method, config, args.oxygenLevel)
+
+    if args.poolSize > 1 and args.builder == "sparse":
+        raise ValueError("--poolSize needs the pulp builder")
+    if args.reduce and args.builder == "sparse":
+        raise ValueError("--reduce needs the pulp builder")
+
+    # solution pools are not cached
+    solution_cache = input_solution_cache(args) if args.poolSize == 1 else None
+    cache_key = None
+    if solution_cache is not None:
+        cache_key, cached = lookup_solution(
+            solution_cache, file_hash(args.model), solver, solver_options(args), profile
         )
-        genOutput.handle_infeasibility()
+        if cached is not None:
+            write_cached(
+                cached, solver, config, args.method, args.output, profile=profile
+            )
+            profile.write(
+                args.profile, **profile_fields(args, config.epsilon, config.quantiles)
+            )
+            return
+
+    with profile.stage("build"):
+        if args.builder == "sparse":
+            solver.build_sparse_problem()
+        else:
+            solver.build_problem(reduce=args.reduce)
+    profile.count_problem(solver.prob)
+    if args.poolSize > 1:
+        with profile.stage("solve"):
+            pool = solve_pool_and_write(
+                solver,
+                config,
+                args.method,
+                args.output,
+                solver_options(args),
+                args.poolSize,
+                gap=args.poolGap,
+                precheck=not args.noPrecheck,
+                precheck_relaxation=args.precheckRelaxation,
+            )
+        profile.count(solutions=len(pool) if pool else 0)
+    else:
+        try:
+            solve_and_write(
+                solver,
+                config,
+                args.method,
+                args.output,
+                solver_options(args),
+                profile=profile,
+                precheck=not args.noPrecheck,
+                precheck_relaxation=args.precheckRelaxation,
+                solution_cache=solution_cache,
+                cache_key=cache_key,
+            )
+        except TimeoutError as e:
+            print(e)
+        if solver.solution_status == "feasible":
+            print(
+                "Time or node limit reached, written the best solution found "
+                f"(MIP gap {solver.solver_statistics['gap']})"
+            )
+    profile.write(args.profile, **profile_fields(args, config.epsilon, config.quantiles))
 
 
 def main():
-    parallelization = False  # if True, reads from SensAnalysis.py
-    if parallelization == False:
-        # Terminal input
-        args = cli.build_parser().parse_args()
-        run_single(args)
+    args = cli.build_parser().parse_args()
+    if args.method == "sweep":
+        # Sensitivity analysis configured by a SensAnalysis.py file
+        from run_parallel import run_parallel
 
+        run_parallel(
+            args.config,
+            processes=args.processes,
+            output_dir=args.output,
+            resume=not args.noResume,
+            profile=args.profile,
+            time_limit=args.timeLimit,
+            mip_gap=args.mipGap,
+            node_limit=args.nodeLimit,
+            budget_rounds=args.budgetRounds,
+            threads=args.threads,
+        )
+    elif args.method == "export":
+        from utils.ResultStore import export_tsv
+
+        n_files = export_tsv(args.results, args.output)
+        print(f"Exported {n_files} files to {args.output}")
+    elif args.method == "screen":
+        from knockout_screen import screen_knockouts, write_screen
+
+        table = screen_knockouts(
+            args.model,
+            reaction_ids=args.reactions,
+            max_size=args.maxSize,
+            min_growth=args.minGrowth,
+            processes=args.processes,
+            model_cache=not args.noModelCache,
+        )
+        write_screen(table, args.output)
+        n_lethal = (table["status"] != "viable").sum()
+        print(f"{len(table)} combinations, {n_lethal} without growth: {args.output}")
     else:
-        raise ValueError("NOT IMPLEMENTED!")
+        # Terminal input
+        run_single(args)
 
 
 if __name__ == "__main__":
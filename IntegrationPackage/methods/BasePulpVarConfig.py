@@ -1,8 +1,49 @@
+import dataclasses
 from dataclasses import dataclass
 import pulp
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, FrozenSet, Tuple
 from cobra import Model
 import numpy as np
+from methods.SparseMILPBuilder import MILPMatrices, SparseMILPBuilder
+from methods.SolverBackend import SolverOptions, solution_status, solver_statistics
+from methods.presolve import blocked_reactions, bounds_feasible
+from utils.ReactionIndex import ReactionIndex
+
+# scipy.optimize.milp status -> PuLP status
+_SCIPY_TO_PULP_STATUS = {
+    0: pulp.LpStatusOptimal,
+    1: pulp.LpStatusNotSolved,
+    2: pulp.LpStatusInfeasible,
+    3: pulp.LpStatusUnbounded,
+    4: pulp.LpStatusUndefined,
+}
+
+
+def _expression(constraint: pulp.LpConstraint) -> pulp.LpAffineExpression:
+    """
+    Coefficient mapping of a constraint (PuLP >= 3 wraps it in .expr)
+    """
+    return getattr(constraint, "expr", constraint)
+
+
+def _value(var) -> Optional[float]:
+    """
+    Solution value of a variable, binaries removed by the problem reduction are
+    their fixed value
+    """
+    return var.varValue if isinstance(var, pulp.LpVariable) else var
+
+
+def _set_initial_value(var: pulp.LpVariable, value: Optional[float]):
+    """
+    Sets a start value clipped to the variable bounds, None clears it
+    """
+    if value is not None:
+        if var.lowBound is not None:
+            value = max(value, var.lowBound)
+        if var.upBound is not None:
+            value = min(value, var.upBound)
+    var.varValue = value
 
 
 @dataclass
@@ -13,46 +54,458 @@ class BasePulpVarConfig:
     RL: List[str]
     epsilon: float
     oxygenLevel: Optional[float]
+    # index of the model reactions shared with IMATConfig, built from the model if None
+    reaction_index: Optional[ReactionIndex] = dataclasses.field(
+        default=None, kw_only=True
+    )
+    # set by build_problem(reduce=True)
+    _reduce: bool = dataclasses.field(default=False, init=False)
+    _blocked: FrozenSet[str] = dataclasses.field(default=frozenset(), init=False)
+    # nodes and MIP gap of the last solve (see SolverBackend.solver_statistics)
+    solver_statistics: Dict[str, Optional[float]] = dataclasses.field(
+        default_factory=lambda: {"nodes": None, "gap": None}, init=False
+    )
+    # optimal, feasible or none (see SolverBackend.SOLUTION_STATUSES)
+    solution_status: Optional[str] = dataclasses.field(default=None, init=False)
 
-    def build_problem(self):
+    def build_problem(self, reduce: bool = False):
+        """
+        Builds the MILP. With reduce, blocked reactions (see methods.presolve) are
+        left out of the problem, binaries that can not be 1 or do not change the
+        objective are replaced by their fixed value and y_tot is not created.
+        solve() returns the fluxes and y values of all reactions in both cases.
+        """
         self.prob = pulp.LpProblem("iMAT", pulp.LpMaximize)
+        if self.reaction_index is None:
+            self.reaction_index = ReactionIndex.from_model(self.metabolicModel)
+        self._reduce = reduce
+        self._blocked = (
+            blocked_reactions(self.metabolicModel, self._flux_bounds)
+            if reduce
+            else frozenset()
+        )
         self.v_vars = self._create_flux_variables(self.prob)
         self.__add_mass_balance(self.prob, self.v_vars)
 
-    def solve(self, solver: Optional[pulp.LpSolver] = None):
+    def _binary_variables(self, rid: str, active: bool, weight: float = 1.0) -> tuple:
+        """
+        (y_tot, y_f, y_r) of a classified reaction. active: rH constraints, else rL.
+        In a reduced problem y_tot is None (y_f + y_r <= 1 is kept as row) and
+        binaries are fixed values if:
+        - the reaction is blocked (rL: y_f = 1, rH: 0)
+        - the flux bounds exclude the direction (rH) or zero flux (rL)
+        - the objective weight is not positive (rH)
+        - y_r of rL, which is in no constraint
+        """
+        if not self._reduce:
+            y_tot = pulp.LpVariable(f"y_tot_{rid}", cat="Binary")
+            y_f = pulp.LpVariable(f"yf_{rid}", cat="Binary")
+            y_r = pulp.LpVariable(f"yr_{rid}", cat="Binary")
+            self.prob += (
+                pulp.LpConstraint(
+                    pulp.LpAffineExpression([(y_tot, 1), (y_f, -1), (y_r, -1)]),
+                    pulp.LpConstraintEQ,
+                    rhs=0,
+                ),
+                f"y_tot_def_{rid}",
+            )
+            return y_tot, y_f, y_r
+        if rid in self._blocked:
+            return None, 0 if active else 1, 0
+        v = self.v_vars[rid]
+        lb = -np.inf if v.lowBound is None else v.lowBound
+        ub = np.inf if v.upBound is None else v.upBound
+        if active:
+            forward = weight > 0 and ub >= self.epsilon
+            reverse = weight > 0 and lb <= -self.epsilon
+        else:
+            forward, reverse = lb <= 0 <= ub, False
+        y_f = pulp.LpVariable(f"yf_{rid}", cat="Binary") if forward else 0
+        y_r = pulp.LpVariable(f"yr_{rid}", cat="Binary") if reverse else 0
+        if forward and reverse:
+            # implied by the rH constraints, but tightens the LP relaxation
+            self.prob += y_f + y_r <= 1, f"y_tot_def_{rid}"
+        return None, y_f, y_r
+
+    def _add_binary_constraints(self, rid: str, active: bool):
+        """
+        Adds the rH (active) or rL constraints linking the flux of the reaction to its
+        binaries. Fixed binaries of a reduced problem need no constraint.
+        """
+        _, y_f, y_r = self.y_vars[rid]
+        lb, ub = self.reaction_index.bounds(rid)
+        v = self.v_vars.get(rid)
+        # rows are built from coefficients, PuLP operators create an expression per term
+        if active:
+            rows = [
+                (y_f, lb - self.epsilon, pulp.LpConstraintGE, lb, "rH_forward_"),
+                (y_r, ub + self.epsilon, pulp.LpConstraintLE, ub, "rH_reverse_"),
+            ]
+        else:
+            # lb * (1 - y_f) <= v <= (1 - y_f) * ub
+            prefix = self._inactive_prefix
+            rows = [
+                (y_f, lb, pulp.LpConstraintGE, lb, f"{prefix}leftHandSide_"),
+                (y_f, ub, pulp.LpConstraintLE, ub, f"{prefix}rightHandSide_"),
+            ]
+        for y, coef, sense, rhs, name in rows:
+            if isinstance(y, pulp.LpVariable):
+                expression = pulp.LpAffineExpression([(v, 1), (y, coef)])
+                self.prob += pulp.LpConstraint(expression, sense, rhs=rhs), f"{name}{rid}"
+
+    def build_resident_problem(self):
+        """
+        Builds the mass-balance and flux-variable skeleton once. The binaries and the
+        rH/rL constraints of a reaction are created the first time it is classified and
+        afterwards only switched on or off by update_parameters(), so the points of an
+        epsilon/quantile sweep re-solve the same LpProblem instead of rebuilding it.
+        """
+        BasePulpVarConfig.build_problem(self)
+        self._resident: Dict[str, tuple] = {}
+        self._apply_parameters()
+
+    def update_parameters(
+        self,
+        RH: List[str],
+        RM: List[str],
+        RL: List[str],
+        epsilon: float,
+        **kwargs,
+    ):
+        """
+        Applies a new sweep point to the problem built by build_resident_problem.
+        Method specific fields (e.g. gpr_mapper and the scaled thresholds of
+        weighted_iMAT) are passed as keyword arguments.
+        """
+        for key in kwargs:
+            if key not in self.__dataclass_fields__:
+                raise ValueError(f"{type(self).__name__} has no parameter {key}")
+        self.RH, self.RM, self.RL, self.epsilon = RH, RM, RL, epsilon
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        self._apply_parameters()
+
+    def _apply_parameters(self):
+        """
+        Sets objective coefficients and (de)activates the rH/rL constraints of the
+        resident problem for the current classification and epsilon.
+        """
+        weights = self._objective_weights()
+        active = set(self._active_reactions())
+        for rid, entry in self._resident.items():
+            if rid not in weights:
+                self._switch_reaction(entry, None)
+
+        self.y_vars = {}
+        terms = []
+        for rid, (w_f, w_r) in weights.items():
+            entry = self._resident.get(rid)
+            if entry is None:
+                entry = self._add_resident_reaction(rid)
+            self._switch_reaction(entry, rid in active)
+            _, y_f, y_r = entry[0]
+            self.y_vars[rid] = entry[0]
+            terms += [(y_f, w_f), (y_r, w_r)]
+        self.prob.setObjective(
+            pulp.LpAffineExpression([(y, w) for y, w in terms if w != 0])
+        )
+
+    def _add_resident_reaction(self, rid: str) -> tuple:
+        """
+        Adds the binaries and the (inactive) rH/rL constraints of a reaction
+        """
+        v = self.v_vars[rid]
+        lb, ub = self.reaction_index.bounds(rid)
+        y_tot = pulp.LpVariable(f"y_tot_{rid}", cat="Binary")
+        y_f = pulp.LpVariable(f"yf_{rid}", cat="Binary")
+        y_r = pulp.LpVariable(f"yr_{rid}", cat="Binary")
+        self.prob += y_tot == y_f + y_r, f"y_tot_def_{rid}"
+
+        # without their binary term the rows reduce to the flux bounds
+        constraints = (
+            v >= lb,
+            v <= ub,
+            v >= lb,
+            v <= ub,
+        )
+        names = (
+            "rH_forward_",
+            "rH_reverse_",
+            f"{self._inactive_prefix}leftHandSide_",
+            f"{self._inactive_prefix}rightHandSide_",
+        )
+        for constraint, name in zip(constraints, names):
+            self.prob += constraint, f"{name}{rid}"
+
+        entry = ((y_tot, y_f, y_r), (lb, ub), constraints)
+        self._resident[rid] = entry
+        return entry
+
+    def _switch_reaction(self, entry: tuple, active: Optional[bool]):
+        """
+        active=True: rH constraints, active=False: rL constraints, None: unclassified
+        """
+        (y_tot, y_f, y_r), (lb, ub), constraints = entry
+        forward, reverse, left, right = (_expression(c) for c in constraints)
+        forward.pop(y_f, None)
+        reverse.pop(y_r, None)
+        left.pop(y_f, None)
+        right.pop(y_f, None)
+        if active:
+            forward[y_f] = lb - self.epsilon
+            reverse[y_r] = ub + self.epsilon
+        elif active is not None:
+            left[y_f] = lb
+            right[y_f] = ub
+
+    def build_sparse_problem(self):
+        """
+        Builds the same MILP as build_problem, but emitted in one vectorized pass as
+        sparse matrices (see SparseMILPBuilder). solve() then runs it in-process.
+        """
+        self.prob = SparseMILPBuilder(self.metabolicModel).build(
+            active=self._active_reactions(),
+            weights=self._objective_weights(),
+            epsilon=self.epsilon,
+            flux_bounds=self._flux_bounds,
+            inactive_prefix=self._inactive_prefix,
+        )
+
+    def solve(
+        self,
+        solver: Optional[pulp.LpSolver] = None,
+        warm_start: Optional[Tuple[Dict[str, float], Dict[str, List[float]]]] = None,
+        options: Optional[SolverOptions] = None,
+    ):
         """
         Solves the LP problem
+
+        solver: PuLP solver, if None it is created from options (default: CBC)
+        warm_start: optional (fluxes, y_values) of a previous solve(), e.g. of a
+            neighbouring sweep point, passed to the solver as MIP start (CBC only)
+        options: SolverOptions with backend, time, gap and node limit and threads
+        :raises InterruptedError: If the problem is infeasible
+        :raises TimeoutError: If the limits are reached without a solution. A solve
+            stopped with an incumbent returns it, solution_status is then feasible
+            and solver_statistics holds its gap.
         """
+        if options is None:
+            options = SolverOptions()
+        if isinstance(self.prob, MILPMatrices):
+            return self._solve_sparse(options)
+
+        if warm_start is not None:
+            self._set_initial_values(*warm_start)
         if solver is None:
-            solver = pulp.PULP_CBC_CMD(msg=1)
+            solver = options.create(warm_start=warm_start is not None)
 
         self.status = self.prob.solve(solver)
+        self.solver_statistics = solver_statistics(solver, self.prob)
+        self.solution_status = solution_status(solver, self.prob)
         if pulp.LpStatus[self.prob.status] == "Infeasible":
             # Save infeasible File
             raise InterruptedError(
                 f"Problem {self.prob.name} is INFEASIBLE and will be skipped"
             )
+        elif self.solution_status == "none":
+            raise TimeoutError(
+                f"Problem {self.prob.name} has no solution within the time and node "
+                "limit and will be skipped"
+            )
         else:
-            self.fluxes = {rid: self.v_vars[rid].varValue for rid in self.v_vars}
+            # blocked reactions of a reduced problem have no variable
+            self.fluxes = {
+                rct.id: _value(self.v_vars.get(rct.id, 0.0))
+                for rct in self.metabolicModel.reactions
+            }
             self.y_values = {
-                rid: [v.varValue for v in vals[1:3]]
-                for rid, vals in self.y_vars.items()
+                rid: [_value(v) for v in vals[1:3]] for rid, vals in self.y_vars.items()
             }
             self.c_values = self.c_vars if hasattr(self, "c_vars") else None
             return self.status, self.fluxes, self.y_values, self.c_values
 
+    def weights(self) -> Optional[Dict[str, float]]:
+        """
+        Objective weights of the method that are not given by RH, RM and RL, None for
+        iMAT. Does not need the built problem.
+        """
+        return None
+
+    def precheck(
+        self, options: Optional[SolverOptions] = None, relaxation: bool = False
+    ) -> Optional[str]:
+        """
+        Fast feasibility checks before the MILP: the mass balance within the flux
+        bounds of the problem (incl. the oxygen level), cached per bounds. If it is
+        infeasible, so is the MILP.
+        With relaxation, the continuous relaxation of the built problem is solved as
+        well. Off by default: with all binaries 0 the rH/rL constraints leave the
+        fluxes within their bounds, so the relaxation of a problem that passed the
+        bounds check is feasible. It only adds a solve, unless the problem has
+        further constraints.
+
+        options: SolverOptions of the relaxation, the limits (time, gap, nodes) are not
+            used
+        :return: None if the checks pass, else "bounds" or "relaxation"
+        """
+        if not bounds_feasible(self.metabolicModel, self._flux_bounds):
+            return "bounds"
+        if not relaxation:
+            return None
+        if options is None:
+            options = SolverOptions()
+        if isinstance(self.prob, MILPMatrices):
+            result = self.prob.solve(msg=options.msg, relax=True)
+            status = _SCIPY_TO_PULP_STATUS.get(result.status, pulp.LpStatusUndefined)
+        else:
+            relaxation = dataclasses.replace(
+                options, time_limit=None, gap=None, node_limit=None
+            )
+            status = self.prob.solve(relaxation.create(mip=False))
+            # the relaxed values are no MIP start
+            for var in self.prob.variables():
+                var.varValue = None
+        return "relaxation" if status == pulp.LpStatusInfeasible else None
+
+    def enumerate_solutions(
+        self,
+        n_solutions: int,
+        gap: float = 0.0,
+        options: Optional[SolverOptions] = None,
+    ) -> List[Tuple[Dict[str, float], Dict[str, List[float]]]]:
+        """
+        Collects up to n_solutions alternative (near-)optimal solutions. After the
+        first solve the objective is bounded below by the optimum (minus gap), then
+        each solution is cut off by an integer cut on the objective binaries and the
+        same problem is solved again, until it is infeasible or the pool is full.
+        The pool constraints are removed afterwards, solution_status and
+        solver_statistics are those of the first solve.
+
+        n_solutions: Maximal number of solutions
+        gap: Relative distance to the optimum of the solutions, 0 for optimal ones
+        options: SolverOptions with backend, time limit, MIP gap and threads
+        :return: List of (fluxes, y_values), the first one is the optimum
+        """
+        if isinstance(self.prob, MILPMatrices):
+            raise ValueError(
+                "Solution pools need a PuLP problem (build_problem or "
+                "build_resident_problem)"
+            )
+        if options is None:
+            options = SolverOptions()
+        solver = options.create()
+        _, fluxes, y_values, _ = self.solve(solver=solver)
+        pool = [(fluxes, y_values)]
+        first_solve = (self.solution_status, self.solver_statistics)
+        optimum = pulp.value(self.prob.objective)
+        binaries = [
+            var for var, coef in self.prob.objective.items() if coef != 0 and var.isBinary()
+        ]
+        names = ["pool_objective"]
+        self.prob += (
+            self.prob.objective >= optimum - gap * abs(optimum),
+            "pool_objective",
+        )
+        try:
+            while len(pool) < n_solutions:
+                ones = [var for var in binaries if round(var.varValue) == 1]
+                zeros = [var for var in binaries if round(var.varValue) == 0]
+                names.append(f"pool_cut_{len(pool)}")
+                self.prob += (
+                    pulp.lpSum(1 - var for var in ones) + pulp.lpSum(zeros) >= 1,
+                    names[-1],
+                )
+                try:
+                    status, fluxes, y_values, _ = self.solve(solver=solver)
+                except (InterruptedError, TimeoutError):
+                    # no further solution (within the limits)
+                    break
+                if status != pulp.LpStatusOptimal:
+                    break
+                pool.append((fluxes, y_values))
+        finally:
+            for name in names:
+                del self.prob.constraints[name]
+            self.solution_status, self.solver_statistics = first_solve
+        return pool
+
+    def _set_initial_values(
+        self, fluxes: Dict[str, float], y_values: Dict[str, List[float]]
+    ):
+        """
+        Sets the MIP start. Variables without a previous value are left to the solver.
+        """
+        for rid, v in self.v_vars.items():
+            _set_initial_value(v, fluxes.get(rid))
+        for rid, (y_tot, y_f, y_r) in self.y_vars.items():
+            yf, yr = y_values.get(rid, (None, None))
+            if yf is None or yr is None:
+                yf = yr = None
+            else:
+                yf, yr = round(yf), round(yr)
+            for var, value in ((y_f, yf), (y_r, yr)):
+                if isinstance(var, pulp.LpVariable):
+                    _set_initial_value(var, value)
+            if y_tot is not None:
+                _set_initial_value(y_tot, None if yf is None else yf + yr)
+
+    def _solve_sparse(self, options: SolverOptions):
+        """
+        Solves the problem created by build_sparse_problem in-process with HiGHS
+        (scipy), whatever the backend of the options
+        """
+        result = self.prob.solve(
+            time_limit=options.time_limit,
+            mip_rel_gap=options.gap,
+            msg=options.msg,
+            node_limit=options.node_limit,
+        )
+        self.status = _SCIPY_TO_PULP_STATUS.get(result.status, pulp.LpStatusUndefined)
+        self.solver_statistics = {
+            "nodes": getattr(result, "mip_node_count", None),
+            "gap": getattr(result, "mip_gap", None),
+        }
+        # status 1: time or node limit reached, with an incumbent if x is set
+        if result.status == 0:
+            self.solution_status = "optimal"
+        elif result.status == 1 and result.x is not None:
+            self.solution_status = "feasible"
+        else:
+            self.solution_status = "none"
+        if self.status == pulp.LpStatusInfeasible:
+            raise InterruptedError(
+                f"Problem {self.prob.name} is INFEASIBLE and will be skipped"
+            )
+        if self.solution_status == "none":
+            raise TimeoutError(
+                f"Problem {self.prob.name} has no solution within the time and node "
+                "limit and will be skipped"
+            )
+
+        n = self.prob.n_reactions
+        x = result.x if result.x is not None else np.full(self.prob.A.shape[1], None)
+        y_f = x[self.prob.y_forward_slice()]
+        y_r = x[self.prob.y_reverse_slice()]
+        self.fluxes = dict(zip(self.prob.reaction_ids, x[:n]))
+        self.y_values = {
+            rid: [yf, yr] for rid, yf, yr in zip(self.prob.y_reaction_ids, y_f, y_r)
+        }
+        self.c_values = self.c_vars if hasattr(self, "c_vars") else None
+        return self.status, self.fluxes, self.y_values, self.c_values
+
     def __add_mass_balance(
         self, prob: pulp.LpProblem, v_vars: Dict[str, pulp.LpVariable]
     ):
         for met in self.metabolicModel.metabolites:
-            constraint = (
-                pulp.lpSum(
-                    rct.metabolites.get(met, 0) * v_vars[rct.id]
-                    for rct in met.reactions
-                )
-                == 0
-            )
-            prob += constraint, f"mass_balance:{met.id}"
+            terms = [
+                rct.metabolites.get(met, 0) * v_vars[rct.id]
+                for rct in met.reactions
+                if rct.id in v_vars
+            ]
+            # all reactions of the metabolite blocked
+            if not terms:
+                continue
+            prob += pulp.lpSum(terms) == 0, f"mass_balance:{met.id}"
 
     def _create_flux_variables(
         self, prob: pulp.LpProblem
@@ -62,27 +515,10 @@ class BasePulpVarConfig:
 
         for rct in self.metabolicModel.reactions:
             rid = rct.id
-            lb = rct.lower_bound
-            ub = rct.upper_bound
-
-            if self.oxygenLevel is not None and rid == "EX_o2_e":
-                v = pulp.LpVariable(f"v_{rid}", self.oxygenLevel, self.oxygenLevel)
-            # CII only runs forward
-            elif rid == "CII":
-                v = pulp.LpVariable(f"v_{rid}", 0.0, 1000.0, cat="Continuous")
-            # Glucose transporter constraint
-            elif rid == "GLCt1r":
-                v = pulp.LpVariable(f"v_{rid}", lb, 5.0, cat="Continuous")
-            # Creatine/ Phosphocreatine exchange
-            elif rid == "r0942":
-                v = pulp.LpVariable(f"v_{rid}", -0.05, 1000.0, cat="Continuous")
-            elif rid == "r0942b_mitoMap":
-                v = pulp.LpVariable(f"v_{rid}", -0.05, 1000.0, cat="Continuous")
-
-            elif lb == np.inf or ub == np.inf:
-                v = pulp.LpVariable(f"v_{rid}", cat="Continuous")
-            else:
-                v = pulp.LpVariable(f"v_{rid}", lb, ub, cat="Continuous")
+            if rid in self._blocked:
+                continue
+            lb, ub = self._flux_bounds(rid, rct.lower_bound, rct.upper_bound)
+            v = pulp.LpVariable(f"v_{rid}", lb, ub, cat="Continuous")
             v_vars[rid] = v
         # Constrain CKc and CK to run in the same direction to avoid loop
         # y_creatine = pulp.LpVariable('y_CK_sign', cat = 'Binary')
@@ -95,3 +531,28 @@ class BasePulpVarConfig:
         # prob += v_CKc  >= -M_ck * (1 - y_creatine), f"CKc_pos_lower_if_y1"
 
         return v_vars
+
+    def _flux_bounds(
+        self, rid: str, lb: float, ub: float
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Returns the (lower, upper) bound of the flux variable of reaction rid.
+        None stands for an unbounded side.
+        """
+        if self.oxygenLevel is not None and rid == "EX_o2_e":
+            return self.oxygenLevel, self.oxygenLevel
+        # CII only runs forward
+        elif rid == "CII":
+            return 0.0, 1000.0
+        # Glucose transporter constraint
+        elif rid == "GLCt1r":
+            return lb, 5.0
+        # Creatine/ Phosphocreatine exchange
+        elif rid == "r0942":
+            return -0.05, 1000.0
+        elif rid == "r0942b_mitoMap":
+            return -0.05, 1000.0
+
+        elif lb == np.inf or ub == np.inf:
+            return None, None
+        return lb, ub
@@ -5,6 +5,8 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from utils.Discretizer import Discretizer, DiscretizationMethod
 from utils.GPRMapper import GPRMapper
+from utils.ReactionIndex import ReactionClasses, ReactionIndex
+from utils.RunProfile import RunProfile
 from cobra import Model
 from typing import Optional, List
 
@@ -20,6 +22,12 @@ class IMATConfig:
     oxygenLevel: Oxygen uptake constraint value.
      metabolicModel : cobra.Model
         SBML metabolic model loaded via COBRApy.
+
+    reaction_index: Index of the model reactions (utils.ReactionIndex), built from the
+        model if None. Shared by the GPR mapping and the solver.
+
+    After prepare() the reaction classes are available as lists (RL, RM, RH) and as
+    masks over the reaction index of the model (classes, see utils.ReactionIndex).
     """
 
     expression_df: pd.DataFrame
@@ -27,10 +35,13 @@ class IMATConfig:
     quantiles: Optional[List[int]]
     epsilon: Optional[float]
     metabolicModel: Model
+    reaction_index: Optional[ReactionIndex] = None
 
     def __post_init__(self):
         if self.epsilon is None:
             self.epsilon = 1.0
+        if self.reaction_index is None:
+            self.reaction_index = ReactionIndex.from_model(self.metabolicModel)
 
         # Find out whether human or mice gene IDs
         if self.expression_df.index[0].startswith("MXAN"):
@@ -47,21 +58,62 @@ class IMATConfig:
                 self.discretization_method
             )
         # Quantile Check
-        if self.discretization_method.QUANTILE:
+        if self.discretization_method == DiscretizationMethod.QUANTILE:
             if self.quantiles is None:
                 self.quantiles = [40, 70]
 
             if self.quantiles[0] >= self.quantiles[1]:
                 raise ValueError("Lower quantile must be smaller than upper quantile.")
+        else:
+            # mean discretization has no quantiles, outputs are named "mean"
+            self.quantiles = None
 
-    def prepare(self):
+    def prepare(self, profile: Optional[RunProfile] = None):
         """
         Runs full preprocessing pipeline:
         1. Discretize expression
         2. Map GPR to reaction
+
+        :param profile: Optional RunProfile, times both stages
         """
-        self._apply_discretization()
-        self._map_GPR_to_reaction()
+        profile = profile or RunProfile(enabled=False)
+        with profile.stage("discretization"):
+            self._apply_discretization()
+        with profile.stage("gpr_mapping"):
+            self._map_GPR_to_reaction()
+
+    def prepare_from_batch(self, batch, classes, rule: int, sample: int):
+        """
+        Alternative to prepare(): takes the discretization and the reaction classes of
+        one rule and sample from a batch (utils.Discretizer.discretize_batch and
+        utils.GPRMapper.classify_batch). expression_df must hold the sample column.
+        """
+        self.expression_df = batch.dataframe(rule, sample, self.expression_df)
+        self.lower_threshold_scaled, self.upper_threshold_scaled = (
+            batch.scaled_thresholds[rule, sample].tolist()
+        )
+        self.gpr_mapper = GPRMapper(
+            self.metabolicModel,
+            self.expression_df,
+            self.ignore_human,
+            reaction_index=self.reaction_index,
+        )
+        output = classes.classes(rule, sample)
+        self.gpr_mapper.RL, self.gpr_mapper.RM, self.gpr_mapper.RH = (
+            output.RL,
+            output.RM,
+            output.RH,
+        )
+        self.gpr_mapper.classes = ReactionClasses(
+            self.reaction_index,
+            RL=classes.RL[rule, sample],
+            RM=classes.RM[rule, sample],
+            RH=classes.RH[rule, sample],
+        )
+        self.classes = self.gpr_mapper.classes
+        self.RL = output.RL
+        self.RM = output.RM
+        self.RH = output.RH
 
     def _apply_discretization(self):
         discretizer = Discretizer(
@@ -75,9 +127,13 @@ class IMATConfig:
 
     def _map_GPR_to_reaction(self):
         self.gpr_mapper = GPRMapper(
-            self.metabolicModel, self.expression_df, self.ignore_human
+            self.metabolicModel,
+            self.expression_df,
+            self.ignore_human,
+            reaction_index=self.reaction_index,
         )
         output = self.gpr_mapper.create_reaction_classes()
+        self.classes = self.gpr_mapper.classes
         self.RL = output.RL
         self.RM = output.RM
         self.RH = output.RH
@@ -0,0 +1,286 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+import pulp
+
+BACKENDS = ["cbc", "highs", "glpk"]
+
+# solution_status of a solve: proven optimal (within the MIP gap), best incumbent when
+# the time or node limit was reached, no solution within the limits
+SOLUTION_STATUSES = ["optimal", "feasible", "none"]
+
+
+class GLPK_SWIG(pulp.LpSolver):
+    """
+    In-process GLPK through swiglpk (installed with cobra/optlang). Passes the problem
+    directly to the GLPK library instead of writing and parsing files.
+    """
+
+    name = "GLPK_SWIG"
+
+    def __init__(self, mip=True, msg=True, timeLimit=None, gapRel=None, **kwargs):
+        super().__init__(mip=mip, msg=msg, timeLimit=timeLimit, **kwargs)
+        self.gapRel = gapRel
+
+    def available(self):
+        try:
+            import swiglpk  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def actualSolve(self, lp, **kwargs):
+        import swiglpk as glp
+
+        glp.glp_term_out(glp.GLP_ON if self.msg else glp.GLP_OFF)
+        prob = glp.glp_create_prob()
+        try:
+            variables = self._load_problem(glp, prob, lp)
+            status, integer = self._run(glp, prob, lp, variables)
+            if status in (pulp.LpStatusOptimal, pulp.LpStatusNotSolved):
+                value = glp.glp_mip_col_val if integer else glp.glp_get_col_prim
+                lp.assignVarsVals(
+                    {var.name: value(prob, j + 1) for j, var in enumerate(variables)}
+                )
+        finally:
+            glp.glp_delete_prob(prob)
+        # an incumbent of a stopped MIP
+        feasible = status == pulp.LpStatusNotSolved and integer
+        lp.assignStatus(status, pulp.LpSolutionIntegerFeasible if feasible else None)
+        return status
+
+    def _load_problem(self, glp, prob, lp):
+        variables = lp.variables()
+        index = {var.name: j + 1 for j, var in enumerate(variables)}
+        maximize = lp.sense == pulp.LpMaximize
+        glp.glp_set_obj_dir(prob, glp.GLP_MAX if maximize else glp.GLP_MIN)
+
+        glp.glp_add_cols(prob, len(variables))
+        for j, var in enumerate(variables, start=1):
+            glp.glp_set_col_bnds(prob, j, *_glpk_bounds(glp, var.lowBound, var.upBound))
+            if self.mip and var.cat == pulp.LpInteger:
+                glp.glp_set_col_kind(prob, j, glp.GLP_IV)
+        if lp.objective is not None:
+            for var, coef in lp.objective.items():
+                glp.glp_set_obj_coef(prob, index[var.name], coef)
+            glp.glp_set_obj_coef(prob, 0, lp.objective.constant)
+
+        constraints = list(lp.constraints.values())
+        glp.glp_add_rows(prob, len(constraints))
+        ia, ja, ar = [0], [0], [0.0]
+        for i, constraint in enumerate(constraints, start=1):
+            rhs = -constraint.constant
+            if constraint.sense == pulp.LpConstraintEQ:
+                glp.glp_set_row_bnds(prob, i, glp.GLP_FX, rhs, rhs)
+            elif constraint.sense == pulp.LpConstraintLE:
+                glp.glp_set_row_bnds(prob, i, glp.GLP_UP, 0.0, rhs)
+            else:
+                glp.glp_set_row_bnds(prob, i, glp.GLP_LO, rhs, 0.0)
+            for var, coef in constraint.items():
+                if coef != 0:
+                    ia.append(i)
+                    ja.append(index[var.name])
+                    ar.append(coef)
+
+        ne = len(ia) - 1
+        ia_arr, ja_arr, ar_arr = (
+            glp.intArray(ne + 1),
+            glp.intArray(ne + 1),
+            glp.doubleArray(ne + 1),
+        )
+        for k in range(1, ne + 1):
+            ia_arr[k], ja_arr[k], ar_arr[k] = ia[k], ja[k], ar[k]
+        glp.glp_load_matrix(prob, ne, ia_arr, ja_arr, ar_arr)
+        return variables
+
+    def _run(self, glp, prob, lp, variables):
+        """
+        Returns (PuLP status, whether the MIP solution is read)
+        """
+        integer = self.mip and any(var.cat == pulp.LpInteger for var in variables)
+        msg_lev = glp.GLP_MSG_ON if self.msg else glp.GLP_MSG_OFF
+        if not integer:
+            smcp = glp.glp_smcp()
+            glp.glp_init_smcp(smcp)
+            smcp.presolve = glp.GLP_ON
+            smcp.msg_lev = msg_lev
+            if self.timeLimit is not None:
+                smcp.tm_lim = int(self.timeLimit * 1000)
+            ret = glp.glp_simplex(prob, smcp)
+            if ret in (glp.GLP_ENOPFS, glp.GLP_ENODFS):
+                return pulp.LpStatusInfeasible, False
+            status = glp.glp_get_status(prob)
+            return (
+                {
+                    glp.GLP_OPT: pulp.LpStatusOptimal,
+                    glp.GLP_NOFEAS: pulp.LpStatusInfeasible,
+                    glp.GLP_INFEAS: pulp.LpStatusInfeasible,
+                    glp.GLP_UNBND: pulp.LpStatusUnbounded,
+                }.get(status, pulp.LpStatusUndefined),
+                False,
+            )
+
+        iocp = glp.glp_iocp()
+        glp.glp_init_iocp(iocp)
+        iocp.presolve = glp.GLP_ON
+        iocp.msg_lev = msg_lev
+        if self.timeLimit is not None:
+            iocp.tm_lim = int(self.timeLimit * 1000)
+        if self.gapRel is not None:
+            iocp.mip_gap = self.gapRel
+        ret = glp.glp_intopt(prob, iocp)
+        if ret in (glp.GLP_ENOPFS, glp.GLP_ENODFS):
+            return pulp.LpStatusInfeasible, True
+        status = glp.glp_mip_status(prob)
+        if status == glp.GLP_OPT:
+            return pulp.LpStatusOptimal, True
+        if status == glp.GLP_FEAS:
+            # stopped by the time limit or gap with an incumbent
+            return pulp.LpStatusNotSolved, True
+        if status == glp.GLP_NOFEAS:
+            return pulp.LpStatusInfeasible, True
+        return pulp.LpStatusNotSolved, False
+
+
+class HiGHS_LIMITS(pulp.HiGHS):
+    """
+    pulp.HiGHS that also reads the incumbent of a solve stopped by the node limit
+    (mip_max_nodes), whose model status PuLP does not map
+    """
+
+    name = "HiGHS_LIMITS"
+
+    def findSolutionValues(self, lp):
+        import highspy
+
+        if lp.solverModel.getModelStatus() != highspy.HighsModelStatus.kSolutionLimit:
+            return super().findSolutionValues(lp)
+        if lp.solverModel.getInfo().primal_solution_status == 0:
+            return pulp.LpStatusNotSolved, pulp.LpSolutionNoSolutionFound
+        values = lp.solverModel.getSolution().col_value
+        for var in lp.variables():
+            var.varValue = values[var.index]
+        return pulp.LpStatusOptimal, pulp.LpSolutionIntegerFeasible
+
+
+def _glpk_bounds(glp, lb: Optional[float], ub: Optional[float]):
+    if lb is None and ub is None:
+        return glp.GLP_FR, 0.0, 0.0
+    if ub is None:
+        return glp.GLP_LO, lb, 0.0
+    if lb is None:
+        return glp.GLP_UP, 0.0, ub
+    if lb == ub:
+        return glp.GLP_FX, lb, ub
+    return glp.GLP_DB, lb, ub
+
+
+@dataclass
+class SolverOptions:
+    """
+    backend: cbc (CBC subprocess via LP files), highs (in-process HiGHS, needs highspy)
+        or glpk (in-process GLPK via swiglpk)
+    time_limit: Time limit per solve in seconds
+    gap: Relative MIP gap at which the solver stops
+    node_limit: Maximal number of branch-and-bound nodes per solve (not supported by
+        glpk)
+    threads: Number of solver threads (not supported by glpk)
+    msg: Print the solver log
+    log_path: File of the cbc log (read by solver_statistics)
+    """
+
+    backend: str = "cbc"
+    time_limit: Optional[float] = None
+    gap: Optional[float] = None
+    node_limit: Optional[int] = None
+    threads: Optional[int] = None
+    msg: bool = True
+    log_path: Optional[str] = None
+
+    def create(self, mip: bool = True, warm_start: bool = False) -> pulp.LpSolver:
+        """
+        Returns the PuLP solver of the backend. Warm starts are only used by cbc.
+        """
+        if self.backend == "cbc":
+            return pulp.PULP_CBC_CMD(
+                mip=mip,
+                msg=self.msg,
+                timeLimit=self.time_limit,
+                gapRel=self.gap,
+                threads=self.threads,
+                warmStart=warm_start,
+                logPath=self.log_path,
+                maxNodes=self.node_limit,
+            )
+        elif self.backend == "highs":
+            limits = {}
+            if self.node_limit is not None:
+                limits["mip_max_nodes"] = int(self.node_limit)
+            solver = HiGHS_LIMITS(
+                mip=mip,
+                msg=self.msg,
+                timeLimit=self.time_limit,
+                gapRel=self.gap,
+                threads=self.threads,
+                **limits,
+            )
+        elif self.backend == "glpk":
+            solver = GLPK_SWIG(
+                mip=mip, msg=self.msg, timeLimit=self.time_limit, gapRel=self.gap
+            )
+        else:
+            raise ValueError(
+                f"Unknown solver backend {self.backend}, choose from {BACKENDS}"
+            )
+        if not solver.available():
+            raise ValueError(
+                f"Solver backend {self.backend} is not available "
+                "(highs needs highspy, glpk needs swiglpk)."
+            )
+        return solver
+
+
+def solver_statistics(
+    solver: pulp.LpSolver, prob: pulp.LpProblem
+) -> Dict[str, Optional[float]]:
+    """
+    Branch-and-bound nodes and relative MIP gap of the last solve of prob, None
+    where the backend does not report them. highs reports both, cbc only in its log
+    (SolverOptions.log_path), glpk none.
+    """
+    stats = {"nodes": None, "gap": None}
+    if isinstance(solver, pulp.HiGHS) and getattr(prob, "solverModel", None):
+        info = prob.solverModel.getInfo()
+        stats.update(nodes=info.mip_node_count, gap=info.mip_gap)
+    elif isinstance(solver, pulp.PULP_CBC_CMD) and solver.optionsDict.get("logPath"):
+        try:
+            with open(solver.optionsDict["logPath"]) as f:
+                log = f.read()
+        except OSError:
+            return stats
+        nodes = re.findall(r"Enumerated nodes:\s+(\d+)", log)
+        gap = re.findall(r"^Gap:\s+([-\d.eE+]+)", log, re.MULTILINE)
+        if nodes:
+            stats["nodes"] = int(nodes[-1])
+        if gap:
+            # negative for maximization problems
+            stats["gap"] = abs(float(gap[-1]))
+        elif "Optimal solution found" in log:
+            stats["gap"] = 0.0
+    return stats
+
+
+def solution_status(solver: pulp.LpSolver, prob: pulp.LpProblem) -> str:
+    """
+    optimal, feasible or none (see SOLUTION_STATUSES) for the last solve of prob.
+    A solve stopped by the time or node limit is feasible if it has an incumbent.
+    """
+    if prob.sol_status == pulp.LpSolutionOptimal:
+        return "optimal"
+    if prob.sol_status != pulp.LpSolutionIntegerFeasible:
+        return "none"
+    # highs also reports a stopped solve without incumbent as integer feasible
+    if isinstance(solver, pulp.HiGHS) and getattr(prob, "solverModel", None):
+        if prob.solverModel.getInfo().primal_solution_status == 0:
+            return "none"
+    return "feasible"
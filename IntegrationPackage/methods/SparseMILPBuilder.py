@@ -0,0 +1,333 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, TextIO, Tuple
+from weakref import WeakKeyDictionary
+from cobra import Model
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+import numpy as np
+
+
+# Stoichiometric matrices per model object, with the stoichiometry they were
+# extracted from
+_STOICHIOMETRY_CACHE: "WeakKeyDictionary[Model, Tuple[tuple, Tuple[sparse.csr_matrix, List[str], List[str]]]]" = (
+    WeakKeyDictionary()
+)
+
+
+def stoichiometric_matrix(
+    metabolicModel: Model,
+) -> Tuple[sparse.csr_matrix, List[str], List[str]]:
+    """
+    Returns the stoichiometric matrix S (metabolites x reactions) of the model as a
+    CSR matrix, together with the metabolite and reaction ids giving the row and
+    column order. The matrix is cached per model object and extracted again if
+    reactions, metabolites or coefficients changed since. Bounds are not part of it.
+    """
+    stoichiometry = (
+        tuple(met.id for met in metabolicModel.metabolites),
+        tuple(
+            (rct.id, tuple(rct.metabolites.items()))
+            for rct in metabolicModel.reactions
+        ),
+    )
+    cached = _STOICHIOMETRY_CACHE.get(metabolicModel)
+    if cached is not None and cached[0] == stoichiometry:
+        return cached[1]
+
+    met_ids = [met.id for met in metabolicModel.metabolites]
+    rxn_ids = [rct.id for rct in metabolicModel.reactions]
+    met_index = {mid: i for i, mid in enumerate(met_ids)}
+
+    rows, cols, vals = [], [], []
+    for j, rct in enumerate(metabolicModel.reactions):
+        for met, coef in rct.metabolites.items():
+            rows.append(met_index[met.id])
+            cols.append(j)
+            vals.append(coef)
+
+    S = sparse.csr_matrix(
+        (np.asarray(vals, dtype=float), (rows, cols)),
+        shape=(len(met_ids), len(rxn_ids)),
+    )
+    _STOICHIOMETRY_CACHE[metabolicModel] = (stoichiometry, (S, met_ids, rxn_ids))
+    return S, met_ids, rxn_ids
+
+
+@dataclass
+class MILPMatrices:
+    """
+    Matrix form of an iMAT MILP:
+
+        maximize c @ x  s.t.  row_lb <= A @ x <= row_ub,  col_lb <= x <= col_ub
+
+    Columns are ordered [v (all reactions) | y_tot | y_f | y_r], the three binary blocks
+    follow the order of y_reaction_ids.
+    """
+
+    name: str
+    A: sparse.csr_matrix
+    row_lb: np.ndarray
+    row_ub: np.ndarray
+    col_lb: np.ndarray
+    col_ub: np.ndarray
+    c: np.ndarray
+    integrality: np.ndarray
+    col_names: List[str]
+    row_names: List[str]
+    reaction_ids: List[str]
+    y_reaction_ids: List[str]
+
+    @property
+    def n_reactions(self) -> int:
+        return len(self.reaction_ids)
+
+    @property
+    def n_binary_reactions(self) -> int:
+        return len(self.y_reaction_ids)
+
+    def y_forward_slice(self) -> slice:
+        start = self.n_reactions + self.n_binary_reactions
+        return slice(start, start + self.n_binary_reactions)
+
+    def y_reverse_slice(self) -> slice:
+        start = self.n_reactions + 2 * self.n_binary_reactions
+        return slice(start, start + self.n_binary_reactions)
+
+    def solve(
+        self,
+        time_limit: Optional[float] = None,
+        mip_rel_gap: Optional[float] = None,
+        msg: bool = False,
+        relax: bool = False,
+        node_limit: Optional[int] = None,
+    ):
+        """
+        Solves the MILP in-process with scipy.optimize.milp (HiGHS).
+        Returns the scipy OptimizeResult.
+
+        :param relax: Solve the continuous relaxation instead
+        """
+        options = {"disp": msg}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        if mip_rel_gap is not None:
+            options["mip_rel_gap"] = mip_rel_gap
+        if node_limit is not None:
+            options["node_limit"] = int(node_limit)
+        # milp minimizes
+        return milp(
+            c=-self.c,
+            constraints=LinearConstraint(self.A, self.row_lb, self.row_ub),
+            integrality=np.zeros_like(self.integrality) if relax else self.integrality,
+            bounds=Bounds(self.col_lb, self.col_ub),
+            options=options,
+        )
+
+    def to_mps(self, stream: TextIO):
+        """
+        Writes the problem in free MPS format to an open text stream
+        (file or io.StringIO). Rows and columns keep the names of the PuLP problem.
+        """
+        row_lb, row_ub = self.row_lb, self.row_ub
+        equal = row_lb == row_ub
+        lower_only = np.isfinite(row_lb) & ~np.isfinite(row_ub)
+        row_types = np.where(equal, "E", np.where(lower_only, "G", "L"))
+        ranged = ~equal & np.isfinite(row_lb) & np.isfinite(row_ub)
+
+        lines = [f"NAME {self.name}", "OBJSENSE", "    MAX", "ROWS", " N  OBJ"]
+        lines += [f" {t}  {n}" for t, n in zip(row_types, self.row_names)]
+
+        lines.append("COLUMNS")
+        A = self.A.tocsc()
+        in_integer_block = False
+        for j, col in enumerate(self.col_names):
+            if self.integrality[j] and not in_integer_block:
+                lines.append("    MARKER  'MARKER'  'INTORG'")
+                in_integer_block = True
+            elif not self.integrality[j] and in_integer_block:
+                lines.append("    MARKER  'MARKER'  'INTEND'")
+                in_integer_block = False
+            if self.c[j] != 0:
+                lines.append(f"    {col}  OBJ  {self.c[j]:.12g}")
+            start, end = A.indptr[j], A.indptr[j + 1]
+            lines += [
+                f"    {col}  {self.row_names[i]}  {v:.12g}"
+                for i, v in zip(A.indices[start:end], A.data[start:end])
+            ]
+        if in_integer_block:
+            lines.append("    MARKER  'MARKER'  'INTEND'")
+
+        lines.append("RHS")
+        rhs = np.where(row_types == "L", row_ub, row_lb)
+        lines += [
+            f"    RHS  {n}  {v:.12g}" for n, v in zip(self.row_names, rhs) if v != 0
+        ]
+        if ranged.any():
+            lines.append("RANGES")
+            lines += [
+                f"    RNG  {self.row_names[i]}  {row_ub[i] - row_lb[i]:.12g}"
+                for i in np.flatnonzero(ranged)
+            ]
+
+        lines.append("BOUNDS")
+        for j, col in enumerate(self.col_names):
+            lb, ub = self.col_lb[j], self.col_ub[j]
+            if self.integrality[j] and lb == 0 and ub == 1:
+                lines.append(f" BV BND  {col}")
+            elif not np.isfinite(lb) and not np.isfinite(ub):
+                lines.append(f" FR BND  {col}")
+            elif lb == ub:
+                lines.append(f" FX BND  {col}  {lb:.12g}")
+            else:
+                lines.append(
+                    f" MI BND  {col}" if not np.isfinite(lb) else f" LO BND  {col}  {lb:.12g}"
+                )
+                if np.isfinite(ub):
+                    lines.append(f" UP BND  {col}  {ub:.12g}")
+        lines.append("ENDATA")
+        stream.write("\n".join(lines) + "\n")
+
+
+@dataclass
+class SparseMILPBuilder:
+    """
+    Emits the iMAT/weighted_iMAT MILP directly as sparse matrices instead of
+    building PuLP expressions row by row.
+
+    metabolicModel: cobra.Model
+    """
+
+    metabolicModel: Model
+
+    def build(
+        self,
+        active: List[str],
+        weights: Dict[str, Tuple[float, float]],
+        epsilon: float,
+        flux_bounds,
+        name: str = "iMAT",
+        inactive_prefix: str = "rL_",
+    ) -> MILPMatrices:
+        """
+        Builds the MILP in one vectorized pass.
+
+        Args
+        -----
+        active: List[str]
+            reactions getting the rH_forward/rH_reverse constraints, all other reactions
+            in weights get the rL constraints
+        weights: Dict[str, Tuple[float, float]]
+            objective weights of (y_f, y_r) for every reaction with binary variables,
+            in the order the binaries are created
+        epsilon: float
+            activity threshold
+        flux_bounds: callable
+            (rid, lb, ub) -> (lb, ub) bounds of the flux variables, None for unbounded
+        inactive_prefix: str
+            name prefix of the rL constraints ("rL_" for iMAT, "rL_rM_" for weighted_iMAT)
+        """
+        S, met_ids, rxn_ids = stoichiometric_matrix(self.metabolicModel)
+        n = len(rxn_ids)
+        rxn_index = {rid: j for j, rid in enumerate(rxn_ids)}
+
+        model_lb = np.array([rct.lower_bound for rct in self.metabolicModel.reactions])
+        model_ub = np.array([rct.upper_bound for rct in self.metabolicModel.reactions])
+        v_bounds = [
+            flux_bounds(rid, lb, ub) for rid, lb, ub in zip(rxn_ids, model_lb, model_ub)
+        ]
+        v_lb = np.array([-np.inf if lb is None else lb for lb, _ in v_bounds])
+        v_ub = np.array([np.inf if ub is None else ub for _, ub in v_bounds])
+
+        y_rids = list(weights)
+        k = len(y_rids)
+        y_rxn = np.array([rxn_index[rid] for rid in y_rids], dtype=int)
+        col_tot = n + np.arange(k)
+        col_f = n + k + np.arange(k)
+        col_r = n + 2 * k + np.arange(k)
+
+        is_active = np.isin(y_rids, active) if k else np.zeros(0, dtype=bool)
+        lb, ub = model_lb[y_rxn], model_ub[y_rxn]
+
+        # y_tot_def rows: y_tot - y_f - y_r == 0
+        tot_rows = sparse.csr_matrix(
+            (
+                np.tile([1.0, -1.0, -1.0], k),
+                (np.repeat(np.arange(k), 3), np.column_stack([col_tot, col_f, col_r]).ravel()),
+            ),
+            shape=(k, n + 3 * k),
+        )
+
+        # Two classification rows per binary reaction, each v + coef * y
+        #   RH: v + (lb - eps) y_f >= lb          v + (ub + eps) y_r <= ub
+        #   RL: v + lb y_f >= lb                  v + ub y_f <= ub
+        first_coef = np.where(is_active, lb - epsilon, lb)
+        second_coef = np.where(is_active, ub + epsilon, ub)
+        second_col = np.where(is_active, col_r, col_f)
+        class_rows = sparse.csr_matrix(
+            (
+                np.column_stack([np.ones(k), first_coef, np.ones(k), second_coef]).ravel(),
+                (
+                    np.repeat(np.arange(2 * k), 2),
+                    np.column_stack([y_rxn, col_f, y_rxn, second_col]).ravel(),
+                ),
+            ),
+            shape=(2 * k, n + 3 * k),
+        )
+        class_lb = np.column_stack([lb, np.full(k, -np.inf)]).ravel()
+        class_ub = np.column_stack([np.full(k, np.inf), ub]).ravel()
+
+        A = sparse.vstack(
+            [sparse.hstack([S, sparse.csr_matrix((S.shape[0], 3 * k))]), tot_rows, class_rows],
+            format="csr",
+        )
+        A.eliminate_zeros()
+
+        m = S.shape[0]
+        row_lb = np.concatenate([np.zeros(m), np.zeros(k), class_lb])
+        row_ub = np.concatenate([np.zeros(m), np.zeros(k), class_ub])
+
+        c = np.zeros(n + 3 * k)
+        w = np.array([weights[rid] for rid in y_rids], dtype=float).reshape(k, 2)
+        c[col_f] = w[:, 0]
+        c[col_r] = w[:, 1]
+
+        integrality = np.concatenate([np.zeros(n), np.ones(3 * k)])
+        col_lb = np.concatenate([v_lb, np.zeros(3 * k)])
+        col_ub = np.concatenate([v_ub, np.ones(3 * k)])
+
+        col_names = (
+            [f"v_{rid}" for rid in rxn_ids]
+            + [f"y_tot_{rid}" for rid in y_rids]
+            + [f"yf_{rid}" for rid in y_rids]
+            + [f"yr_{rid}" for rid in y_rids]
+        )
+        first_name = np.where(
+            is_active, "rH_forward_", f"{inactive_prefix}leftHandSide_"
+        )
+        second_name = np.where(
+            is_active, "rH_reverse_", f"{inactive_prefix}rightHandSide_"
+        )
+        row_names = (
+            [f"mass_balance:{mid}" for mid in met_ids]
+            + [f"y_tot_def_{rid}" for rid in y_rids]
+            + [
+                name_
+                for f, s, rid in zip(first_name, second_name, y_rids)
+                for name_ in (f + rid, s + rid)
+            ]
+        )
+
+        return MILPMatrices(
+            name=name,
+            A=A,
+            row_lb=row_lb,
+            row_ub=row_ub,
+            col_lb=col_lb,
+            col_ub=col_ub,
+            c=c,
+            integrality=integrality,
+            col_names=col_names,
+            row_names=row_names,
+            reaction_ids=rxn_ids,
+            y_reaction_ids=y_rids,
+        )
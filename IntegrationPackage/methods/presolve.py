@@ -0,0 +1,209 @@
+"""
+Flux consistency check for the problem reduction of the iMAT MILPs
+(BasePulpVarConfig.build_problem(reduce=True)): reactions that can not carry flux
+under the bounds of the problem are left out of it. Also the feasibility check of
+the mass balance under these bounds (BasePulpVarConfig.precheck).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+from cobra import Model
+import numpy as np
+from optlang.symbolics import Zero
+from scipy import sparse
+from methods.SparseMILPBuilder import stoichiometric_matrix
+from utils.ModelLoader import DEFAULT_CACHE_DIR, ModelCache
+from utils.warm_start import solve_from_basis
+
+# Fluxes with a larger absolute value show that a reaction is not blocked
+TOLERANCE = 1e-9
+
+# Blocked reactions per model content and bounds, see blocked_reactions
+_BLOCKED_CACHE: Dict[str, FrozenSet[str]] = {}
+# Feasibility per model content and bounds, see bounds_feasible
+_FEASIBLE_CACHE: Dict[str, bool] = {}
+
+
+def _bound_arrays(
+    metabolicModel: Model,
+    flux_bounds: Optional[Callable[[str, float, float], Tuple]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lower and upper flux bounds of all reactions, flux_bounds(rid, lb, ub) replaces
+    the model bounds (see BasePulpVarConfig._flux_bounds), None is unbounded
+    """
+    lb = np.empty(len(metabolicModel.reactions))
+    ub = np.empty(len(metabolicModel.reactions))
+    for j, rct in enumerate(metabolicModel.reactions):
+        bounds = (rct.lower_bound, rct.upper_bound)
+        if flux_bounds is not None:
+            bounds = flux_bounds(rct.id, *bounds)
+        lb[j] = -np.inf if bounds[0] is None else bounds[0]
+        ub[j] = np.inf if bounds[1] is None else bounds[1]
+    return lb, ub
+
+
+def _cache_key(S: sparse.csr_matrix, reaction_ids, lb, ub) -> str:
+    digest = hashlib.sha256()
+    for array in (S.data, S.indices, S.indptr, lb, ub):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update("\0".join(reaction_ids).encode())
+    return digest.hexdigest()[:32]
+
+
+def dead_end_reactions(
+    S: sparse.spmatrix, lb: np.ndarray, ub: np.ndarray
+) -> np.ndarray:
+    """
+    Mask of the reactions that are blocked because they use a metabolite that can
+    only be produced or only be consumed. Repeated until no reaction is added.
+    """
+    S = sparse.csr_matrix(S)
+    produce = sparse.csr_matrix(S.multiply(S > 0))
+    consume = sparse.csr_matrix(-S.multiply(S < 0))
+    uses = abs(S).T.tocsr()
+    blocked = (lb == 0) & (ub == 0)
+    while True:
+        forward = ((ub > 0) & ~blocked).astype(float)
+        reverse = ((lb < 0) & ~blocked).astype(float)
+        dead = ((produce @ forward + consume @ reverse) == 0) | (
+            (consume @ forward + produce @ reverse) == 0
+        )
+        new = (uses @ dead.astype(float) > 0) & ~blocked
+        if not new.any():
+            return blocked
+        blocked |= new
+
+
+def _set_problem_bounds(metabolicModel: Model, lb: np.ndarray, ub: np.ndarray):
+    """
+    Sets the finite bounds of the problem on the model and clears the objective,
+    call inside a model context
+    """
+    for j, rct in enumerate(metabolicModel.reactions):
+        if np.isfinite([lb[j], ub[j]]).all() and (lb[j], ub[j]) != rct.bounds:
+            rct.bounds = (lb[j], ub[j])
+    metabolicModel.objective = metabolicModel.problem.Objective(
+        Zero, direction="max", sloppy=True
+    )
+
+
+def bounds_feasible(
+    metabolicModel: Model,
+    flux_bounds: Optional[Callable[[str, float, float], Tuple]] = None,
+) -> bool:
+    """
+    Whether a steady state flux distribution exists within the bounds of the problem
+    (e.g. with the fixed EX_o2_e of an oxygen level). One LP per model content and
+    bounds, the result is cached in memory.
+
+    :param flux_bounds: Optional function (rid, lb, ub) -> (lb, ub) giving the bounds
+        of the problem, e.g. BasePulpVarConfig._flux_bounds
+    """
+    S, _, reaction_ids = stoichiometric_matrix(metabolicModel)
+    lb, ub = _bound_arrays(metabolicModel, flux_bounds)
+    key = _cache_key(S, reaction_ids, lb, ub)
+    if key not in _FEASIBLE_CACHE:
+        with metabolicModel:
+            _set_problem_bounds(metabolicModel, lb, ub)
+            _FEASIBLE_CACHE[key] = solve_from_basis(metabolicModel)
+    return _FEASIBLE_CACHE[key]
+
+
+def _consistency_check(
+    metabolicModel: Model, lb: np.ndarray, ub: np.ndarray, blocked: np.ndarray
+) -> np.ndarray:
+    """
+    Maximizes and minimizes the flux of every reaction not yet known to carry flux,
+    on the model LP with warm starts. Every solution marks all reactions with flux.
+    Returns the mask of the blocked reactions, no reaction if the LP is infeasible.
+    """
+    blocked = blocked.copy()
+    unknown = ~blocked
+    reactions = metabolicModel.reactions
+    with metabolicModel:
+        _set_problem_bounds(metabolicModel, lb, ub)
+        if not solve_from_basis(metabolicModel):
+            # nothing is removed from an infeasible problem
+            return np.zeros(len(reactions), dtype=bool)
+        for j in np.flatnonzero(blocked):
+            reactions[j].bounds = (0.0, 0.0)
+        objective = metabolicModel.solver.objective
+        forward = [rct.forward_variable.name for rct in reactions]
+        reverse = [rct.reverse_variable.name for rct in reactions]
+        for j in range(len(reactions)):
+            if not unknown[j]:
+                continue
+            rct = reactions[j]
+            for direction, possible in (("max", ub[j] > 0), ("min", lb[j] < 0)):
+                if not possible:
+                    continue
+                objective.set_linear_coefficients(
+                    {rct.forward_variable: 1, rct.reverse_variable: -1}
+                )
+                objective.direction = direction
+                optimal = solve_from_basis(metabolicModel)
+                objective.set_linear_coefficients(
+                    {rct.forward_variable: 0, rct.reverse_variable: 0}
+                )
+                if optimal:
+                    primal = metabolicModel.solver.primal_values
+                    flux = np.array([primal[f] - primal[r] for f, r in zip(forward, reverse)])
+                    unknown &= np.abs(flux) <= TOLERANCE
+                if not unknown[j]:
+                    break
+            if unknown[j]:
+                blocked[j] = True
+                unknown[j] = False
+    return blocked
+
+
+def blocked_reactions(
+    metabolicModel: Model,
+    flux_bounds: Optional[Callable[[str, float, float], Tuple]] = None,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+) -> FrozenSet[str]:
+    """
+    Ids of the reactions that can not carry flux at steady state. Dead ends are
+    found from the stoichiometry, the remaining reactions by a consistency check
+    on the model LP (same result as cobra.flux_analysis.find_blocked_reactions).
+    The result is cached per model content and bounds, in memory and in cache_dir
+    (counted for the size limit of the ModelCache there).
+
+    :param flux_bounds: Optional function (rid, lb, ub) -> (lb, ub) giving the bounds
+        of the problem, e.g. BasePulpVarConfig._flux_bounds
+    :param cache_dir: Directory of the cache files, None only caches in memory
+    """
+    S, _, reaction_ids = stoichiometric_matrix(metabolicModel)
+    lb, ub = _bound_arrays(metabolicModel, flux_bounds)
+    key = _cache_key(S, reaction_ids, lb, ub)
+    if key in _BLOCKED_CACHE:
+        return _BLOCKED_CACHE[key]
+
+    file = Path(cache_dir) / f"blocked-{key}.json" if cache_dir is not None else None
+    if file is not None and file.exists():
+        try:
+            with open(file) as f:
+                _BLOCKED_CACHE[key] = frozenset(json.load(f))
+            return _BLOCKED_CACHE[key]
+        except (OSError, ValueError):
+            pass
+
+    blocked = _consistency_check(
+        metabolicModel, lb, ub, dead_end_reactions(S, lb, ub)
+    )
+    result = frozenset(rid for rid, b in zip(reaction_ids, blocked) if b)
+    _BLOCKED_CACHE[key] = result
+    if file is not None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file first, parallel workers never read a partial one
+        fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(sorted(result), f)
+        os.replace(tmp, file)
+        ModelCache(cache_dir=cache_dir).evict(keep=file)
+    return result
@@ -14,31 +14,47 @@ class weighted_iMAT(BasePulpVarConfig):
     gpr_mapper: GPRMapper
     lower_threshold_scaled: float
     upper_threshold_scaled: float
+    _inactive_prefix = "rL_rM_"
 
-    def build_problem(self):
-        super().build_problem()
-        self._create_binary_variables()
+    def build_problem(self, reduce: bool = False):
+        super().build_problem(reduce)
         self._create_weight_variables()
+        self._create_binary_variables()
         self._add_weighted_iMAT_constraints()
         self._add_objective_function()
 
+    def build_sparse_problem(self):
+        self._create_weight_variables()
+        super().build_sparse_problem()
+
+    def _apply_parameters(self):
+        self._create_weight_variables()
+        super()._apply_parameters()
+
+    def weights(self) -> Dict[str, float]:
+        """
+        c weights of the RH and RM reactions
+        """
+        self._create_weight_variables()
+        return self.c_vars
+
     def _create_binary_variables(self):
         self.y_vars: Dict[str, tuple] = {}
 
         for rid in self.RH + self.RM + self.RL:
-            y_tot = pulp.LpVariable(f"y_tot_{rid}", cat="Binary")
-            y_f = pulp.LpVariable(f"yf_{rid}", cat="Binary")
-            y_r = pulp.LpVariable(f"yr_{rid}", cat="Binary")
-            self.prob += y_tot == y_f + y_r, f"y_tot_def_{rid}"
-            self.y_vars[rid] = (y_tot, y_f, y_r)
+            if rid in self.c_vars:
+                self.y_vars[rid] = self._binary_variables(rid, True, self.c_vars[rid])
+            else:
+                self.y_vars[rid] = self._binary_variables(rid, False)
 
     def _create_weight_variables(self):
         self.c_vars: Dict[str, float] = {}
+        expressions = self.gpr_mapper.reaction_expressions()
+        RH = set(self.RH)
         for rid in self.RH + self.RM:
-            gpr = self.metabolicModel.reactions.get_by_id(rid).gpr
-            x = self.gpr_mapper.get_reaction_expression(str(gpr))
+            x = expressions[rid]
 
-            if rid in self.RH:
+            if rid in RH:
                 c = (x - self.upper_threshold_scaled) + 1
             else:
                 c = (x - self.lower_threshold_scaled) / (
@@ -48,18 +64,7 @@ class weighted_iMAT(BasePulpVarConfig):
 
     def _add_weighted_iMAT_constraints(self):
         for rid in self.RH + self.RM + self.RL:
-            v = self.v_vars[rid]
-            lb = self.metabolicModel.reactions.get_by_id(rid).lower_bound
-            ub = self.metabolicModel.reactions.get_by_id(rid).upper_bound
-            y_f = self.y_vars[rid][1]
-            y_r = self.y_vars[rid][2]
-
-            if rid in (self.RH + self.RM):
-                self.prob += v + y_f * (lb - self.epsilon) >= lb, f"rH_forward_{rid}"
-                self.prob += v + y_r * (ub + self.epsilon) <= ub, f"rH_reverse_{rid}"
-            else:
-                self.prob += lb * (1 - y_f) <= v, f"rL_rM_leftHandSide_{rid}"
-                self.prob += v <= (1 - y_f) * ub, f"rL_rM_rightHandSide_{rid}"
+            self._add_binary_constraints(rid, rid in self.c_vars)
 
     def _add_objective_function(self):
         terms = [
@@ -67,3 +72,11 @@ class weighted_iMAT(BasePulpVarConfig):
             for rct in (self.RH + self.RM)
         ] + [self.y_vars[rct][1] for rct in self.RL]
         self.prob += pulp.lpSum(terms)
+
+    def _active_reactions(self) -> List[str]:
+        return self.RH + self.RM
+
+    def _objective_weights(self) -> Dict[str, tuple]:
+        weights = {rid: (self.c_vars[rid], self.c_vars[rid]) for rid in self.RH + self.RM}
+        weights.update({rid: (1.0, 0.0) for rid in self.RL})
+        return weights
@@ -1,48 +1,676 @@
-# NOT DONE IMPLEMENTING!
+"""
+Sensitivity analysis over expression files x cell types x methods x oxygen levels
+x epsilon x quantiles, run on a process pool. Configured by a file like
+conf/SensAnalysis.py, started with: main.py sweep -c conf/SensAnalysis.py
+"""
 
-# Creates the tasks from file SensAnalysis
-import conf.SensAnalysis as SensAnalysis
+import dataclasses
+import importlib.util
+import itertools
+import json
+import math
+import statistics
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool, Value, util
+from pathlib import Path
+from typing import Optional, Tuple
+from main import (
+    create_solver,
+    lookup_solution,
+    method_parameters,
+    solve_and_write,
+    write_cached,
+)
+from methods.IMATConfig import IMATConfig
+from methods.SolverBackend import SolverOptions
+from utils.Discretizer import discretize_batch
+from utils.ExpressionCache import load_expression, read_aligned_expression
+from utils.GPRMapper import classify_batch
+from utils.ModelLoader import file_hash, load_model, read_model
+from utils.ReactionIndex import ReactionIndex
+from utils.order_grid import nearest_point, order_grid
+from utils.SweepManifest import SweepManifest
+from utils.ResultStore import ParquetResultSink
+from utils.RunProfile import RunProfile, write_profile_summary
+from utils.SolutionCache import SolutionCache
+from utils.cores import (
+    MAX_THREADS,
+    THREADED_SOLVE_SECONDS,
+    available_cores,
+    core_slots,
+    pin_process,
+    split_cores,
+)
 
+# Groups are run in this order of their method, weighted_iMAT MILPs have weighted
+# objectives over more binaries and take far longer
+METHOD_ORDER = {"iMAT": 0, "weighted_iMAT": 1}
 
-def run_parallel():
-    model = read_sbml_model(SensAnalysis.metabolicModel)
-    tasks = []  # list of dict
+# Statuses of a task that reached the time or node limit
+LIMIT_STATUSES = ("feasible", "timeout")
 
-    # Create combination of epsilon and quantiles
-    param_grid = [
-        (SensAnalysis.epsilon, SensAnalysis.lower_q, SensAnalysis.upper_q)
+
+@dataclass(frozen=True)
+class SweepTask:
+    """
+    One solve of the sensitivity analysis
+    """
+
+    method: str
+    expressionFile: str
+    geneColName: str
+    expressionColName: str
+    oxygenLevel: Optional[float]
+    discretization: str
+    epsilon: float
+    quantiles: Optional[Tuple[float, float]]
+    output_dir: str
+    options: SolverOptions
+    # quantile pairs of the whole sweep, discretized together
+    rules: Tuple[Optional[Tuple[float, float]], ...] = (None,)
+    # check the flux bounds (and the LP relaxation) before the MILP
+    precheck: bool = True
+    precheck_relaxation: bool = False
+    # a result stopped by the time or node limit is written and recorded, otherwise
+    # the task is run again with larger limits
+    final: bool = True
+
+    @property
+    def group(self):
+        """
+        Tasks of a group share one problem, only epsilon and quantiles differ
+        """
+        return (self.method, self.expressionFile, self.expressionColName, self.oxygenLevel)
+
+    @property
+    def point(self):
+        return (self.epsilon, self.quantiles)
+
+    @property
+    def key(self):
+        """
+        Key of the task in the SweepManifest
+        """
+        return SweepManifest.key(
+            self.expressionFile,
+            self.expressionColName,
+            self.method,
+            self.epsilon,
+            self.quantiles,
+            self.oxygenLevel,
+        )
+
+
+def load_config(path):
+    """
+    Imports a sensitivity analysis config file (see conf/SensAnalysis.py) as module
+    """
+    spec = importlib.util.spec_from_file_location("SensAnalysis", path)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def parameter_grid(conf):
+    """
+    Returns the (epsilon, quantiles) points of the config. Quantile pairs with
+    qL >= qH are skipped, mean discretization only varies epsilon.
+    """
+    epsilons = [float(e) for e in conf.epsilon_range]
+    if conf.discretization == "mean":
+        return [(epsilon, None) for epsilon in epsilons]
+    return [
+        (epsilon, (float(lower_q), float(upper_q)))
         for epsilon, lower_q, upper_q in itertools.product(
-            SensAnalysis.epsilon_range,
-            SensAnalysis.lower_q_range,
-            SensAnalysis.upper_q_range,
+            epsilons, conf.lower_q_range, conf.upper_q_range
         )
         if lower_q < upper_q
     ]
 
-    input_files = list(Path(SensAnalysis.inputDir).glob(".tsv"))
-    for file in input_files:
-        # create ouputpath name
-        fileName = Path(file).stem
-        expression_df = read_file.read_expression_file(file)
-        for c, exprColName in enumerate(SensAnalysis.exprColNames):
-            rnaSeq_df = utils.generate_RNASeqDf(
-                model, expression_df, SensAnalysis.geneColName
+
+def create_tasks(conf, output_dir=None):
+    """
+    Returns the list of SweepTask of the config. The tasks of one group are
+    consecutive and ordered as nearest-neighbour path (see utils.order_grid), the
+    groups of cheap methods come first (see METHOD_ORDER).
+    """
+    options = SolverOptions(
+        backend=getattr(conf, "solver", "cbc"),
+        time_limit=getattr(conf, "time_limit", None),
+        gap=getattr(conf, "mip_gap", None),
+        node_limit=getattr(conf, "node_limit", None),
+        threads=getattr(conf, "threads", None),
+        msg=False,
+    )
+    # with limits, tasks stopped by them are run again in later rounds
+    limited = options.time_limit is not None or options.node_limit is not None
+    final = not (limited and getattr(conf, "budget_rounds", 1) > 0)
+    grid = order_grid(parameter_grid(conf))
+    rules = tuple(dict.fromkeys(quantiles for _, quantiles in grid))
+    input_files = sorted(
+        Path(conf.inputDir).glob(getattr(conf, "filePattern", "*.tsv"))
+    )
+    if len(input_files) == 0:
+        raise ValueError(
+            f"No expression files matching {getattr(conf, 'filePattern', '*.tsv')} "
+            f"in {conf.inputDir}"
+        )
+    oxygen_levels = conf.oxygen_levels if conf.oxygen_levels else [None]
+
+    tasks = []
+    for file, exprColName, method, oxygenLevel in itertools.product(
+        input_files, conf.exprColNames, conf.methods, oxygen_levels
+    ):
+        for epsilon, quantiles in grid:
+            tasks.append(
+                SweepTask(
+                    method=method,
+                    expressionFile=str(file),
+                    geneColName=conf.geneColName,
+                    expressionColName=exprColName,
+                    oxygenLevel=oxygenLevel,
+                    discretization=conf.discretization,
+                    epsilon=epsilon,
+                    quantiles=quantiles,
+                    output_dir=output_dir or conf.outputDir,
+                    options=options,
+                    rules=rules,
+                    precheck=getattr(conf, "precheck", True),
+                    precheck_relaxation=getattr(conf, "precheck_relaxation", False),
+                    final=final,
+                )
+            )
+    # stable, the groups stay consecutive
+    tasks.sort(key=lambda task: METHOD_ORDER.get(task.method, len(METHOD_ORDER)))
+    return tasks, len(grid)
+
+
+def work_units(tasks, workers):
+    """
+    Splits the tasks into the units of work of the pool: the groups (consecutive
+    tasks that share a problem), so that a worker solves a whole group on one
+    resident problem, also after resume filtering and requeueing. With fewer groups
+    than workers the largest groups are split in consecutive halves until every
+    worker gets a unit.
+    """
+    units = [list(group) for _, group in itertools.groupby(tasks, lambda t: t.group)]
+    while len(units) < workers:
+        largest = max(range(len(units)), key=lambda i: len(units[i]))
+        if len(units[largest]) < 2:
+            break
+        unit = units[largest]
+        units[largest : largest + 1] = [unit[: len(unit) // 2], unit[len(unit) // 2 :]]
+    return units
+
+
+def larger_budget(task, growth, final):
+    """
+    The task with its time and node limit multiplied by growth
+    """
+    options = task.options
+    return dataclasses.replace(
+        task,
+        options=dataclasses.replace(
+            options,
+            time_limit=(
+                None if options.time_limit is None else options.time_limit * growth
+            ),
+            node_limit=(
+                None
+                if options.node_limit is None
+                else int(math.ceil(options.node_limit * growth))
+            ),
+        ),
+        final=final,
+    )
+
+
+# Worker state, set per process by _init_worker
+_model = None
+_reaction_index = None  # ReactionIndex of _model, shared by all tasks
+_manifest = None
+_sink = None
+_read_expression = None  # load_expression or read_aligned_expression
+_profile = False  # profile the tasks
+_solution_cache = None  # SolutionCache, None if disabled
+_model_hash = None  # content hash of the model file, part of the solution keys
+_pending = []  # finished tasks whose results are still buffered in _sink
+_expression = {}  # (file, column) -> aligned expression df
+_batches = {}  # (file, column) -> discretization and reaction classes of all rules
+_group = {"key": None, "solver": None, "solutions": {}}
+
+
+def _init_worker(
+    model_path,
+    manifest_path,
+    store_path=None,
+    results_per_file=50,
+    model_cache=True,
+    expression_cache=True,
+    profile=False,
+    solution_cache=True,
+    slots=None,
+    slot_counter=None,
+):
+    """
+    Pool initializer, reads the metabolic model once per worker. With store_path the
+    results are collected in a ParquetResultSink, written when the worker exits.
+    With slots (lists of core ids, see utils.cores.core_slots) each worker is pinned
+    to the next free slot, counted by the shared slot_counter.
+    """
+    global _model, _reaction_index, _manifest, _sink, _read_expression, _profile
+    global _solution_cache, _model_hash
+    if slots:
+        with slot_counter.get_lock():
+            slot = slots[slot_counter.value % len(slots)]
+            slot_counter.value += 1
+        pin_process(slot)
+    _profile = profile
+    if solution_cache:
+        _solution_cache = SolutionCache()
+        _model_hash = file_hash(model_path)
+    _model = load_model(model_path) if model_cache else read_model(model_path)
+    _reaction_index = ReactionIndex.from_model(_model)
+    _read_expression = load_expression if expression_cache else read_aligned_expression
+    _manifest = SweepManifest(manifest_path)
+    if store_path is not None:
+        _sink = ParquetResultSink(store_path, results_per_file=results_per_file)
+        util.Finalize(None, _flush_worker, exitpriority=10)
+
+
+def _flush_worker():
+    _sink.flush()
+    _record_pending()
+
+
+def _record_pending():
+    """
+    Records the finished tasks in the manifest once their results are written
+    """
+    if _sink is not None and _sink.pending > 0:
+        return
+    for key, status, seconds, gap in _pending:
+        _manifest.record(key, status, seconds, gap)
+    _pending.clear()
+
+
+def _expression_df(task, profile):
+    key = (task.expressionFile, task.expressionColName)
+    if key not in _expression:
+        with profile.stage("read_expression"):
+            _expression[key] = _read_expression(
+                task.expressionFile, _model, task.geneColName, task.expressionColName
+            )
+    return _expression[key].copy()
+
+
+def _prepare_config(task, profile):
+    """
+    Prepared IMATConfig of the task. The expression column is discretized and its
+    reactions classified for all quantile pairs of the sweep at once.
+    """
+    config = IMATConfig(
+        expression_df=_expression_df(task, profile),
+        discretization_method=task.discretization,
+        quantiles=task.quantiles,
+        epsilon=task.epsilon,
+        metabolicModel=_model,
+        reaction_index=_reaction_index,
+    )
+    key = (task.expressionFile, task.expressionColName)
+    if key not in _batches:
+        with profile.stage("discretization"):
+            batch = discretize_batch(config.expression_df, list(task.rules))
+        with profile.stage("gpr_mapping"):
+            classes = classify_batch(_model, batch, config.ignore_human)
+        _batches[key] = (batch, classes)
+    batch, classes = _batches[key]
+    config.prepare_from_batch(batch, classes, task.rules.index(task.quantiles), 0)
+    return config
+
+
+def _solve_task(task, profile):
+    """
+    Solves one task with the resident problem of its group. Returns (status, gap),
+    status is "optimal", "feasible" (stopped by the time or node limit), "timeout"
+    (stopped without solution) or "infeasible".
+    """
+    config = _prepare_config(task, profile)
+    cache_key = None
+    if _solution_cache is not None:
+        # before the resident problem is updated, a hit leaves it as it is
+        point_solver = create_solver(task.method, config, task.oxygenLevel)
+        cache_key, cached = lookup_solution(
+            _solution_cache, _model_hash, point_solver, task.options, profile
+        )
+        if cached is not None:
+            solution = write_cached(
+                cached,
+                point_solver,
+                config,
+                task.method,
+                task.output_dir,
+                fileName=task.expressionFile,
+                sink=_sink,
+                profile=profile,
+            )
+            if solution is None:
+                return "infeasible", None
+            if _group["key"] == task.group:
+                _group["solutions"][task.point] = solution
+            return "optimal", cached.get("gap")
+    if _group["key"] != task.group:
+        # new group: the previous problem is not needed anymore
+        _group["key"] = None
+        _group["solver"] = create_solver(task.method, config, task.oxygenLevel)
+        with profile.stage("build"):
+            _group["solver"].build_resident_problem()
+        _group["solutions"] = {}
+        _group["key"] = task.group
+    else:
+        with profile.stage("update"):
+            _group["solver"].update_parameters(
+                RH=config.RH,
+                RM=config.RM,
+                RL=config.RL,
+                epsilon=config.epsilon,
+                **method_parameters(task.method, config),
             )
-            for i, method in enumerate(SensAnalysis.methods):
-                if SensAnalysis.level is not None:
-                    for epsilon, lower_q, upper_q in param_grid:
-                        tasks.append(
-                            {
-                                "model": model,
-                                "method": method,
-                                "rnaSeq_df": rnaSeq_df,
-                                "discretization": SensAnalysis.discretization,
-                                "quantiles": [lower_q, upper_q],
-                                "epsilon": epsilon,
-                                "outputpath": f"sensitivityAnalysis_output/{SensAnalysis.outputpaths[i]}/{SensAnalysis.celltype_names[c]}/{fileName}_epsilon_{epsilon}_quantiles_{lower_q}_{upper_q}.tsv",
-                            }
-                        )
-    # Multiprocessing on tasks
-    num_processes = 16
-    with Pool(processes=num_processes) as pool:
-        pool.map(run_single, tasks)
+    profile.count_problem(_group["solver"].prob)
+    solutions = _group["solutions"]
+    neighbour = nearest_point(task.point, list(solutions))
+    try:
+        solution = solve_and_write(
+            _group["solver"],
+            config,
+            task.method,
+            task.output_dir,
+            task.options,
+            warm_start=solutions.get(neighbour),
+            fileName=task.expressionFile,
+            sink=_sink,
+            profile=profile,
+            precheck=task.precheck,
+            precheck_relaxation=task.precheck_relaxation,
+            solution_cache=_solution_cache,
+            cache_key=cache_key,
+            write_incomplete=task.final,
+        )
+    except TimeoutError:
+        return "timeout", None
+    if solution is None:
+        return "infeasible", None
+    solutions[task.point] = solution
+    gap = _group["solver"].solver_statistics["gap"]
+    if _group["solver"].solution_status == "feasible":
+        return "feasible", gap
+    return "optimal", gap
+
+
+def run_task(task):
+    """
+    Runs one task in a worker and records it in the manifest as soon as its result
+    is written. A task stopped by the limits is only recorded in its final round.
+    Errors are returned instead of raised, so one failing point does not stop
+    the sweep.
+    Returns (task, status, seconds, profile), profile is the RunProfile as dict if
+    profiling is enabled, else None
+    """
+    profile = RunProfile(enabled=_profile)
+    start = time.perf_counter()
+    try:
+        status, gap = _solve_task(task, profile)
+    except Exception as e:
+        # the resident problem may be left half updated
+        _group["key"] = None
+        status = f"error: {type(e).__name__}: {e}"
+        return task, status, time.perf_counter() - start, _task_profile(task, profile)
+    seconds = time.perf_counter() - start
+    if task.final or status not in LIMIT_STATUSES:
+        _pending.append((task.key, status, seconds, gap))
+    _record_pending()
+    return task, status, seconds, _task_profile(task, profile)
+
+
+def run_group(tasks):
+    """
+    Runs the tasks of a work unit (see work_units) one after the other in a worker.
+    Returns the results of run_task.
+    """
+    return [run_task(task) for task in tasks]
+
+
+def _task_profile(task, profile):
+    if not profile.enabled:
+        return None
+    return profile.to_dict(
+        key=task.key,
+        method=task.method,
+        expressionFile=task.expressionFile,
+        expressionColName=task.expressionColName,
+        epsilon=task.epsilon,
+        quantiles=task.quantiles,
+        oxygenLevel=task.oxygenLevel,
+        solver=task.options.backend,
+        time_limit=task.options.time_limit,
+        node_limit=task.options.node_limit,
+    )
+
+
+def _report(done, total, counts, start, retry=0):
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else float("inf")
+    print(
+        f"[{done}/{total}] {rate:.2f} solves/s, elapsed {elapsed:.0f}s, "
+        f"eta {eta:.0f}s, optimal {counts['optimal']}, "
+        f"stopped by limits {counts['feasible'] + counts['timeout']} "
+        f"(to repeat {retry}), infeasible {counts['infeasible']}, "
+        f"errors {counts['error']}",
+        flush=True,
+    )
+
+
+def _round_split(conf, cores, processes, threads, n_jobs, long_solves):
+    """
+    (workers, threads) of a round: the given processes and threads, the missing ones
+    from the available cores (see utils.cores.split_cores). With given threads and
+    no processes, the workers are as many as fit on the cores with these threads.
+    """
+    max_threads = getattr(conf, "max_threads", None) or MAX_THREADS
+    workers, auto_threads = split_cores(len(cores), n_jobs, long_solves, max_threads)
+    if processes is not None:
+        workers = processes
+        auto_threads = max(1, min(max_threads, len(cores) // workers))
+    elif threads is not None:
+        workers = max(1, min(n_jobs, len(cores) // threads))
+    return workers, threads or auto_threads
+
+
+def run_parallel(
+    config_path,
+    processes=None,
+    output_dir=None,
+    resume=True,
+    profile=False,
+    time_limit=None,
+    mip_gap=None,
+    node_limit=None,
+    budget_rounds=None,
+    threads=None,
+):
+    """
+    Runs the sensitivity analysis of the config file on a process pool.
+    Finished tasks are recorded in output_dir/sweep_manifest.tsv, a restarted run
+    skips them. Failed tasks are not recorded and run again.
+    With a time or node limit, tasks stopped by it are run again after all other
+    tasks with limits larger by budget_growth (config, default 4), for budget_rounds
+    rounds (default 1). The last round writes the best solution found.
+    Without processes and threads, the cores available to the process (affinity and
+    cgroup quota) are split into workers and solver threads per round: one worker
+    per group first, then, if the repeated tasks took THREADED_SOLVE_SECONDS or more
+    (adaptive_threads in the config, default True), fewer workers with more threads.
+    Workers are pinned to disjoint cores unless pin_workers = False in the config.
+
+    :param config_path: Path to the config file, e.g. conf/SensAnalysis.py
+    :param processes: Number of worker processes, default num_processes of the config
+    :param output_dir: Output directory, default outputDir of the config
+    :param resume: Skip the tasks in the manifest, if False all tasks are run
+    :param profile: Profile every task (also profile = True in the config), the
+        profiles are appended to output_dir/profile.jsonl and summarized in
+        output_dir/profile_summary.tsv
+    :param time_limit, mip_gap, node_limit, budget_rounds, threads: Override the
+        values of the config
+    :return: Dict with the number of optimal, feasible (stopped by the limits),
+        timeout (no solution within the limits), infeasible and failed tasks
+    """
+    conf = load_config(config_path)
+    for name, value in (
+        ("time_limit", time_limit),
+        ("mip_gap", mip_gap),
+        ("node_limit", node_limit),
+        ("budget_rounds", budget_rounds),
+        ("threads", threads),
+    ):
+        if value is not None:
+            setattr(conf, name, value)
+    profile = profile or getattr(conf, "profile", False)
+    processes = processes or getattr(conf, "num_processes", None)
+    output_dir = output_dir or conf.outputDir
+    tasks, group_size = create_tasks(conf, output_dir=output_dir)
+    store_path = None
+    if getattr(conf, "output_format", "tsv") == "parquet":
+        store_path = Path(output_dir) / "results"
+    manifest = SweepManifest(Path(output_dir) / "sweep_manifest.tsv")
+    n_tasks = len(tasks)
+    if resume:
+        tasks = [task for task in tasks if task.key not in manifest]
+    cores = available_cores()
+    print(
+        f"Total parameter combinations: {group_size}, "
+        f"total tasks to run: {len(tasks)} of {n_tasks} on {len(cores)} cores",
+        flush=True,
+    )
+    counts = {"optimal": 0, "feasible": 0, "timeout": 0, "infeasible": 0, "error": 0}
+    if len(tasks) == 0:
+        print("Done!")
+        return counts
+
+    model_cache = getattr(conf, "model_cache", True)
+    expression_cache = getattr(conf, "expression_cache", True)
+    solution_cache = getattr(conf, "solution_cache", True)
+    if model_cache:
+        # parses the model once here, the workers load the snapshot
+        model = load_model(conf.metabolicModel)
+        if expression_cache:
+            # same for the expression columns of the remaining tasks
+            for file, gene_col, column in {
+                (t.expressionFile, t.geneColName, t.expressionColName) for t in tasks
+            }:
+                load_expression(file, model, gene_col, column)
+
+    rounds = getattr(conf, "budget_rounds", 1)
+    growth = getattr(conf, "budget_growth", 4.0)
+    adaptive = getattr(conf, "adaptive_threads", True)
+    pin = getattr(conf, "pin_workers", True)
+    profiles = []
+    profile_path = Path(output_dir) / "profile.jsonl"
+    if profile:
+        profile_path.parent.mkdir(parents=True, exist_ok=True)
+    long_solves = False
+    for budget_round in itertools.count():
+        # one worker per group first, repeated tasks are few and slow, they are
+        # spread over the workers
+        if budget_round == 0:
+            n_jobs = len({task.group for task in tasks})
+        else:
+            n_jobs = len(tasks)
+        workers, solve_threads = _round_split(
+            conf, cores, processes, getattr(conf, "threads", None), n_jobs, long_solves
+        )
+        tasks = [
+            dataclasses.replace(
+                task, options=dataclasses.replace(task.options, threads=solve_threads)
+            )
+            for task in tasks
+        ]
+        slots = None
+        if pin and workers * solve_threads <= len(cores):
+            slots = core_slots(cores, workers)
+        elif workers * solve_threads > len(cores):
+            print(
+                f"Warning: {workers} workers x {solve_threads} threads oversubscribe "
+                f"{len(cores)} cores",
+                flush=True,
+            )
+        print(
+            f"Round {budget_round}: {len(tasks)} tasks, {workers} workers x "
+            f"{solve_threads} solver threads",
+            flush=True,
+        )
+        retry, retry_seconds = [], []
+        done = 0
+        start = time.perf_counter()
+        with Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(
+                conf.metabolicModel,
+                manifest.path,
+                store_path,
+                getattr(conf, "results_per_file", 50),
+                model_cache,
+                expression_cache,
+                profile,
+                solution_cache,
+                slots,
+                Value("i", 0),
+            ),
+        ) as pool:
+            for results in pool.imap_unordered(
+                run_group, work_units(tasks, workers)
+            ):
+                for task, status, seconds, task_profile in results:
+                    if task_profile is not None:
+                        task_profile["status"] = status
+                        task_profile["round"] = budget_round
+                        task_profile["threads"] = solve_threads
+                        profiles.append(task_profile)
+                        with open(profile_path, "a") as f:
+                            f.write(json.dumps(task_profile, default=str) + "\n")
+                    if status.startswith("error"):
+                        counts["error"] += 1
+                        print(f"{task}: {status}", flush=True)
+                    elif status in LIMIT_STATUSES and not task.final:
+                        retry.append(task)
+                        retry_seconds.append(seconds)
+                    else:
+                        counts[status] += 1
+                done += len(results)
+                _report(done, len(tasks), counts, start, len(retry))
+            # lets the workers exit normally, so that they write their buffered
+            # results
+            pool.close()
+            pool.join()
+        if not retry:
+            break
+        # the groups keep their order, for the warm starts within a group
+        order = {task.key: i for i, task in enumerate(tasks)}
+        tasks = [
+            larger_budget(task, growth, final=budget_round + 1 >= rounds)
+            for task in sorted(retry, key=lambda task: order[task.key])
+        ]
+        long_solves = (
+            adaptive and statistics.median(retry_seconds) >= THREADED_SOLVE_SECONDS
+        )
+        print(
+            f"{len(tasks)} tasks stopped by the time or node limit, running them "
+            f"again with {growth}x larger limits",
+            flush=True,
+        )
+
+    if profiles:
+        write_profile_summary(profiles, Path(output_dir) / "profile_summary.tsv")
+    print("Done!")
+    return counts
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# modules import each other relative to IntegrationPackage, like main.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.Discretizer import Discretizer
+from utils.GPRMapper import GPRMapper
+
+
+@pytest.fixture
+def model():
+    """
+    cobra's E. coli core model (95 reactions, shipped with cobra)
+    """
+    from cobra.io import load_model
+
+    return load_model("textbook")
+
+
+@pytest.fixture
+def classified(model):
+    """
+    (gpr_mapper, discretization_result) of a reproducible log-normal expression
+    vector over the model genes, like benchmarks/common.synthetic_setup
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {"expression": rng.lognormal(3, 2, len(model.genes))},
+        index=[g.id for g in model.genes],
+    )
+    result = Discretizer("quantile", [40, 70]).run(df)
+    mapper = GPRMapper(model, result.dataframe, ignore_human=True)
+    mapper.create_reaction_classes()
+    return mapper, result
@@ -0,0 +1,94 @@
+"""
+Solvers on test classes and comparison of built iMAT problems: PuLP problems and
+sparse MILPMatrices, row by row by name, with column bounds and objective. Shared by
+the tests and the benchmarks.
+"""
+
+import numpy as np
+import pulp
+
+
+def pulp_rows(prob):
+    """row name -> ({column name: coefficient}, lower bound, upper bound) of a PuLP problem"""
+    rows = {}
+    for name, constraint in prob.constraints.items():
+        coefs = {var.name: coef for var, coef in constraint.items() if coef != 0}
+        rhs = -constraint.constant
+        lb = rhs if constraint.sense in (pulp.LpConstraintGE, pulp.LpConstraintEQ) else -np.inf
+        ub = rhs if constraint.sense in (pulp.LpConstraintLE, pulp.LpConstraintEQ) else np.inf
+        rows[name] = (coefs, lb, ub)
+    return rows
+
+
+def sparse_rows(milp):
+    A = milp.A.tocsr()
+    rows = {}
+    for i, name in enumerate(milp.row_names):
+        start, end = A.indptr[i], A.indptr[i + 1]
+        coefs = {
+            milp.col_names[j]: v for j, v in zip(A.indices[start:end], A.data[start:end])
+        }
+        rows[name] = (coefs, milp.row_lb[i], milp.row_ub[i])
+    return rows
+
+
+def same_row(a, b) -> bool:
+    """Rows are equal up to multiplication by -1 (PuLP moves terms across the sign)"""
+    (ca, lba, uba), (cb, lbb, ubb) = a, b
+    if ca.keys() != cb.keys():
+        return False
+    for sign, lb, ub in ((1, lbb, ubb), (-1, -ubb, -lbb)):
+        if (
+            all(np.isclose(ca[k], sign * cb[k]) for k in ca)
+            and np.isclose(lba, lb)
+            and np.isclose(uba, ub)
+        ):
+            return True
+    return False
+
+
+def same_problem(pulp_prob, milp) -> bool:
+    a, b = pulp_rows(pulp_prob), sparse_rows(milp)
+    if a.keys() != b.keys() or not all(same_row(a[k], b[k]) for k in a):
+        return False
+    bounds = {
+        var.name: (
+            -np.inf if var.lowBound is None else var.lowBound,
+            np.inf if var.upBound is None else var.upBound,
+        )
+        for var in pulp_prob.variables()
+    }
+    for name, lb, ub in zip(milp.col_names, milp.col_lb, milp.col_ub):
+        if name in bounds and not np.allclose(bounds[name], (lb, ub)):
+            return False
+    objective = {var.name: coef for var, coef in pulp_prob.objective.items() if coef != 0}
+    c = {name: v for name, v in zip(milp.col_names, milp.c) if v != 0}
+    return objective.keys() == c.keys() and all(
+        np.isclose(objective[k], c[k]) for k in c
+    )
+
+
+def create_solver(method, model, mapper, result, epsilon=1.0, **classes):
+    """
+    iMAT or weighted_iMAT on the classes of the mapper, or on the given RH, RM, RL
+    """
+    from methods.iMAT import iMAT
+    from methods.weighted_iMAT import weighted_iMAT
+
+    kwargs = {}
+    if method == "weighted_iMAT":
+        kwargs = dict(
+            gpr_mapper=mapper,
+            lower_threshold_scaled=result.scaled_thresholds[0],
+            upper_threshold_scaled=result.scaled_thresholds[1],
+        )
+    cls = {"iMAT": iMAT, "weighted_iMAT": weighted_iMAT}[method]
+    return cls(
+        metabolicModel=model,
+        RH=classes.get("RH", mapper.RH),
+        RM=classes.get("RM", mapper.RM),
+        RL=classes.get("RL", mapper.RL),
+        epsilon=epsilon,
+        oxygenLevel=None,
+        **kwargs,
+    )
@@ -0,0 +1,45 @@
+from utils.cores import cgroup_cpu_limit, split_cores
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text + "\n")
+
+
+def test_cgroup_v2_takes_tightest_parent(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root / "cgroup.controllers", "cpu memory")
+    _write(root / "cpu.max", "max 100000")
+    _write(root / "job" / "cpu.max", "200000 100000")
+    _write(root / "job" / "step" / "cpu.max", "max 100000")
+    proc = tmp_path / "proc_cgroup"
+    _write(proc, "0::/job/step")
+    assert cgroup_cpu_limit(root, proc) == 2.0
+
+
+def test_cgroup_v1_cpu_hierarchy(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root / "cpu" / "cpu.cfs_quota_us", "-1")
+    _write(root / "cpu" / "cpu.cfs_period_us", "100000")
+    _write(root / "cpu" / "slice" / "cpu.cfs_quota_us", "150000")
+    _write(root / "cpu" / "slice" / "cpu.cfs_period_us", "100000")
+    proc = tmp_path / "proc_cgroup"
+    _write(proc, "4:memory:/other\n2:cpu,cpuacct:/slice\n0::/")
+    assert cgroup_cpu_limit(root, proc) == 1.5
+
+
+def test_cgroup_without_quota(tmp_path):
+    root = tmp_path / "cgroup"
+    _write(root / "cgroup.controllers", "cpu")
+    proc = tmp_path / "proc_cgroup"
+    # host path not visible in the mount: only the mount itself is read
+    _write(proc, "0::/not/mounted")
+    assert cgroup_cpu_limit(root, proc) is None
+    _write(root / "cpu.max", "50000 100000")
+    assert cgroup_cpu_limit(root, proc) == 0.5
+
+
+def test_split_cores():
+    assert split_cores(64, 10) == (10, 6)
+    assert split_cores(64, 100, long_solves=True) == (8, 8)
+    assert split_cores(1, 5, long_solves=True) == (1, 1)
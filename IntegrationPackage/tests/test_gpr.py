@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from cobra import Model, Reaction
+from cobra.core.gene import GPR
+
+from utils.GPRMapper import GPRMapper, compile_gprs, filter_gpr
+
+RULES = {
+    "R_and": "g1 and g2",
+    "R_or": "g1 or g3",
+    "R_nested": "(g1 and g2) or (g3 and (g4 or g5))",
+    "R_deep": "g1 and (g2 or (g3 and (g4 or (g5 and g6))))",
+    # AND and OR without parentheses: cobra binds AND stronger, the score is left
+    # to right
+    "R_mixed": "g1 or g2 and g3",
+    "R_missing": "g6 and (g7 or g2)",
+    "R_all_missing": "g7 or g8",
+    "R_none": "",
+}
+
+
+def class_reference(mapper: GPRMapper):
+    """
+    Reaction classes evaluated rule by rule with cobra's GPR.eval, as
+    create_reaction_classes did before the rules were compiled
+    """
+    df = mapper.expression_df
+    low = df.index[df["discretization"] == -1].tolist()
+    moderate = df.index[df["discretization"] == 0].tolist()
+    high = df.index[df["discretization"] == 1].tolist()
+    RL, RM, RH = [], [], []
+    for rct in mapper.metabolicModel.reactions:
+        gpr = GPR().from_string(filter_gpr(str(rct.gpr), mapper.ignore_human))
+        if not gpr.eval(low):
+            RL.append(rct.id)
+        elif not gpr.eval(low + moderate):
+            RM.append(rct.id)
+        elif not gpr.eval(low + moderate + high):
+            RH.append(rct.id)
+    return RL, RM, RH
+
+
+def score_reference(mapper: GPRMapper):
+    """
+    Scores of the reactions with a rule from the recursive evaluation
+    """
+    scores = {}
+    for rct in mapper.metabolicModel.reactions:
+        if filter_gpr(str(rct.gpr), mapper.ignore_human):
+            scores[rct.id] = mapper.get_reaction_expression(str(rct.gpr))
+    return scores
+
+
+@pytest.fixture
+def rule_model():
+    model = Model("rules")
+    for rid, rule in RULES.items():
+        rct = Reaction(rid)
+        model.add_reactions([rct])
+        rct.gene_reaction_rule = rule
+    return model
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compiled_matches_recursive(rule_model, seed):
+    rng = np.random.default_rng(seed)
+    genes = [g.id for g in rule_model.genes]
+    df = pd.DataFrame(
+        {
+            "scaled_expression": rng.random(len(genes)),
+            "discretization": rng.integers(-1, 2, len(genes)).astype(float),
+        },
+        index=genes,
+    )
+    # g7 and g8 were not measured
+    df.loc[["g7", "g8"]] = np.nan
+    mapper = GPRMapper(rule_model, df, ignore_human=True)
+
+    scores = mapper.reaction_expressions()
+    reference = score_reference(mapper)
+    assert scores.keys() == reference.keys()
+    for rid, value in reference.items():
+        assert scores[rid] == pytest.approx(value), rid
+    assert scores["R_all_missing"] == 0.5
+
+    mapper.create_reaction_classes()
+    RL, RM, RH = class_reference(mapper)
+    assert (sorted(mapper.RL), sorted(mapper.RM), sorted(mapper.RH)) == (
+        sorted(RL),
+        sorted(RM),
+        sorted(RH),
+    )
+
+
+def test_compiled_matches_recursive_on_model(classified):
+    mapper, _ = classified
+    # textbook genes all have an expression value, leave some out
+    df = mapper.expression_df.copy()
+    df.iloc[::7] = np.nan
+    mapper = GPRMapper(mapper.metabolicModel, df, ignore_human=True)
+
+    scores = mapper.reaction_expressions()
+    reference = score_reference(mapper)
+    assert scores.keys() == reference.keys()
+    assert np.allclose(
+        [scores[rid] for rid in reference], list(reference.values())
+    )
+
+    mapper.create_reaction_classes()
+    RL, RM, RH = class_reference(mapper)
+    assert (set(mapper.RL), set(mapper.RM), set(mapper.RH)) == (
+        set(RL),
+        set(RM),
+        set(RH),
+    )
+
+
+def test_compiled_once_per_model(rule_model):
+    assert compile_gprs(rule_model, True) is compile_gprs(rule_model, True)
+    compiled = compile_gprs(rule_model, True)
+    assert compiled.reaction_ids == list(RULES)
+    assert compiled.score_roots[-1] == compiled.n_nodes
+
+
+def test_changed_rules_are_compiled_again(rule_model):
+    compiled = compile_gprs(rule_model, True)
+    rule_model.reactions.R_none.gene_reaction_rule = "g1 or g9"
+    changed = compile_gprs(rule_model, True)
+    assert changed is not compiled
+    assert "g9" in changed.gene_ids
+    assert changed.score_roots[-1] != changed.n_nodes
+
+    rule_model.add_reactions([Reaction("R_new")])
+    assert compile_gprs(rule_model, True).reaction_ids == list(RULES) + ["R_new"]
@@ -0,0 +1,84 @@
+import itertools
+
+import numpy as np
+import pytest
+from cobra.io import save_json_model
+
+import knockout_screen
+from knockout_screen import KnockoutResult, _derive
+
+
+def viable(growth, support):
+    return KnockoutResult("viable", growth, frozenset(support))
+
+
+def test_derive_lethal_subset():
+    results = {
+        (0,): viable(1.0, {1}),
+        (1,): KnockoutResult("infeasible", np.nan),
+    }
+    derived = _derive((0, 1), results)
+    assert derived.status == "lethal_subset"
+    assert np.isnan(derived.growth)
+    assert not derived.solved and derived.lethal
+
+    # no growth counts as lethal as well
+    results[(1,)] = KnockoutResult("no_growth", 0.0)
+    assert _derive((0, 1), results).status == "lethal_subset"
+
+
+def test_derive_missing_subset_is_lethal():
+    # a subset without a result is not expanded further, (1, 2) is missing
+    results = {(0, 1): viable(1.0, {2}), (0, 2): viable(1.0, {1})}
+    assert _derive((0, 1, 2), results).status == "lethal_subset"
+
+
+def test_derive_subset_without_flux():
+    # knocking out 1 does not change the solution of (0,), 1 carries no flux in it
+    results = {(0,): viable(0.8, {2}), (1,): viable(0.9, {0, 2})}
+    derived = _derive((0, 1), results)
+    assert derived == KnockoutResult("viable", 0.8, frozenset({2}), solved=False)
+
+
+def test_derive_needs_solve():
+    results = {(0,): viable(0.8, {1}), (1,): viable(0.9, {0})}
+    assert _derive((0, 1), results) is None
+
+
+@pytest.fixture
+def screened(model, tmp_path):
+    """
+    (candidates, worker model path) with the worker state of knockout_screen set
+    """
+    path = tmp_path / "textbook.json"
+    save_json_model(model, path)
+    candidates = [rct.id for rct in model.exchanges][:8] + [
+        "PGI",
+        "PFK",
+        "FBA",
+        "TPI",
+        "PGK",
+        "ENO",
+    ]
+    knockout_screen._init_worker(path, candidates, 0.01, model_cache=False)
+    return candidates, path
+
+
+def test_derived_results_match_solved(screened):
+    candidates, _ = screened
+    n = len(candidates)
+    results = {(): knockout_screen._solve_knockout(())}
+    n_derived = 0
+    for size in (1, 2, 3):
+        for combination in itertools.combinations(range(n), size):
+            derived = _derive(combination, results) if size > 1 else None
+            solved = knockout_screen._solve_knockout(combination)
+            if derived is None:
+                results[combination] = solved
+                continue
+            n_derived += 1
+            results[combination] = derived
+            assert solved.lethal == derived.lethal, combination
+            if not derived.lethal:
+                assert solved.growth == pytest.approx(derived.growth, abs=1e-6)
+    assert n_derived > 0
@@ -0,0 +1,40 @@
+import pulp
+import pytest
+
+from methods.SolverBackend import SolverOptions
+from problems import create_solver, pulp_rows, same_row
+
+
+def _objective(prob):
+    return {var.name: coef for var, coef in prob.objective.items() if coef != 0}
+
+
+@pytest.mark.parametrize("method", ["iMAT", "weighted_iMAT"])
+def test_updated_resident_problem_is_the_fresh_problem(model, classified, method):
+    mapper, result = classified
+    resident = create_solver(method, model, mapper, result)
+    resident.build_resident_problem()
+
+    # swap the classes of half of RH and RL and leave the rest unclassified
+    k = len(mapper.RH) // 2
+    classes = dict(RH=mapper.RL[:k], RM=mapper.RM[:k], RL=mapper.RH[:k])
+    resident.update_parameters(epsilon=0.5, **classes)
+    fresh = create_solver(method, model, mapper, result, epsilon=0.5, **classes)
+    fresh.build_problem()
+
+    rows, fresh_rows = pulp_rows(resident.prob), pulp_rows(fresh.prob)
+    for name, row in fresh_rows.items():
+        assert same_row(rows[name], row), name
+    # switched off rows only hold the flux of their reaction, i.e. its bounds
+    for name in rows.keys() - fresh_rows.keys():
+        if not name.startswith("y_tot_def_"):
+            assert len(rows[name][0]) == 1, name
+    assert _objective(resident.prob) == pytest.approx(_objective(fresh.prob))
+
+    options = SolverOptions(backend="highs", msg=False)
+    status, _, _, _ = resident.solve(solver=options.create())
+    assert status == pulp.LpStatusOptimal
+    fresh.solve(solver=options.create())
+    assert pulp.value(resident.prob.objective) == pytest.approx(
+        pulp.value(fresh.prob.objective)
+    )
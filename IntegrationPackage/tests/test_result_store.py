@@ -0,0 +1,35 @@
+import math
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils.ResultStore import ParquetResultSink, read_results
+
+
+def test_binaries_are_rounded(tmp_path):
+    sink = ParquetResultSink(tmp_path)
+    run = {
+        "method": "iMAT",
+        "cell_type": "baseMean",
+        "file": "sample",
+        "epsilon": 1.0,
+        "qL": 40,
+        "qH": 70,
+        "oxygenLevel": None,
+        "status": "optimal",
+        "gap": 0.0,
+    }
+    table = {
+        "reaction_id": ["R1", "R2", "R3", "R4"],
+        "flux_value": [1.0, 0.0, -2.0, 0.5],
+        "classification": ["RH", "RL", "RH", "RM"],
+        "y_f": [0.9999999997, -2.2e-16, 1.0000000002, None],
+        "y_r": [2.2e-16, 1e-10, 0.9999999, float("nan")],
+    }
+    sink.add(run, table)
+    sink.flush()
+
+    df = read_results(tmp_path, "iMAT", "baseMean")
+    assert df["y_f"].tolist()[:3] == [1, 0, 1]
+    assert df["y_r"].tolist()[:3] == [0, 0, 1]
+    assert math.isnan(df["y_f"].iloc[3]) and math.isnan(df["y_r"].iloc[3])
@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+from run_parallel import _round_split
+
+
+def test_given_threads_fit_the_cores():
+    conf = SimpleNamespace()
+    cores = list(range(8))
+    assert _round_split(conf, cores, None, 4, 100, False) == (2, 4)
+    assert _round_split(conf, cores, None, 3, 100, True) == (2, 3)
+    # more threads than cores: one worker
+    assert _round_split(conf, cores, None, 16, 100, False) == (1, 16)
+    # no more workers than jobs
+    assert _round_split(conf, cores, None, 2, 1, False) == (1, 2)
+
+
+def test_automatic_and_given_processes():
+    conf = SimpleNamespace(max_threads=8)
+    cores = list(range(8))
+    assert _round_split(conf, cores, None, None, 100, False) == (8, 1)
+    assert _round_split(conf, cores, None, None, 100, True) == (1, 8)
+    assert _round_split(conf, cores, 2, None, 100, False) == (2, 4)
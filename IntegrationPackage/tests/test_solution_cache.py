@@ -0,0 +1,62 @@
+import pulp
+import pytest
+
+from methods.SolverBackend import SolverOptions
+from problems import create_solver
+from utils.SolutionCache import SolutionCache, solution_key
+
+
+@pytest.mark.parametrize("method", ["iMAT", "weighted_iMAT"])
+def test_key_ignores_time_limit_but_not_gap(model, classified, method):
+    mapper, result = classified
+    solver = create_solver(method, model, mapper, result)
+    options = SolverOptions(backend="highs", gap=0.01)
+    key = solution_key("model", solver, options)
+
+    for other in (
+        SolverOptions(backend="highs", gap=0.01, time_limit=60),
+        SolverOptions(backend="cbc", gap=0.01, time_limit=5, node_limit=10),
+        SolverOptions(backend="highs", gap=0.01, threads=4, msg=True),
+    ):
+        assert solution_key("model", solver, other) == key
+    assert solution_key("model", solver, SolverOptions(gap=0.05)) != key
+    assert solution_key("model", solver, SolverOptions()) != key
+    assert solution_key("model", solver) != key
+
+
+def test_key_of_the_problem(model, classified):
+    mapper, result = classified
+    key = solution_key("model", create_solver("iMAT", model, mapper, result))
+    # the same classes in another order
+    same = create_solver(
+        "iMAT", model, mapper, result, RH=mapper.RH[::-1], RL=mapper.RL[::-1]
+    )
+    assert solution_key("model", same) == key
+    for other in (
+        create_solver("iMAT", model, mapper, result, epsilon=0.5),
+        create_solver("iMAT", model, mapper, result, RH=mapper.RH[1:]),
+        create_solver("weighted_iMAT", model, mapper, result),
+    ):
+        assert solution_key("model", other) != key
+    solver = create_solver("iMAT", model, mapper, result)
+    assert solution_key("other model", solver) != key
+
+
+def test_stores_optimal_and_infeasible(tmp_path):
+    cache = SolutionCache(tmp_path)
+    fluxes, y_values = {"PGI": 1.0}, {"y_pos_PGI": 1.0}
+    cache.put_solution("a" * 64, pulp.LpStatusOptimal, fluxes, y_values, gap=0.0)
+    assert cache.get("a" * 64)["fluxes"] == fluxes
+    assert cache.get("a" * 64)["status"] == "Optimal"
+
+    # stopped by the time limit, not stored
+    cache.put_solution(
+        "b" * 64, pulp.LpStatusOptimal, fluxes, y_values, solution_status="feasible"
+    )
+    cache.put_solution("c" * 64, pulp.LpStatusNotSolved, fluxes, y_values)
+    assert cache.get("b" * 64) is None
+    assert cache.get("c" * 64) is None
+
+    cache.put_infeasible("d" * 64, reason="bounds")
+    assert cache.get("d" * 64)["status"] == "Infeasible"
+    assert cache.get("d" * 64)["reason"] == "bounds"
@@ -0,0 +1,50 @@
+import pulp
+import pytest
+
+from methods.SolverBackend import SolverOptions
+from problems import create_solver, pulp_rows
+
+
+def _objective(weights, y_values):
+    return sum(
+        wf * y_values[rid][0] + wr * y_values[rid][1]
+        for rid, (wf, wr) in weights.items()
+    )
+
+
+def _pattern(weights, y_values):
+    """
+    Values of the binaries in the objective, the pool cuts differ in them
+    """
+    return tuple(
+        round(y)
+        for rid, w in sorted(weights.items())
+        for y, coef in zip(y_values[rid], w)
+        if coef != 0
+    )
+
+
+@pytest.mark.parametrize("build", ["build_problem", "build_resident_problem"])
+def test_pool_solutions_are_distinct(model, classified, build):
+    mapper, result = classified
+    solver = create_solver("iMAT", model, mapper, result)
+    getattr(solver, build)()
+    rows = pulp_rows(solver.prob)
+    options = SolverOptions(backend="highs", msg=False)
+
+    pool = solver.enumerate_solutions(4, options=options)
+    assert len(pool) > 1
+    weights = solver._objective_weights()
+    patterns = [_pattern(weights, y_values) for _, y_values in pool]
+    assert len(set(patterns)) == len(patterns)
+    # gap 0: all solutions are optimal
+    optimum = _objective(weights, pool[0][1])
+    for _, y_values in pool:
+        assert _objective(weights, y_values) == pytest.approx(optimum)
+    assert solver.solution_status == "optimal"
+
+    # the pool constraints are removed, the problem has the first optimum again
+    assert not [name for name in solver.prob.constraints if name.startswith("pool_")]
+    assert pulp_rows(solver.prob).keys() == rows.keys()
+    solver.solve(solver=options.create())
+    assert pulp.value(solver.prob.objective) == pytest.approx(optimum)
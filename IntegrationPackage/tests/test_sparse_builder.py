@@ -0,0 +1,29 @@
+import pytest
+
+from methods.SparseMILPBuilder import stoichiometric_matrix
+from problems import create_solver, same_problem
+
+
+@pytest.mark.parametrize("method", ["iMAT", "weighted_iMAT"])
+def test_sparse_builder_gives_the_pulp_problem(model, classified, method):
+    mapper, result = classified
+    solver = create_solver(method, model, mapper, result)
+    solver.build_problem()
+    pulp_prob = solver.prob
+    solver.build_sparse_problem()
+    assert same_problem(pulp_prob, solver.prob)
+
+
+def test_changed_stoichiometry_is_extracted_again(model):
+    S, _, rxn_ids = stoichiometric_matrix(model)
+    assert stoichiometric_matrix(model)[0] is S
+
+    pgi = model.reactions.PGI
+    pgi.add_metabolites({model.metabolites.atp_c: -1})
+    changed, met_ids, _ = stoichiometric_matrix(model)
+    assert changed is not S
+    assert changed[met_ids.index("atp_c"), rxn_ids.index("PGI")] == -1
+
+    # bounds are not part of the matrix
+    pgi.bounds = (0, 10)
+    assert stoichiometric_matrix(model)[0] is changed
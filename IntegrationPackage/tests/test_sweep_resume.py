@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from cobra.io import save_json_model
+from cobra.manipulation import rename_genes
+
+from run_parallel import run_parallel
+from utils.SweepManifest import SweepManifest
+
+CONFIG = """
+exprColNames = ["expression"]
+methods = ["iMAT"]
+geneColName = "gene"
+inputDir = "{input_dir}"
+filePattern = "*.csv"
+metabolicModel = "{model_path}"
+discretization = "quantile"
+outputDir = "{output_dir}"
+epsilon_range = [1.0]
+lower_q_range = [30, 40]
+upper_q_range = [70]
+oxygen_levels = None
+num_processes = 1
+solver = "highs"
+model_cache = False
+expression_cache = False
+solution_cache = False
+pin_workers = False
+"""
+
+
+def write_expression(path, model, gene_col="gene"):
+    rng = np.random.default_rng(0)
+    pd.DataFrame(
+        {
+            gene_col: [g.id for g in model.genes],
+            "expression": rng.lognormal(3, 2, len(model.genes)),
+        }
+    ).to_csv(path, index=False)
+
+
+def test_resume_skips_recorded_and_reruns_failed(model, tmp_path):
+    # the expression files are read with the gene ids of M. xanthus
+    rename_genes(model, {gene.id: f"MXAN_{gene.id}" for gene in model.genes})
+    model_path = tmp_path / "textbook.json"
+    save_json_model(model, model_path)
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    input_dir.mkdir()
+    write_expression(input_dir / "a.csv", model)
+    # without the gene column every task of b.csv fails
+    write_expression(input_dir / "b.csv", model, gene_col="locus")
+    config = tmp_path / "conf.py"
+    config.write_text(
+        CONFIG.format(
+            input_dir=input_dir, model_path=model_path, output_dir=output_dir
+        )
+    )
+
+    counts = run_parallel(config)
+    assert counts["error"] == 2
+    assert counts["optimal"] + counts["infeasible"] == 2
+    manifest = SweepManifest(output_dir / "sweep_manifest.tsv")
+    assert {key[0] for key in manifest.completed} == {str(input_dir / "a.csv")}
+
+    # the recorded tasks are skipped, the failed ones run (and fail) again
+    counts = run_parallel(config)
+    assert counts["error"] == 2
+    assert counts["optimal"] + counts["infeasible"] == 0
+
+    # once fixed, only the failed tasks are solved
+    write_expression(input_dir / "b.csv", model)
+    counts = run_parallel(config)
+    assert counts["error"] == 0
+    assert counts["optimal"] + counts["infeasible"] == 2
+    manifest = SweepManifest(output_dir / "sweep_manifest.tsv")
+    assert len(manifest) == 4
+    assert len(manifest.path.read_text().splitlines()) == 1 + 4
+
+    assert run_parallel(config) == {
+        "optimal": 0,
+        "feasible": 0,
+        "timeout": 0,
+        "infeasible": 0,
+        "error": 0,
+    }
@@ -1,17 +1,22 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any, Tuple
+import numpy as np
 import pulp
 import pandas as pd
 import re
 from utils.Discretizer import DiscretizationMethod
+from utils.ReactionIndex import ReactionClasses
+
+# Fluxes with a larger absolute value count as active in pool statistics
+ACTIVE_TOLERANCE = 1e-6
 
 
 @dataclass
 class CreateOutput:
     output_dir: Path  # directory to output path (e.g., /output)
     method: str  # either iMAT or weighted_iMAT
-    prob: pulp.LpProblem
+    prob: Optional[pulp.LpProblem]  # None for a result of the SolutionCache
     RH: List[str]
     RM: List[str]
     RL: List[str]
@@ -23,15 +28,122 @@ class CreateOutput:
     expression_df: pd.DataFrame
     discretization_method: DiscretizationMethod
     quantiles: Optional[List[float]]
+    # reaction classes as masks (IMATConfig.classes), else taken from RH, RM and RL
+    classes: Optional[ReactionClasses] = None
+    # optimal or feasible (stopped by the time or node limit), with the MIP gap
+    solution_status: Optional[str] = None
+    gap: Optional[float] = None
 
     # retrieve cell type Name
     def __post_init__(self):
         raw_name = self.expression_df.columns[0]
         self.cell_type_name = re.sub(r"\.+", "_", raw_name)
 
-    def create_output(self, fileName: Optional[str] = None):
+    def create_output(self, fileName: Optional[str] = None, sink=None):
+        """
+        Writes the flux distribution to a tsv file, or adds it to a result sink
+        (e.g. utils.ResultStore.ParquetResultSink) if given. The solution status and
+        MIP gap of a tsv file are appended to parentPath/method/solve_status.tsv.
+        """
+        if sink is not None:
+            sink.add(self.run_info(fileName=fileName), self.flux_table())
+            return
         file = self._generate_fileNames(fileName=fileName)
         self._create_file_flux_classification(file=file)
+        append_solve_status(
+            Path(self.output_dir) / self.method,
+            self.cell_type_name,
+            file.name,
+            self.solution_status,
+            self.gap,
+        )
+
+    def run_info(self, fileName: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parameters identifying the run: method, cell type, input file, epsilon,
+        quantiles and oxygenLevel, with the solution status and MIP gap
+        """
+        qL, qH = self.quantiles if self.quantiles is not None else (None, None)
+        return {
+            "method": self.method,
+            "cell_type": self.cell_type_name,
+            "file": Path(fileName).stem if fileName is not None else "",
+            "epsilon": self.epsilon,
+            "qL": qL,
+            "qH": qH,
+            "oxygenLevel": self.oxygenLevel,
+            "status": self.solution_status,
+            "gap": self.gap,
+        }
+
+    def create_pool_output(
+        self,
+        pool: List[Tuple[Dict[str, float], Dict[str, List[float]]]],
+        fileName: Optional[str] = None,
+    ) -> Path:
+        """
+        Writes the activity frequencies of a solution pool (see
+        BasePulpVarConfig.enumerate_solutions) next to the flux file, with the suffix
+        _pool.tsv
+        """
+        file = self._generate_fileNames(fileName=fileName)
+        file = file.with_name(f"{file.stem}_pool.tsv")
+        pd.DataFrame(self.pool_table(pool)).to_csv(file, sep="\t", index=False)
+        return file
+
+    def _labels(self, rids: List[str]) -> List[str]:
+        """
+        Classification (low, moderate, high or "") of the reactions
+        """
+        if self.classes is not None:
+            index = self.classes.index
+            return self.classes.labels()[index.indices(rids)].tolist()
+        # later updates win: a reaction in RH is high, even if also in RM or RL
+        classes = dict.fromkeys(self.RL, "low")
+        classes.update(dict.fromkeys(self.RM, "moderate"))
+        classes.update(dict.fromkeys(self.RH, "high"))
+        return [classes.get(rid, "") for rid in rids]
+
+    def pool_table(
+        self, pool: List[Tuple[Dict[str, float], Dict[str, List[float]]]]
+    ) -> Dict[str, list]:
+        """
+        Per reaction statistics over the solutions of a pool: columns reaction_id,
+        classification, active_frequency (share of the solutions with a flux above
+        ACTIVE_TOLERANCE), mean_flux, min_flux, max_flux and n_solutions
+        """
+        rids = list(pool[0][0])
+        fluxes = np.array(
+            [[np.nan if f[rid] is None else f[rid] for rid in rids] for f, _ in pool],
+            dtype=float,
+        )
+        return {
+            "reaction_id": rids,
+            "classification": self._labels(rids),
+            "active_frequency": (np.abs(fluxes) > ACTIVE_TOLERANCE).mean(axis=0),
+            "mean_flux": fluxes.mean(axis=0),
+            "min_flux": fluxes.min(axis=0),
+            "max_flux": fluxes.max(axis=0),
+            "n_solutions": np.full(len(rids), len(pool)),
+        }
+
+    def flux_table(self) -> Dict[str, list]:
+        """
+        Returns the flux distribution as columns reaction_id, flux_value, classification,
+        y_f, y_r and, for weighted_iMAT, c_value. Missing y and c values are None.
+        """
+        rids = list(self.flux_distribution)
+        y_values = [self.y_values.get(rid, (None, None)) for rid in rids]
+        table = {
+            "reaction_id": rids,
+            "flux_value": [self.flux_distribution[rid] for rid in rids],
+            "classification": self._labels(rids),
+            "y_f": [y[0] for y in y_values],
+            "y_r": [y[1] for y in y_values],
+        }
+        if self.method == "weighted_iMAT" and self.c_values:
+            table["c_value"] = [self.c_values.get(rid) for rid in rids]
+        return table
 
     def _create_output_dir(self):
         """
@@ -52,28 +164,10 @@ class CreateOutput:
         - optional fileName
         - optional oxygenLevel
         """
-        if fileName is not None:
-            fileName = Path(fileName).stem
-
         base_dir = self._create_output_dir()
-
-        if self.discretization_method.QUANTILE:
-            base_file = f"epsilon_{self.epsilon}_quantiles_{self.quantiles[0]}_{self.quantiles[1]}"
-        elif self.discretization_method.MEAN:
-            base_file = f"epsilon_{self.epsilon}_mean"
-
-        # final file name
-        parts = [base_file]
-        if fileName:
-            parts.append(fileName)
-        if self.oxygenLevel is not None:
-            parts.append(f"oxygenLevel_{self.oxygenLevel}")
-
-        # Combine parts with underscores
-        final_file_name = "_".join(parts) + ".tsv"
-        full_file_path = base_dir / final_file_name
-
-        return full_file_path
+        return base_dir / result_file_name(
+            self.epsilon, self.quantiles, fileName, self.oxygenLevel
+        )
 
     def _create_file_flux_classification(self, file: Path):
         """
@@ -86,84 +180,124 @@ class CreateOutput:
             - y_r
             - c_value (if weighted_iMAT)
         """
-        with open(file, "w") as f:
-            # Header
-            header = ["reaction_id", "flux_value", "classification", "y_f", "y_r"]
-            if self.method == "weighted_iMAT":
-                header.append("c_value")
-            f.write("\t".join(header) + "\n")
-
-            for rid, flux in self.flux_distribution.items():
-                if rid in self.RH:
-                    classification = "high"
-                elif rid in self.RM:
-                    classification = "moderate"
-                elif rid in self.RL:
-                    classification = "low"
-                else:
-                    classification = ""
-                yf, yr = ("", "")
-                if rid in self.y_values:
-                    yf = self.y_values[rid][0]
-                    yr = self.y_values[rid][1]
-                row = [rid, str(flux), classification, str(yf), str(yr)]
-
-                if self.method == "weighted_iMAT" and self.c_values:
-                    c_val = self.c_values.get(rid, "")
-                    row.append(str(c_val))
-
-                f.write("\t".join(row) + "\n")
-
-    def _create_infeasible_file(self):
-        """
-        Generates the file, where infeasible models will be printed to
-        """
-        inf_dir = Path(self.dir).parent / "infeasible_combinations"
-        inf_dir.parent.mkdir(parents=True, exist_ok=True)
+        write_flux_table(file, self.flux_table(), self.method == "weighted_iMAT")
+
+    def _create_infeasible_dir(self) -> Path:
+        """
+        Generates the directory, where infeasible models will be printed to
+        parentPath/method/infeasible_combinations
+        """
+        inf_dir = Path(self.output_dir) / self.method / "infeasible_combinations"
+        inf_dir.mkdir(parents=True, exist_ok=True)
         return inf_dir
 
-    def handle_infeasibility(self, fileName: Optional[str] = None):
+    def handle_infeasibility(
+        self, fileName: Optional[str] = None, reason: str = "MILP"
+    ):
         """
-        Writes info about an infeasible model to a file.
+        Writes info about an infeasible model, or one without solution within the
+        solver limits, to a file.
         Includes:
         - problem name
         - cell type
         - epsilon
         - quantiles (if quantile) or mean
-        - oxygenLevel
-        - file Name if given
-        """
-        dir_created = False
-        if dir_created == False:
-            inf_file = self._create_infeasible_dir() / "infeasible_combinations.tsv"
-            dir_created = True
-        if dir_created:
-            row = [
-                self.prob.name,
-                self.cell_type_name,
-                f"epsilon = {self.epsilon}",
-            ]
-            if self.discretization_method.QUANTILE:
-                row.append(f"quantiles = {self.quantiles[0]}, {self.quantiles[1]}")
-            else:
-                row.append("mean")
-
-            if self.oxygenLevel is not None:
-                row.append(self.oxygenLevel)
-
-            if fileName is not None:
-                row.append(fileName)
-            write_header = not inf_file.exists()
-            # Append to file
-            with open(inf_file, "a") as f:
-                if write_header:
-                    header = [
-                        "problem_name",
-                        "cell_type",
-                        "epsilon",
-                        "discretization",
-                        "oxygenLevel",
-                        "InputFile",
-                    ]
-                    f.write("\t".join(header) + "\n")
-                f.write("\t".join(row) + "\n")
+        - oxygenLevel (empty if not given)
+        - file Name (empty if not given)
+        - reason: check that found the infeasibility, "bounds" or "relaxation" of the
+          precheck (BasePulpVarConfig.precheck) or "MILP", "limit" if the time or
+          node limit was reached without a solution
+        """
+        inf_file = self._create_infeasible_dir() / "infeasible_combinations.tsv"
+        if self.discretization_method == DiscretizationMethod.QUANTILE:
+            discretization = f"quantiles = {self.quantiles[0]}, {self.quantiles[1]}"
+        else:
+            discretization = "mean"
+        row = [
+            self.method if self.prob is None else self.prob.name,
+            self.cell_type_name,
+            f"epsilon = {self.epsilon}",
+            discretization,
+            "" if self.oxygenLevel is None else str(self.oxygenLevel),
+            "" if fileName is None else str(fileName),
+            reason,
+        ]
+        # Append to file
+        with open(inf_file, "a") as f:
+            if f.tell() == 0:
+                header = [
+                    "problem_name",
+                    "cell_type",
+                    "epsilon",
+                    "discretization",
+                    "oxygenLevel",
+                    "InputFile",
+                    "reason",
+                ]
+                f.write("\t".join(header) + "\n")
+            f.write("\t".join(row) + "\n")
+
+
+def result_file_name(epsilon, quantiles, fileName=None, oxygenLevel=None) -> str:
+    """
+    Name of the tsv file of a run:
+    epsilon_<epsilon>_quantiles_<qL>_<qH>[_<fileName>][_oxygenLevel_<oxygenLevel>].tsv,
+    with _mean instead of the quantiles if quantiles is None
+    """
+    if quantiles is not None:
+        base_file = f"epsilon_{epsilon}_quantiles_{quantiles[0]}_{quantiles[1]}"
+    else:
+        base_file = f"epsilon_{epsilon}_mean"
+
+    # final file name
+    parts = [base_file]
+    if fileName:
+        parts.append(Path(fileName).stem)
+    if oxygenLevel is not None:
+        parts.append(f"oxygenLevel_{oxygenLevel}")
+
+    # Combine parts with underscores
+    return "_".join(parts) + ".tsv"
+
+
+def append_solve_status(
+    method_dir: Path,
+    cell_type: str,
+    result_file: str,
+    solution_status: Optional[str],
+    gap: Optional[float],
+):
+    """
+    Appends the solution status (optimal, or feasible if the solve was stopped by the
+    time or node limit) and MIP gap of a result file to method_dir/solve_status.tsv.
+    Unknown values are written as empty fields.
+    """
+    method_dir.mkdir(parents=True, exist_ok=True)
+    row = [
+        cell_type,
+        result_file,
+        "" if solution_status is None else solution_status,
+        "" if gap is None else str(gap),
+    ]
+    with open(method_dir / "solve_status.tsv", "a") as f:
+        if f.tell() == 0:
+            f.write("\t".join(["cell_type", "result_file", "status", "gap"]) + "\n")
+        f.write("\t".join(row) + "\n")
+
+
+def write_flux_table(file: Path, table: Dict[str, list], weighted: bool):
+    """
+    Writes a flux table (see CreateOutput.flux_table) as tsv, None is written as
+    empty field. The c_value column is in the header of weighted_iMAT results.
+    """
+    header = ["reaction_id", "flux_value", "classification", "y_f", "y_r"]
+    if weighted:
+        header.append("c_value")
+    columns = [table[name] for name in header if name in table]
+    lines = ["\t".join(header)]
+    lines += [
+        "\t".join("" if value is None else str(value) for value in row)
+        for row in zip(*columns)
+    ]
+    with open(file, "w") as f:
+        f.write("\n".join(lines) + "\n")
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 import pandas as pd
 import numpy as np
@@ -17,6 +17,99 @@ class DiscretizationResult:
     dataframe: pd.DataFrame
 
 
+@dataclass
+class BatchDiscretizationResult:
+    """
+    Discretization of several samples with several rules at once.
+
+    genes: Gene ids (rows of the input)
+    samples: Sample (column) names
+    rules: Quantile pairs (qL, qH), None for the mean rule
+    thresholds, scaled_thresholds: (rules, samples, 2) lower and upper threshold
+    scaled: (genes, samples) scaled expression
+    levels: (rules, genes, samples) -1, 0, 1 and NaN where the expression is missing
+    """
+
+    genes: List[str]
+    samples: List[str]
+    rules: List[Optional[Tuple[float, float]]]
+    thresholds: np.ndarray
+    scaled_thresholds: np.ndarray
+    scaled: np.ndarray
+    levels: np.ndarray
+
+    def dataframe(self, rule: int, sample: int, values: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the dataframe Discretizer.run gives for one sample and rule: the
+        expression column of values with scaled_expression and discretization added
+        """
+        df = values.loc[self.genes, [self.samples[sample]]].copy()
+        df["scaled_expression"] = self.scaled[:, sample]
+        df["discretization"] = self.levels[rule, :, sample]
+        return df
+
+
+def discretize_batch(
+    df: pd.DataFrame, rules: List[Optional[Tuple[float, float]]]
+) -> BatchDiscretizationResult:
+    """
+    Discretizes all columns (samples) of a genes x samples dataframe with every rule,
+    the thresholds of all quantile pairs are computed with one nanquantile call.
+    Gives the same values as Discretizer.run per column and rule.
+
+    :param df: Expression values, genes x samples, NaN allowed
+    :param rules: Quantile pairs (qL, qH), None for mean discretization
+    """
+    for rule in rules:
+        if rule is not None and (len(rule) != 2 or rule[0] >= rule[1]):
+            raise ValueError(
+                f"Quantile discretization requires two increasing quantiles, got {rule}"
+            )
+    X = df.to_numpy(dtype=float)
+    low, high = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    scaled = (X - low) / (high - low)
+
+    thresholds = np.empty((len(rules), X.shape[1], 2))
+    scaled_thresholds = np.empty_like(thresholds)
+    quantile_rules = [i for i, rule in enumerate(rules) if rule is not None]
+    if quantile_rules:
+        q = np.array([rules[i] for i in quantile_rules], dtype=float) / 100
+        # (2 * rules, samples), lower and upper quantile of each rule
+        thresholds[quantile_rules] = np.moveaxis(
+            np.nanquantile(X, q.ravel(), axis=0).reshape(len(quantile_rules), 2, -1),
+            1,
+            2,
+        )
+        scaled_thresholds[quantile_rules] = np.moveaxis(
+            np.nanquantile(scaled, q.ravel(), axis=0).reshape(
+                len(quantile_rules), 2, -1
+            ),
+            1,
+            2,
+        )
+    mean_rules = [i for i, rule in enumerate(rules) if rule is None]
+    if mean_rules:
+        for values, out in ((X, thresholds), (scaled, scaled_thresholds)):
+            mean = np.nanmean(values, axis=0)
+            sd = np.nanstd(values, axis=0, ddof=1)
+            out[mean_rules] = np.stack([mean - 0.5 * sd, mean + 0.5 * sd], axis=1)
+
+    lower = thresholds[:, None, :, 0]
+    upper = thresholds[:, None, :, 1]
+    levels = np.select(
+        [X > upper, X < lower, (X >= lower) & (X <= upper)], [1, -1, 0], default=np.nan
+    )
+    return BatchDiscretizationResult(
+        genes=df.index.tolist(),
+        samples=df.columns.tolist(),
+        rules=list(rules),
+        thresholds=thresholds,
+        scaled_thresholds=scaled_thresholds,
+        scaled=scaled,
+        levels=levels,
+    )
+
+
 class Discretizer:
     def __init__(self, method: str, quantiles: List[int]):
         self.method = DiscretizationMethod(method)
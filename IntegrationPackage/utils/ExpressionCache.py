@@ -0,0 +1,146 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Union
+import pandas as pd
+from cobra import Model
+from utils.generate_RNASeqDf import generate_RNASeqDf
+from utils.ModelLoader import file_hash
+from utils.read_file import read_expression_file
+from utils.SnapshotCache import SnapshotCache
+
+# Cache directory, can be set with the environment variable INTEGRATION_EXPRESSION_CACHE
+DEFAULT_EXPRESSION_CACHE_DIR = Path(
+    os.environ.get(
+        "INTEGRATION_EXPRESSION_CACHE",
+        Path.home() / ".cache" / "IntegrationPackage" / "expression",
+    )
+)
+
+# Rows per chunk when reading an expression file
+CHUNKSIZE = 100_000
+
+
+def _as_list(columns: Union[str, List[str], None]) -> List[str]:
+    if columns is None:
+        return []
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def read_aligned_expression(
+    path: Union[str, Path],
+    metabolicModel: Model,
+    geneColName: str,
+    expressionColName: Union[str, List[str]],
+    idColNames: Optional[List[str]] = None,
+    chunksize: int = CHUNKSIZE,
+) -> pd.DataFrame:
+    """
+    Reads the gene and expression columns of the file in chunks, keeps the rows of the
+    model genes and aligns them with the model (generate_RNASeqDf)
+
+    :param idColNames: Further gene id columns of the file (e.g. Gene_name, GeneID),
+        with geneColName the id mapping table for gene ids that differ from the model
+    """
+    idColNames = [col for col in _as_list(idColNames) if col != geneColName]
+    genes = [g.id for g in metabolicModel.genes]
+    df = read_expression_file(
+        path,
+        geneColName=geneColName,
+        expressionColNames=_as_list(expressionColName),
+        idColNames=idColNames,
+        genes=None if idColNames else genes,
+        chunksize=chunksize,
+    )
+    id_map = None
+    if idColNames:
+        id_map = df[[geneColName] + idColNames]
+        if not id_map.isin(genes).any(axis=None):
+            df = df.iloc[:0]
+    if df.empty:
+        raise ValueError(f"No gene of the model in column {geneColName} of {path}")
+    return generate_RNASeqDf(
+        metabolicModel, df, geneColName, expressionColName, id_map=id_map
+    )
+
+
+@dataclass
+class ExpressionCache(SnapshotCache):
+    """
+    Pickled model-aligned expression tables (see read_aligned_expression), keyed by
+    the content hash of the expression file, the gene and expression column, the
+    gene ids of the model and the pandas version. Repeated runs on the same file skip
+    the CSV parsing.
+
+    cache_dir: Directory of the snapshots
+    max_size_mb: Size limit of the cache directory in MB
+    """
+
+    cache_dir: Path = DEFAULT_EXPRESSION_CACHE_DIR
+    max_size_mb: float = 256
+
+    def snapshot_path(
+        self,
+        path: Union[str, Path],
+        metabolicModel: Model,
+        geneColName: str,
+        expressionColName: Union[str, List[str]],
+        idColNames: Optional[List[str]] = None,
+    ) -> Path:
+        columns = hashlib.sha256(
+            "\n".join(
+                [geneColName, *_as_list(expressionColName), "|", *_as_list(idColNames)]
+                + sorted(g.id for g in metabolicModel.genes)
+            ).encode()
+        ).hexdigest()
+        key = f"{file_hash(path)[:32]}-{columns[:16]}-pandas{pd.__version__}"
+        return self.cache_dir / f"{Path(path).stem}-{key}.pkl"
+
+    def load(
+        self,
+        path: Union[str, Path],
+        metabolicModel: Model,
+        geneColName: str,
+        expressionColName: Union[str, List[str]],
+        idColNames: Optional[List[str]] = None,
+        refresh: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Returns the aligned expression table, from the snapshot if there is one,
+        otherwise the file is read and a snapshot stored. Every call returns a new
+        DataFrame.
+
+        :param refresh: Read the file and replace the snapshot
+        """
+        snapshot = self.snapshot_path(
+            path, metabolicModel, geneColName, expressionColName, idColNames
+        )
+        if not refresh:
+            expression_df = self._read(snapshot)
+            if expression_df is not None:
+                return expression_df
+
+        expression_df = read_aligned_expression(
+            path, metabolicModel, geneColName, expressionColName, idColNames
+        )
+        self._store(snapshot, expression_df)
+        return expression_df
+
+
+def load_expression(
+    path: Union[str, Path],
+    metabolicModel: Model,
+    geneColName: str,
+    expressionColName: Union[str, List[str]],
+    idColNames: Optional[List[str]] = None,
+    cache: Optional[ExpressionCache] = None,
+) -> pd.DataFrame:
+    """
+    Loads the model-aligned expression table through the expression cache (default:
+    DEFAULT_EXPRESSION_CACHE_DIR). Use read_aligned_expression to read the file
+    without cache.
+    """
+    return (cache or ExpressionCache()).load(
+        path, metabolicModel, geneColName, expressionColName, idColNames
+    )
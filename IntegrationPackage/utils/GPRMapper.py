@@ -1,9 +1,238 @@
+from ast import And, BoolOp, Name, Or
 from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+import numpy as np
 import pandas as pd
 from cobra import Model
 from cobra.core.gene import GPR
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import re
+from utils.ReactionIndex import ReactionClasses, ReactionIndex
+
+_LEAF, _MIN, _MAX = 0, 1, 2
+
+
+def filter_gpr(gpr_rule: str, ignore_human: bool) -> str:
+    """
+    Filters gpr rules from human/mouse genes
+    """
+    tokens = gpr_rule.split(" ")
+    if ignore_human:
+        prefix = "ENSG"
+    else:
+        prefix = "MXAN"
+    indices_to_remove = set()
+    for i in range(len(tokens) - 1, -1, -1):
+        if prefix in tokens[i]:
+            indices_to_remove.update({i - 1, i, i + 1})
+
+    tokens = [tok for idx, tok in enumerate(tokens) if idx not in indices_to_remove]
+    if tokens and tokens[-1].lower() == "or":
+        tokens = tokens[:-1]
+    filtered_gpr = " ".join(tokens)
+    return filtered_gpr
+
+
+def tokenize_gpr(gpr_rule: str) -> List[str]:
+    """
+    Tokenizes a filtered gpr rule while keeping parentheses and operators (AND, OR)
+    """
+    gpr_rule = gpr_rule.replace(" or ", " OR ").replace(" and ", " AND ")
+    return re.findall(r"\(|\)|AND|OR|[^\s()]+", gpr_rule)
+
+
+@dataclass
+class CompiledGPR:
+    """
+    The filtered GPR rules of a model compiled to binary min/max trees over gene
+    indices. All trees share one node table, nodes are grouped by height so that
+    all rules are evaluated with one NumPy operation per height.
+
+    Two trees are kept per reaction:
+    - class tree: the rule as parsed by cobra (AND binds stronger than OR), evaluated
+      on the discretization levels. Its value is the class of the reaction, the
+      same as cobra's GPR.eval with the lowly (and moderately) expressed genes
+      knocked out.
+    - score tree: the rule evaluated left to right as GPRMapper.get_reaction_expression
+      does, evaluated on the scaled expression.
+
+    reaction_ids: Reactions in model order
+    gene_ids: Genes of the leaves, gene vectors passed to evaluate follow this order
+    class_roots, score_roots: Root node per reaction, -1 for an empty rule
+    """
+
+    reaction_ids: List[str]
+    gene_ids: List[str]
+    class_roots: np.ndarray
+    score_roots: np.ndarray
+    leaf_nodes: np.ndarray
+    leaf_genes: np.ndarray
+    # per height: (nodes, left children, right children, is_min)
+    levels: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+    n_nodes: int
+
+    def evaluate(self, gene_values: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the trees of roots on gene_values (genes, or genes x samples,
+        aligned with gene_ids). Returns one row per root, NaN for empty rules.
+        """
+        gene_values = np.asarray(gene_values, dtype=float)
+        values = np.empty((self.n_nodes + 1,) + gene_values.shape[1:])
+        values[self.leaf_nodes] = gene_values[self.leaf_genes]
+        for nodes, left, right, is_min in self.levels:
+            values[nodes] = np.where(
+                is_min.reshape((-1,) + (1,) * (values.ndim - 1)),
+                np.minimum(values[left], values[right]),
+                np.maximum(values[left], values[right]),
+            )
+        # the extra last node is the NaN value of empty rules
+        values[-1] = np.nan
+        return values[roots]
+
+    def gene_vector(self, series: pd.Series, default: float) -> np.ndarray:
+        """
+        Aligns a gene indexed series with gene_ids, missing and NaN values get default
+        """
+        values = series.reindex(self.gene_ids).to_numpy(dtype=float)
+        return np.where(np.isnan(values), default, values)
+
+
+class _GPRCompiler:
+    def __init__(self):
+        self.op, self.left, self.right, self.height = [], [], [], []
+        self.gene_index: Dict[str, int] = {}
+
+    def leaf(self, gene_id: str) -> int:
+        gene = self.gene_index.setdefault(gene_id, len(self.gene_index))
+        return self._add(_LEAF, gene, -1, 0)
+
+    def node(self, op: int, left: int, right: int) -> int:
+        return self._add(
+            op, left, right, 1 + max(self.height[left], self.height[right])
+        )
+
+    def _add(self, op, left, right, height) -> int:
+        self.op.append(op)
+        self.left.append(left)
+        self.right.append(right)
+        self.height.append(height)
+        return len(self.op) - 1
+
+    def class_tree(self, expr) -> int:
+        """
+        Compiles the ast of a cobra GPR
+        """
+        if isinstance(expr, Name):
+            return self.leaf(expr.id)
+        if isinstance(expr, BoolOp) and isinstance(expr.op, (And, Or)):
+            op = _MIN if isinstance(expr.op, And) else _MAX
+            root = self.class_tree(expr.values[0])
+            for value in expr.values[1:]:
+                root = self.node(op, root, self.class_tree(value))
+            return root
+        raise TypeError(f"Unsupported operation: {repr(expr)}")
+
+    def score_tree(self, op_list: list) -> Optional[int]:
+        """
+        Compiles a token list the way GPRMapper._recursive_evaluation evaluates it,
+        with node ids in place of values. Returns None if the rule has no value.
+        """
+        if len(op_list) == 1:
+            return op_list[0]
+        i = 0
+        while i < len(op_list):
+            if op_list[i] == "(":
+                level = 1
+                j = i + 1
+                while j < len(op_list) and level > 0:
+                    if op_list[j] == "(":
+                        level += 1
+                    elif op_list[j] == ")":
+                        level -= 1
+                    j += 1
+                value = self.score_tree(op_list[i + 1 : j - 1])
+                return self.score_tree(op_list[:i] + [value] + op_list[j:])
+            i += 1
+        result = None
+        i = 0
+        while i < len(op_list):
+            token = op_list[i]
+            if token in ("min", "max"):
+                op = _MIN if token == "min" else _MAX
+                first = result if result is not None else op_list[i - 1]
+                result = self.node(op, first, op_list[i + 1])
+                i += 2
+            else:
+                if result is None and not isinstance(token, str):
+                    result = token
+                i += 1
+        return result
+
+    def score_tokens(self, tokens: List[str]) -> list:
+        return [
+            "min" if tok == "AND" else "max" if tok == "OR"
+            else tok if tok in ("(", ")") else self.leaf(tok)
+            for tok in tokens
+        ]
+
+    def compile(self, reaction_ids, class_roots, score_roots) -> CompiledGPR:
+        op = np.array(self.op, dtype=int)
+        left = np.array(self.left, dtype=int)
+        right = np.array(self.right, dtype=int)
+        height = np.array(self.height, dtype=int)
+        leaf_nodes = np.flatnonzero(op == _LEAF)
+        levels = []
+        for h in range(1, height.max() + 1 if len(height) else 1):
+            nodes = np.flatnonzero(height == h)
+            levels.append((nodes, left[nodes], right[nodes], op[nodes] == _MIN))
+        n_nodes = len(op)
+        return CompiledGPR(
+            reaction_ids=reaction_ids,
+            gene_ids=list(self.gene_index),
+            class_roots=np.array([n_nodes if r is None else r for r in class_roots]),
+            score_roots=np.array([n_nodes if r is None else r for r in score_roots]),
+            leaf_nodes=leaf_nodes,
+            leaf_genes=left[leaf_nodes],
+            levels=levels,
+            n_nodes=n_nodes,
+        )
+
+
+# Compiled GPRs per model object and ignore_human, with the (reaction id, rule)
+# pairs they were compiled from
+_COMPILED_CACHE: "WeakKeyDictionary[Model, Dict[bool, Tuple[tuple, CompiledGPR]]]" = (
+    WeakKeyDictionary()
+)
+
+
+def compile_gprs(metabolicModel: Model, ignore_human: bool) -> CompiledGPR:
+    """
+    Returns the compiled filtered GPR rules of all reactions of the model. Rules are
+    compiled once per model object and compiled again if the reactions or their GPRs
+    changed since.
+    """
+    rules = tuple((rct.id, str(rct.gpr)) for rct in metabolicModel.reactions)
+    cached = _COMPILED_CACHE.setdefault(metabolicModel, {})
+    if ignore_human in cached and cached[ignore_human][0] == rules:
+        return cached[ignore_human][1]
+
+    compiler = _GPRCompiler()
+    reaction_ids, class_roots, score_roots = [], [], []
+    for rid, rule in rules:
+        gpr_rule = filter_gpr(rule, ignore_human)
+        body = GPR().from_string(gpr_rule).body
+        reaction_ids.append(rid)
+        class_roots.append(None if body is None else compiler.class_tree(body))
+        try:
+            score = compiler.score_tree(compiler.score_tokens(tokenize_gpr(gpr_rule)))
+        except (IndexError, TypeError):
+            # malformed rule, get_reaction_expression fails on it as well
+            score = None
+        score_roots.append(score if isinstance(score, int) else None)
+
+    compiled = compiler.compile(reaction_ids, class_roots, score_roots)
+    cached[ignore_human] = (rules, compiled)
+    return compiled
 
 
 @dataclass
@@ -13,15 +242,90 @@ class GPRMapperOutput:
     RH: List[str]
 
 
+@dataclass
+class BatchReactionClasses:
+    """
+    Reaction classes of every rule x sample of a BatchDiscretizationResult.
+
+    reaction_ids: Reactions in model order
+    RL, RM, RH: (rules, samples, reactions) boolean masks
+    """
+
+    reaction_ids: List[str]
+    RL: np.ndarray
+    RM: np.ndarray
+    RH: np.ndarray
+
+    def classes(self, rule: int, sample: int) -> GPRMapperOutput:
+        """
+        Returns the reaction ids per class for one rule and sample, in the same order
+        as GPRMapper.create_reaction_classes
+        """
+        ids = np.asarray(self.reaction_ids, dtype=object)
+        return GPRMapperOutput(
+            RL=ids[self.RL[rule, sample]].tolist(),
+            RM=ids[self.RM[rule, sample]].tolist(),
+            RH=ids[self.RH[rule, sample]].tolist(),
+        )
+
+
+def classify_batch(
+    metabolicModel: Model, batch, ignore_human: bool
+) -> BatchReactionClasses:
+    """
+    Classifies the reactions for every rule and sample of a batch discretization
+    (utils.Discretizer.discretize_batch) in one evaluation of the compiled GPRs.
+    """
+    compiled = compile_gprs(metabolicModel, ignore_human)
+    rows = pd.Index(batch.genes).get_indexer(compiled.gene_ids)
+    n_rules, _, n_samples = batch.levels.shape
+    # genes x (rules * samples), genes without discretization count as active
+    levels = np.moveaxis(batch.levels, 1, 0).reshape(len(batch.genes), -1)
+    levels = np.where(rows[:, None] >= 0, levels[rows], np.inf)
+    levels = np.where(np.isnan(levels), np.inf, levels)
+    classes = compiled.evaluate(levels, compiled.class_roots)
+    classes = classes.T.reshape(n_rules, n_samples, -1)
+    return BatchReactionClasses(
+        reaction_ids=compiled.reaction_ids,
+        RL=classes == -1,
+        RM=classes == 0,
+        RH=classes == 1,
+    )
+
+
 @dataclass
 class GPRMapper:
     metabolicModel: Model
     expression_df: pd.DataFrame
     ignore_human: bool
+    # index of the model reactions, built from the model if None
+    reaction_index: Optional[ReactionIndex] = None
 
     RL: list = field(init=False, default_factory=list)
     RM: list = field(init=False, default_factory=list)
     RH: list = field(init=False, default_factory=list)
+    # masks of RL, RM and RH over the reactions, set by create_reaction_classes
+    classes: Optional[ReactionClasses] = field(init=False, default=None)
+
+    @property
+    def compiled(self) -> CompiledGPR:
+        return compile_gprs(self.metabolicModel, self.ignore_human)
+
+    def reaction_expressions(self, default_value=0.5) -> Dict[str, float]:
+        """
+        Returns the evaluated scaled expression (see get_reaction_expression) of all
+        reactions with a GPR rule, computed with the compiled rules of the model.
+        """
+        compiled = self.compiled
+        genes = compiled.gene_vector(
+            self.expression_df["scaled_expression"], default_value
+        )
+        values = compiled.evaluate(genes, compiled.score_roots)
+        return {
+            rid: float(value)
+            for rid, value in zip(compiled.reaction_ids, values)
+            if not np.isnan(value)
+        }
 
     def get_reaction_expression(self, gpr: str):
         """
@@ -42,9 +346,8 @@ class GPRMapper:
             Evaluated expression value (if OR, max value, if AND min value of leading gene)
         """
         gpr_rule = self._filter_gpr(gpr)
-        gpr_rule = gpr_rule.replace(" or ", " OR ").replace(" and ", " AND ")
         # tokenize while keeping parentheses and operators, all elements of rules correspond to one list entry
-        tokens = re.findall(r"\(|\)|AND|OR|[^\s()]+", gpr_rule)
+        tokens = tokenize_gpr(gpr_rule)
         # Exchange gene ids and logical expressions (and, or) with expression values and (min, max)
         parsed_tokens = [self._parse_token(tok) for tok in tokens]
         val = self._recursive_evaluation(parsed_tokens)
@@ -55,28 +358,22 @@ class GPRMapper:
         Maps model GPR rules to gene expression dataframe and returns list of reactions IDs
         within the classes lowly-, moderate-, and highly active reactions, RL, RM, and RH respectively.
         """
-        active_genes = self.expression_df.index[
-            self.expression_df["discretization"] == 1
-        ].tolist()
-        nonActive_genes = self.expression_df.index[
-            self.expression_df["discretization"] == -1
-        ].tolist()
-        moderateActive_genes = self.expression_df.index[
-            self.expression_df["discretization"] == 0
-        ].tolist()
-
-        for rct in self.metabolicModel.reactions:
-            gpr_rule = self._filter_gpr(str(rct.gpr))
-            gpr_rule = GPR().from_string(gpr_rule)
-
-            if not GPR(gpr_rule).eval(nonActive_genes):
-                self.RL.append(rct.id)
-            elif not GPR(gpr_rule).eval(nonActive_genes + moderateActive_genes):
-                self.RM.append(rct.id)
-            elif not GPR(gpr_rule).eval(
-                active_genes + moderateActive_genes + nonActive_genes
-            ):
-                self.RH.append(rct.id)
+        compiled = self.compiled
+        # genes without discretization are never knocked out, they count as active
+        levels = compiled.gene_vector(self.expression_df["discretization"], np.inf)
+        classes = compiled.evaluate(levels, compiled.class_roots)
+
+        if self.reaction_index is None:
+            self.reaction_index = ReactionIndex.from_model(self.metabolicModel)
+        self.classes = ReactionClasses(
+            self.reaction_index,
+            RL=classes == -1,
+            RM=classes == 0,
+            RH=classes == 1,
+        )
+        self.RL += self.classes.ids(self.classes.RL)
+        self.RM += self.classes.ids(self.classes.RM)
+        self.RH += self.classes.ids(self.classes.RH)
 
         return GPRMapperOutput(RL=self.RL, RM=self.RM, RH=self.RH)
 
@@ -84,21 +381,7 @@ class GPRMapper:
         """'
         Filters gpr rules from human/mouse genes/
         """
-        tokens = gpr_rule.split(" ")
-        if self.ignore_human:
-            prefix = "ENSG"
-        else:
-            prefix = "MXAN"
-        indices_to_remove = set()
-        for i in range(len(tokens) - 1, -1, -1):
-            if prefix in tokens[i]:
-                indices_to_remove.update({i - 1, i, i + 1})
-
-        tokens = [tok for idx, tok in enumerate(tokens) if idx not in indices_to_remove]
-        if tokens and tokens[-1].lower() == "or":
-            tokens = tokens[:-1]
-        filtered_gpr = " ".join(tokens)
-        return filtered_gpr
+        return filter_gpr(gpr_rule, self.ignore_human)
 
     def _parse_token(self, token: str, default_value=0.5):
         """
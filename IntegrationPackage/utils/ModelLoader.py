@@ -0,0 +1,91 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+import cobra
+from cobra import Model
+from cobra.io import load_json_model, load_matlab_model, load_yaml_model, read_sbml_model
+from utils.SnapshotCache import SnapshotCache
+
+# Cache directory, can be set with the environment variable INTEGRATION_MODEL_CACHE
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get(
+        "INTEGRATION_MODEL_CACHE",
+        Path.home() / ".cache" / "IntegrationPackage" / "models",
+    )
+)
+
+
+def read_model(path: Union[str, Path]) -> Model:
+    """
+    Reads a cobra model, the format is taken from the file extension
+    (.json, .mat, .yml/.yaml, otherwise SBML)
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".json":
+        return load_json_model(str(path))
+    elif suffix == ".mat":
+        return load_matlab_model(str(path))
+    elif suffix in (".yml", ".yaml"):
+        return load_yaml_model(str(path))
+    return read_sbml_model(str(path))
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """
+    sha256 of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ModelCache(SnapshotCache):
+    """
+    Pickled snapshots of parsed models, keyed by the content hash of the model file
+    and the cobra version. A changed file or cobra version gives a new key, unused
+    snapshots are removed (least recently used first) once the cache is larger than
+    max_size_mb. The blocked reactions of methods.presolve share the directory and
+    its size limit.
+
+    cache_dir: Directory of the snapshots
+    max_size_mb: Size limit of the cache directory in MB
+    """
+
+    cache_dir: Path = DEFAULT_CACHE_DIR
+    max_size_mb: float = 1024
+    # with the blocked reactions cached by methods.presolve.blocked_reactions
+    patterns = ("*.pkl", "blocked-*.json")
+
+    def snapshot_path(self, path: Union[str, Path]) -> Path:
+        key = f"{file_hash(path)[:32]}-cobra{cobra.__version__}"
+        return self.cache_dir / f"{Path(path).stem}-{key}.pkl"
+
+    def load(self, path: Union[str, Path], refresh: bool = False) -> Model:
+        """
+        Returns the model of the file, from the snapshot if there is one, otherwise
+        the file is parsed and a snapshot stored. Every call returns a new Model object.
+
+        :param refresh: Parse the file and replace the snapshot
+        """
+        snapshot = self.snapshot_path(path)
+        if not refresh:
+            model = self._read(snapshot)
+            if model is not None:
+                return model
+
+        model = read_model(path)
+        self._store(snapshot, model)
+        return model
+
+
+def load_model(path: Union[str, Path], cache: Optional[ModelCache] = None) -> Model:
+    """
+    Loads a cobra model through the model cache (default: DEFAULT_CACHE_DIR).
+    Use read_model to parse the file without cache.
+    """
+    return (cache or ModelCache()).load(path)
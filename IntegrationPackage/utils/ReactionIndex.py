@@ -0,0 +1,89 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from cobra import Model
+
+
+@dataclass
+class ReactionIndex:
+    """
+    Reactions of a model in model order, with their flux bounds as arrays. Built once
+    per problem instead of looking reactions up by id.
+
+    reaction_ids: Reaction ids in model order
+    lower_bound, upper_bound: Flux bounds of the model, per reaction
+    """
+
+    reaction_ids: List[str]
+    lower_bound: np.ndarray
+    upper_bound: np.ndarray
+    position: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.position = {rid: j for j, rid in enumerate(self.reaction_ids)}
+
+    @classmethod
+    def from_model(cls, metabolicModel: Model) -> "ReactionIndex":
+        """
+        Index of the current reactions and bounds of the model
+        """
+        reactions = metabolicModel.reactions
+        return cls(
+            reaction_ids=[rct.id for rct in reactions],
+            lower_bound=np.array([rct.lower_bound for rct in reactions], dtype=float),
+            upper_bound=np.array([rct.upper_bound for rct in reactions], dtype=float),
+        )
+
+    def __len__(self) -> int:
+        return len(self.reaction_ids)
+
+    def indices(self, reaction_ids: Iterable[str]) -> np.ndarray:
+        return np.fromiter(
+            (self.position[rid] for rid in reaction_ids), dtype=np.intp
+        )
+
+    def mask(self, reaction_ids: Iterable[str]) -> np.ndarray:
+        """
+        Boolean mask over the index of the given reactions
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.indices(reaction_ids)] = True
+        return mask
+
+    def bounds(self, rid: str) -> Tuple[float, float]:
+        j = self.position[rid]
+        return float(self.lower_bound[j]), float(self.upper_bound[j])
+
+
+@dataclass
+class ReactionClasses:
+    """
+    Classification of the reactions of a ReactionIndex as boolean masks
+
+    RL, RM, RH: Lowly, moderately and highly expressed reactions
+    """
+
+    index: ReactionIndex
+    RL: np.ndarray
+    RM: np.ndarray
+    RH: np.ndarray
+
+    @classmethod
+    def from_lists(
+        cls, index: ReactionIndex, RL: List[str], RM: List[str], RH: List[str]
+    ) -> "ReactionClasses":
+        return cls(index, index.mask(RL), index.mask(RM), index.mask(RH))
+
+    def ids(self, mask: np.ndarray) -> List[str]:
+        return [self.index.reaction_ids[j] for j in np.flatnonzero(mask)]
+
+    def labels(self) -> np.ndarray:
+        """
+        low, moderate, high or "" per reaction. A reaction in RH is high, even if also
+        in RM or RL.
+        """
+        labels = np.full(len(self.index), "", dtype=object)
+        labels[self.RL] = "low"
+        labels[self.RM] = "moderate"
+        labels[self.RH] = "high"
+        return labels
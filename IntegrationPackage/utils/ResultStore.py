@@ -0,0 +1,218 @@
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils.CreateOutput import (
+    append_solve_status,
+    result_file_name,
+    write_flux_table,
+)
+
+RUN_COLUMNS = ["file", "epsilon", "qL", "qH", "oxygenLevel"]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The parquet result store needs pyarrow: pip install pyarrow"
+        ) from e
+
+
+@dataclass
+class ParquetResultSink:
+    """
+    Collects the flux tables of many runs and writes them in batches as Parquet files,
+    partitioned by method and cell type:
+
+        root/method=<method>/cell_type=<cell type>/part-<pid>-<token>-<n>.parquet
+
+    Rows hold the run parameters (file, epsilon, qL, qH, oxygenLevel), the solution
+    status and MIP gap of the run and the flux table (reaction_id, flux_value,
+    classification, y_f, y_r, c_value). Reaction ids, classification and file are
+    dictionary encoded, fluxes and c values are float32.
+    Needs pyarrow.
+
+    root: Directory of the store
+    results_per_file: Number of runs buffered before they are written
+    """
+
+    root: Path
+    results_per_file: int = 50
+    _runs: List[Tuple[Dict[str, Any], Dict[str, list]]] = field(
+        default_factory=list, init=False
+    )
+    _n_files: int = field(default=0, init=False)
+    _token: str = field(default_factory=lambda: uuid.uuid4().hex[:8], init=False)
+
+    def __post_init__(self):
+        _require_pyarrow()
+        self.root = Path(self.root)
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of runs not yet written
+        """
+        return len(self._runs)
+
+    def add(self, run: Dict[str, Any], table: Dict[str, list]):
+        """
+        Adds one run (see CreateOutput.run_info and CreateOutput.flux_table).
+        Writes the buffered runs once results_per_file are collected.
+        """
+        self._runs.append((run, table))
+        if len(self._runs) >= self.results_per_file:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered runs, one file per method and cell type
+        """
+        partitions = {}
+        for run, table in self._runs:
+            partitions.setdefault((run["method"], run["cell_type"]), []).append(
+                (run, table)
+            )
+        for (method, cell_type), runs in partitions.items():
+            directory = self.root / f"method={method}" / f"cell_type={cell_type}"
+            directory.mkdir(parents=True, exist_ok=True)
+            self._write(directory, runs)
+        self._runs = []
+
+    def _write(self, directory: Path, runs):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        lengths = [len(table["reaction_id"]) for _, table in runs]
+
+        def run_column(name):
+            return [
+                run[name] for (run, _), n in zip(runs, lengths) for _ in range(n)
+            ]
+
+        def table_column(name):
+            return [
+                value
+                for (_, table), n in zip(runs, lengths)
+                for value in table.get(name, [None] * n)
+            ]
+
+        arrow_table = pa.table(
+            {
+                "file": pa.array(run_column("file"), pa.string()).dictionary_encode(),
+                "epsilon": pa.array(run_column("epsilon"), pa.float64()),
+                "qL": pa.array(run_column("qL"), pa.float64()),
+                "qH": pa.array(run_column("qH"), pa.float64()),
+                "oxygenLevel": pa.array(run_column("oxygenLevel"), pa.float64()),
+                "status": pa.array(
+                    run_column("status"), pa.string()
+                ).dictionary_encode(),
+                "gap": pa.array(run_column("gap"), pa.float64()),
+                "reaction_id": pa.array(
+                    table_column("reaction_id"), pa.string()
+                ).dictionary_encode(),
+                "flux_value": pa.array(
+                    np.asarray(table_column("flux_value"), dtype=np.float32)
+                ),
+                "classification": pa.array(
+                    table_column("classification"), pa.string()
+                ).dictionary_encode(),
+                "y_f": _binary_array(table_column("y_f")),
+                "y_r": _binary_array(table_column("y_r")),
+                "c_value": pa.array(table_column("c_value"), pa.float32()),
+            }
+        )
+        # the process id of a finished sweep worker may come again
+        file = directory / f"part-{os.getpid()}-{self._token}-{self._n_files}.parquet"
+        self._n_files += 1
+        pq.write_table(arrow_table, file)
+
+
+def _binary_array(values: list):
+    """
+    Binary variable values as int8, rounded first: solvers return values like
+    0.9999999997 or -2.2e-16, a plain cast would truncate them. None and NaN stay
+    null.
+    """
+    import pyarrow as pa
+
+    values = np.asarray([np.nan if v is None else v for v in values], dtype=float)
+    missing = np.isnan(values)
+    rounded = np.rint(np.where(missing, 0.0, values)).astype(np.int8)
+    return pa.array(rounded, pa.int8(), mask=missing)
+
+
+def read_results(
+    root, method: str, cell_type: str, filters: Optional[list] = None
+) -> pd.DataFrame:
+    """
+    Reads the partition of one method and cell type with memory mapping.
+
+    :param root: Directory of the store
+    :param filters: Optional pyarrow filters, e.g. [("epsilon", "==", 1.0)]
+    :return: DataFrame with the run and flux table columns
+    """
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    directory = Path(root) / f"method={method}" / f"cell_type={cell_type}"
+    return pq.read_table(directory, memory_map=True, filters=filters).to_pandas()
+
+
+def export_tsv(root, output_dir):
+    """
+    Writes the runs of a store in the tsv layout of CreateOutput:
+    output_dir/method/cell_type/epsilon_..._quantiles_..._<file>.tsv, with their
+    status and gap in output_dir/method/solve_status.tsv.
+    Returns the number of written files.
+    """
+    n_files = 0
+    for method_dir in sorted(Path(root).glob("method=*")):
+        method = method_dir.name.split("=", 1)[1]
+        for cell_type_dir in sorted(method_dir.glob("cell_type=*")):
+            cell_type = cell_type_dir.name.split("=", 1)[1]
+            df = read_results(root, method, cell_type)
+            out_dir = Path(output_dir) / method / cell_type
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for run, rows in df.groupby(
+                RUN_COLUMNS, dropna=False, observed=True, sort=False
+            ):
+                file, epsilon, qL, qH, oxygenLevel = (
+                    None if pd.isna(value) else value for value in run
+                )
+                quantiles = (qL, qH) if qL is not None else None
+                table = {
+                    "reaction_id": rows["reaction_id"].astype(str).tolist(),
+                    # float32 values keep their short repr
+                    "flux_value": list(rows["flux_value"].to_numpy()),
+                    "classification": rows["classification"].astype(str).tolist(),
+                    "y_f": _optional_values(rows["y_f"], int),
+                    "y_r": _optional_values(rows["y_r"], int),
+                    "c_value": _optional_values(rows["c_value"], np.float32),
+                }
+                name = result_file_name(epsilon, quantiles, file, oxygenLevel)
+                write_flux_table(out_dir / name, table, method == "weighted_iMAT")
+                # stores written before the status and gap columns have neither
+                status, gap = (
+                    rows[column].iloc[0] if column in rows else None
+                    for column in ("status", "gap")
+                )
+                append_solve_status(
+                    out_dir.parent,
+                    cell_type,
+                    name,
+                    None if pd.isna(status) else str(status),
+                    None if pd.isna(gap) else float(gap),
+                )
+                n_files += 1
+    return n_files
+
+
+def _optional_values(column: pd.Series, dtype) -> list:
+    return [None if np.isnan(v) else dtype(v) for v in column.to_numpy(dtype=float)]
@@ -0,0 +1,191 @@
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import pulp
+from methods.SolverBackend import SolverOptions
+from methods.SparseMILPBuilder import MILPMatrices
+
+# Stages of a run in pipeline order
+STAGES = [
+    "read_model",
+    "read_expression",
+    "discretization",
+    "gpr_mapping",
+    "solution_cache",
+    "build",
+    "update",
+    "precheck",
+    "solve",
+    "output",
+]
+
+
+@dataclass
+class RunProfile:
+    """
+    Stage timers and counters of one run, emitted as one JSON object. A disabled
+    profile only runs the stages, so the pipeline can always pass one.
+
+    enabled: Record timings and counters
+    stages: Seconds per stage, summed if a stage runs several times
+    counters: Problem size (variables, constraints, binaries) and solver statistics
+        (nodes, gap)
+    """
+
+    enabled: bool = True
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, Any] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, **counters):
+        if self.enabled:
+            self.counters.update(counters)
+
+    def count_problem(self, prob):
+        """
+        Number of variables, constraints and binaries of a PuLP problem or
+        MILPMatrices
+        """
+        if not self.enabled:
+            return
+        if isinstance(prob, MILPMatrices):
+            self.count(
+                variables=prob.A.shape[1],
+                constraints=prob.A.shape[0],
+                binaries=int(prob.integrality.sum()),
+            )
+        else:
+            variables = prob.variables()
+            self.count(
+                variables=len(variables),
+                constraints=len(prob.constraints),
+                binaries=sum(var.cat == pulp.LpInteger for var in variables),
+            )
+
+    @contextmanager
+    def solver_log(self, options: SolverOptions) -> Iterator[SolverOptions]:
+        """
+        Options with a temporary cbc log, cbc reports its nodes and gap only there.
+        Other backends and disabled profiles get the options unchanged.
+        """
+        if not self.enabled or options.backend != "cbc" or options.log_path:
+            yield options
+            return
+        fd, log_path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        try:
+            yield dataclasses.replace(options, log_path=log_path)
+        finally:
+            Path(log_path).unlink(missing_ok=True)
+
+    def to_dict(self, **fields) -> Dict[str, Any]:
+        return {
+            **fields,
+            "total": sum(self.stages.values()),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def write(self, target: str, **fields):
+        """
+        Writes the profile as one JSON line, appended to the file target or printed
+        if target is "-"
+
+        :param fields: Further fields of the run, e.g. method and epsilon
+        """
+        if not self.enabled:
+            return
+        line = json.dumps(self.to_dict(**fields), default=str)
+        if target == "-":
+            print(line, file=sys.stdout, flush=True)
+        else:
+            with open(target, "a") as f:
+                f.write(line + "\n")
+
+
+def read_profiles(path) -> List[Dict[str, Any]]:
+    """
+    Profiles of a JSON lines file written by RunProfile.write
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def aggregate_profiles(profiles: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Summary of many run profiles (RunProfile.to_dict), one row per stage and numeric
+    counter: number of runs, total, mean, median, 95th percentile and maximum.
+    Stages also get their share of the summed stage time.
+    """
+    profiles = list(profiles)
+    stages = pd.DataFrame([p["stages"] for p in profiles])
+    counters = pd.DataFrame([p["counters"] for p in profiles])
+    counters = counters.apply(pd.to_numeric, errors="coerce").dropna(axis=1, how="all")
+    # flags like cached count as 0/1, the gap of a solve without solution is infinite
+    counters = counters.astype(float).replace([np.inf, -np.inf], np.nan)
+    order = [s for s in STAGES if s in stages] + [s for s in stages if s not in STAGES]
+    rows = []
+    for kind, table, columns in (
+        ("stage", stages, order),
+        ("counter", counters, list(counters.columns)),
+    ):
+        for name in columns:
+            values = table[name].dropna()
+            rows.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "runs": len(values),
+                    "total": values.sum(),
+                    "mean": values.mean(),
+                    "median": values.median(),
+                    "p95": values.quantile(0.95),
+                    "max": values.max(),
+                }
+            )
+    summary = pd.DataFrame(
+        rows, columns=["kind", "name", "runs", "total", "mean", "median", "p95", "max"]
+    )
+    is_stage = summary["kind"] == "stage"
+    summary["share"] = None
+    summary.loc[is_stage, "share"] = (
+        summary.loc[is_stage, "total"] / summary.loc[is_stage, "total"].sum()
+    )
+    return summary
+
+
+def write_profile_summary(profiles, path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Aggregates the profiles, writes the summary as tsv if path is given and prints
+    the stage table
+    """
+    summary = aggregate_profiles(profiles)
+    if path is not None:
+        summary.to_csv(path, sep="\t", index=False)
+    stages = summary[summary["kind"] == "stage"]
+    print(
+        stages[["name", "runs", "total", "mean", "p95", "share"]].to_string(
+            index=False, float_format=lambda x: f"{x:.3f}"
+        ),
+        flush=True,
+    )
+    return summary
@@ -0,0 +1,80 @@
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional
+
+
+@dataclass
+class SnapshotCache:
+    """
+    Directory of pickled snapshots with a size limit: the least recently used files
+    are removed once the directory is larger than max_size_mb. Subclasses choose the
+    snapshot names and what is stored (see ModelLoader.ModelCache,
+    ExpressionCache.ExpressionCache and SolutionCache.SolutionCache).
+
+    cache_dir: Directory of the snapshots
+    max_size_mb: Size limit of the cache directory in MB
+    """
+
+    cache_dir: Path
+    max_size_mb: float = 1024
+    # files of the cache, counted for the size limit and removed by clear()
+    patterns = ("*.pkl",)
+
+    def __post_init__(self):
+        self.cache_dir = Path(self.cache_dir)
+
+    def _read(self, snapshot: Path) -> Optional[Any]:
+        """
+        Unpickled content of the snapshot, None if it is missing or unreadable (e.g.
+        written by an incompatible version). Marks the snapshot as recently used.
+        """
+        try:
+            with open(snapshot, "rb") as f:
+                content = pickle.load(f)
+            os.utime(snapshot)
+            return content
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def _store(self, snapshot: Path, content: Any):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file first, so that parallel workers never read a
+        # partial snapshot
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, snapshot)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict(keep=snapshot)
+
+    def _files(self) -> List[Path]:
+        return [
+            file for pattern in self.patterns for file in self.cache_dir.glob(pattern)
+        ]
+
+    def evict(self, keep: Optional[Path] = None):
+        """
+        Removes the least recently used files until the cache fits max_size_mb
+        """
+        files = sorted(self._files(), key=lambda p: p.stat().st_mtime)
+        size = sum(p.stat().st_size for p in files)
+        for file in files:
+            if size <= self.max_size_mb * 1e6:
+                break
+            if file == keep:
+                continue
+            size -= file.stat().st_size
+            file.unlink(missing_ok=True)
+
+    def clear(self):
+        """
+        Removes all files of the cache
+        """
+        for file in self._files():
+            file.unlink(missing_ok=True)
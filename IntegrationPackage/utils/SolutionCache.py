@@ -0,0 +1,117 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+import pulp
+from methods.SolverBackend import SolverOptions
+from utils.SnapshotCache import SnapshotCache
+
+# Cache directory, can be set with the environment variable INTEGRATION_SOLUTION_CACHE
+DEFAULT_SOLUTION_CACHE_DIR = Path(
+    os.environ.get(
+        "INTEGRATION_SOLUTION_CACHE",
+        Path.home() / ".cache" / "IntegrationPackage" / "solutions",
+    )
+)
+
+# Decimals of the weighted_iMAT weights in the key
+WEIGHT_DIGITS = 9
+
+
+def solution_key(
+    model_hash: str, solver, options: Optional[SolverOptions] = None
+) -> str:
+    """
+    Fingerprint of an iMAT problem: the model (content hash of the model file), the
+    method, epsilon, the sets RH, RM and RL, the rounded weights of weighted_iMAT
+    and the oxygen level. The problem does not need to be built.
+    The MIP gap is part of the key: a stored "optimal" solution is optimal within
+    the gap of its run, it is not returned for a run with another gap. The time
+    limit is not, only solves that finished within it are stored.
+
+    :param solver: iMAT or weighted_iMAT (BasePulpVarConfig) with its parameters set
+    """
+    weights = solver.weights()
+    if weights is not None:
+        weights = sorted((rid, round(c, WEIGHT_DIGITS)) for rid, c in weights.items())
+    parts = [
+        model_hash,
+        type(solver).__name__,
+        repr(float(solver.epsilon)),
+        repr(None if solver.oxygenLevel is None else float(solver.oxygenLevel)),
+        repr(sorted(solver.RH)),
+        repr(sorted(solver.RM)),
+        repr(sorted(solver.RL)),
+        repr(weights),
+    ]
+    if options is not None:
+        parts.append(repr(options.gap))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+@dataclass
+class SolutionCache(SnapshotCache):
+    """
+    Pickled iMAT results keyed by the problem fingerprint (see solution_key). In a
+    sweep many quantile pairs give the same reaction classes, their problems are
+    solved once. The least recently used results are removed once the cache is larger
+    than max_size_mb. Only optimal solutions and infeasible problems are stored.
+
+    cache_dir: Directory of the results
+    max_size_mb: Size limit of the cache directory in MB
+    """
+
+    cache_dir: Path = DEFAULT_SOLUTION_CACHE_DIR
+    max_size_mb: float = 512
+
+    def snapshot_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key[:48]}.pkl"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored result: dict with status ("Optimal" or "Infeasible"), fluxes,
+        y_values, c_values, gap and reason (check that found the infeasibility).
+        None if the key is not in the cache.
+        """
+        return self._read(self.snapshot_path(key))
+
+    def put_solution(
+        self,
+        key: str,
+        status: int,
+        fluxes,
+        y_values,
+        c_values=None,
+        solution_status: str = "optimal",
+        gap: Optional[float] = None,
+    ):
+        """
+        Stores an optimal solution. A solution stopped by the time or node limit
+        (solution_status feasible) is not stored.
+        """
+        if status == pulp.LpStatusOptimal and solution_status == "optimal":
+            self._store(
+                self.snapshot_path(key),
+                {
+                    "status": pulp.LpStatus[status],
+                    "fluxes": fluxes,
+                    "y_values": y_values,
+                    "c_values": c_values,
+                    "gap": gap,
+                    "reason": None,
+                },
+            )
+
+    def put_infeasible(self, key: str, reason: str = "MILP"):
+        self._store(
+            self.snapshot_path(key),
+            {
+                "status": "Infeasible",
+                "fluxes": {},
+                "y_values": {},
+                "c_values": None,
+                "gap": None,
+                "reason": reason,
+            },
+        )
@@ -0,0 +1,104 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Set, Tuple
+
+
+@dataclass
+class SweepManifest:
+    """
+    Append-only record of the finished tasks of a sweep. Each line holds the task key
+    (file, column, method, epsilon, qL, qH, oxygenLevel), the status (optimal,
+    feasible if stopped by the time or node limit, timeout if stopped without solution,
+    or infeasible), the solve time and the MIP gap. A restarted sweep skips the
+    recorded keys. Manifests written before the gap column are extended without it.
+    Lines are appended with a single write, so several worker processes can record
+    into the same manifest.
+
+    path: Path to the manifest file (tsv)
+    """
+
+    path: Path
+    header = (
+        "file",
+        "column",
+        "method",
+        "epsilon",
+        "qL",
+        "qH",
+        "oxygenLevel",
+        "status",
+        "seconds",
+        "gap",
+    )
+    _completed: Optional[Set[Tuple[str, ...]]] = field(default=None, init=False)
+    _n_columns: int = field(default=len(header), init=False)
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        if not self.path.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._append("\t".join(self.header) + "\n")
+        else:
+            with open(self.path) as f:
+                self._n_columns = len(f.readline().rstrip("\n").split("\t"))
+
+    @staticmethod
+    def key(file, column, method, epsilon, quantiles, oxygenLevel) -> Tuple[str, ...]:
+        """
+        Task key as written to the manifest, None is written as empty field
+        """
+        qL, qH = quantiles if quantiles is not None else (None, None)
+        return tuple(
+            "" if value is None else str(value)
+            for value in (file, column, method, epsilon, qL, qH, oxygenLevel)
+        )
+
+    def _read(self) -> Set[Tuple[str, ...]]:
+        completed = set()
+        with open(self.path) as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                # skips the header and a line cut off by a crash
+                if len(fields) != self._n_columns or fields[0] == self.header[0]:
+                    continue
+                completed.add(tuple(fields[:7]))
+        return completed
+
+    @property
+    def completed(self) -> Set[Tuple[str, ...]]:
+        """
+        Keys of the finished tasks, read from the file on first access
+        """
+        if self._completed is None:
+            self._completed = self._read()
+        return self._completed
+
+    def __contains__(self, key) -> bool:
+        return key in self.completed
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    def _append(self, line: str):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def record(
+        self,
+        key: Tuple[str, ...],
+        status: str,
+        seconds: float,
+        gap: Optional[float] = None,
+    ):
+        """
+        Appends a finished task and writes it to disk
+        """
+        fields = [*key, status, f"{seconds:.3f}", "" if gap is None else f"{gap:.6g}"]
+        self._append("\t".join(fields[: self._n_columns]) + "\n")
+        if self._completed is not None:
+            self._completed.add(key)
@@ -0,0 +1,138 @@
+import math
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# More threads per solve hardly speed up cbc and highs
+MAX_THREADS = 8
+
+# Median solve time in seconds from which solves get threads instead of workers
+THREADED_SOLVE_SECONDS = 10.0
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _own_cgroups(proc_cgroup: Path) -> Tuple[str, str]:
+    """
+    Paths of the cgroup of the process in the v2 hierarchy and in the v1 cpu
+    hierarchy, from lines like 0::/path and 4:cpu,cpuacct:/path. "/" if not listed.
+    """
+    v2 = v1_cpu = "/"
+    for line in (_read(proc_cgroup) or "").splitlines():
+        hierarchy, _, rest = line.partition(":")
+        controllers, _, path = rest.partition(":")
+        if hierarchy == "0" and controllers == "":
+            v2 = path
+        elif "cpu" in controllers.split(","):
+            v1_cpu = path
+    return v2, v1_cpu
+
+
+def _hierarchy(mount: Path, cgroup: str) -> List[Path]:
+    """
+    Directory of the cgroup below the mount and of all its parents up to the mount.
+    Only the mount is returned if the cgroup directory is not visible (e.g. the host
+    path of a container without cgroup namespace).
+    """
+    parts = Path(cgroup).parts[1:]
+    if not (mount.joinpath(*parts)).is_dir():
+        return [mount]
+    return [mount.joinpath(*parts[:i]) for i in range(len(parts), -1, -1)]
+
+
+def _quota(quota: Optional[str], period: Optional[str]) -> Optional[float]:
+    if quota is None or period is None or quota == "max" or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def cgroup_cpu_limit(
+    root: Path = Path("/sys/fs/cgroup"), proc_cgroup: Path = Path("/proc/self/cgroup")
+) -> Optional[float]:
+    """
+    CPU quota of the cgroup of the process in cores, None without quota. The cgroup
+    is taken from proc_cgroup, the tightest quota of it and its parents counts
+    (cgroup v2 cpu.max, v1 cpu.cfs_quota_us / cpu.cfs_period_us), so that limits of
+    e.g. a Slurm job step, a systemd slice or a nested container are found.
+    """
+    v2, v1_cpu = _own_cgroups(proc_cgroup)
+    limits = []
+    if (root / "cgroup.controllers").exists():
+        for directory in _hierarchy(root, v2):
+            quota, _, period = (_read(directory / "cpu.max") or "").partition(" ")
+            limits.append(_quota(quota or None, period or None))
+    else:
+        for directory in _hierarchy(root / "cpu", v1_cpu):
+            limits.append(
+                _quota(
+                    _read(directory / "cpu.cfs_quota_us"),
+                    _read(directory / "cpu.cfs_period_us"),
+                )
+            )
+    limits = [limit for limit in limits if limit is not None]
+    return min(limits) if limits else None
+
+
+def available_cores() -> List[int]:
+    """
+    Ids of the cores the process may run on (CPU affinity), cut to the cgroup CPU
+    quota (rounded up, at least one core)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cores = cores[: max(1, math.ceil(limit))]
+    return cores
+
+
+def split_cores(
+    n_cores: int,
+    n_jobs: int,
+    long_solves: bool = False,
+    max_threads: int = MAX_THREADS,
+) -> Tuple[int, int]:
+    """
+    Splits the cores into worker processes and solver threads per worker, so that
+    workers x threads <= n_cores. Short solves get one worker per core (as far as
+    there are jobs), long solves get up to max_threads threads. Cores not needed by
+    the workers go to their threads.
+
+    :param n_jobs: Number of jobs (pool chunks) that can run in parallel
+    :return: (workers, threads)
+    """
+    n_cores = max(1, n_cores)
+    n_jobs = max(1, n_jobs)
+    if long_solves:
+        workers = max(1, n_cores // min(max_threads, n_cores))
+    else:
+        workers = n_cores
+    workers = min(workers, n_jobs)
+    threads = max(1, min(max_threads, n_cores // workers))
+    return workers, threads
+
+
+def core_slots(cores: List[int], workers: int) -> List[List[int]]:
+    """
+    Splits the cores into workers disjoint consecutive slots of equal size
+    """
+    size = max(1, len(cores) // workers)
+    return [cores[i * size : (i + 1) * size] or cores for i in range(workers)]
+
+
+def pin_process(cores: List[int]) -> bool:
+    """
+    Restricts the process to the cores. Returns False where the platform has no CPU
+    affinity.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, cores)
+    return True
@@ -1,45 +1,86 @@
+from typing import List, Optional, Union
 import pandas as pd
 
+# Gene id prefixes of the supported species
+SPECIES_PREFIXES = ("MXAN", "ENSG")
 
-def generate_RNASeqDf(metabolicModel, expression_df, geneColName, expressionColName):
+
+def map_gene_ids(
+    gene_ids: pd.Series, model_genes: pd.Index, id_map: pd.DataFrame
+) -> pd.Series:
+    """
+    Translates gene ids to model gene ids through an id mapping table, e.g. the
+    orgdb_old_MXAN, Gene_name and GeneID columns of the DE files. Every column of
+    id_map is one id type, a row links the ids of one gene. The ids are translated to
+    the column with the most model genes, ids found in no column are NaN.
+
+    :param gene_ids: Gene ids of the expression data, in any column of id_map
+    :param model_genes: Gene ids of the model
+    """
+    model_col = max(id_map.columns, key=lambda col: id_map[col].isin(model_genes).sum())
+    target = id_map[model_col]
+    translation = pd.concat(
+        [pd.Series(target.to_numpy(), index=id_map[col].to_numpy()) for col in id_map]
+    )
+    translation = translation[translation.isin(model_genes) & translation.index.notna()]
+    translation = translation[~translation.index.duplicated()]
+    return gene_ids.map(translation)
+
+
+def generate_RNASeqDf(
+    metabolicModel,
+    expression_df,
+    geneColName,
+    expressionColName: Union[str, List[str]],
+    id_map: Optional[pd.DataFrame] = None,
+):
     """
     Generates a processed RNA-seq Dataframe aligned with the metabolic Model. Additionally,
     genes present in the metabolicModel but not in the expression_df are added as new rows with NaN
-    entries.
+    entries. The input dataframe is not changed.
 
     :param metabolicModel: cobra.core.Model
     :param expression_df: pandas.df
         dataframe created from input file
     :param geneColName: str
         Column name containing gene IDs
-    :param expressionColName: str
-        Column name containing expression values
-    :param ignore_human: bool, optional
+    :param expressionColName: str or list of str
+        Column name(s) containing expression values, all are aligned at once
+    :param id_map: pandas.df, optional
+        Id mapping table for gene IDs that differ from the model (see map_gene_ids)
 
     Returns
     -------
     RNASeqData : pandas.DataFrame
-    DataFrame indexed by gene IDs, containing a single column of expression values,
-    with NaN entries for genes present in the model but missing in the data file.
+    DataFrame indexed by gene IDs, containing the expression columns, with NaN
+    entries for genes present in the model but missing in the data file.
     """
-    expression_df.set_index(geneColName, inplace=True)
-    if expression_df.index[0].startswith("MXAN"):
-        species_prefix = "MXAN"
+    columns = (
+        [expressionColName]
+        if isinstance(expressionColName, str)
+        else list(expressionColName)
+    )
+    model_genes = pd.Index([g.id for g in metabolicModel.genes])
+    gene_ids = expression_df[geneColName]
+    if id_map is not None:
+        gene_ids = map_gene_ids(gene_ids, model_genes, id_map)
+
+    # first row per gene, rows without gene id are dropped
+    keep = gene_ids.notna() & ~gene_ids.duplicated()
+    data = expression_df.loc[keep, columns].set_axis(gene_ids[keep].astype(str))
+    if data.empty:
+        raise ValueError(f"No gene IDs in column {geneColName}")
 
-    elif expression_df.index[0].startswith("MXAN"):
-        species_prefix = "ENSG"
-    else:
+    species_prefix = next(
+        (p for p in SPECIES_PREFIXES if data.index[0].startswith(p)), None
+    )
+    if species_prefix is None:
         raise SyntaxError(
             "Verify gene ids in gene expressions. Only human or mice gene IDs allowed."
         )
 
-    genes = []
-    missingGenes = []
-    for g in metabolicModel.genes:
-        if not g.id.startswith(species_prefix):
-            continue
-        (genes if g.id in expression_df.index else missingGenes).append(g.id)
-    expression_df = expression_df.loc[genes, [expressionColName]]
-    new_entries = pd.DataFrame(index=missingGenes, columns=[expressionColName])
-    expression_df = pd.concat([expression_df, new_entries])
-    return expression_df
+    # present genes first, then the missing ones, both in model order
+    genes = model_genes[model_genes.str.startswith(species_prefix)]
+    present = genes.isin(data.index)
+    genes = genes[present].append(genes[~present])
+    return data.reindex(genes).astype(float)
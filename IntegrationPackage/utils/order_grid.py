@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def _features(points):
+    """
+    Maps (epsilon, quantiles) points to comparable coordinates:
+    log10(epsilon) per 4 decades, and the quantiles as fractions.
+    Mean discretization (quantiles None) is placed at (0, 0).
+    """
+    return np.array(
+        [
+            [np.log10(epsilon) / 4, *(np.asarray(quantiles or (0, 0)) / 100)]
+            for epsilon, quantiles in points
+        ],
+        dtype=float,
+    ).reshape(len(points), 3)
+
+
+def order_grid(points):
+    """
+    Orders sweep points as a nearest-neighbour path, so consecutive solves differ as
+    little as possible and can be warm-started from each other.
+
+    :param points: List of (epsilon, quantiles) tuples
+    :return: List of the same points in solve order
+    """
+    if len(points) == 0:
+        return []
+    X = _features(points)
+    # start at the smallest epsilon and quantiles
+    current = int(np.lexsort(X.T[::-1])[0])
+    remaining = np.ones(len(points), dtype=bool)
+    order = []
+    for _ in range(len(points)):
+        order.append(current)
+        remaining[current] = False
+        if not remaining.any():
+            break
+        dist = np.linalg.norm(X - X[current], axis=1)
+        dist[~remaining] = np.inf
+        current = int(np.argmin(dist))
+    return [points[i] for i in order]
+
+
+def nearest_point(point, solved):
+    """
+    Returns the already solved point closest to point, or None.
+
+    :param point: (epsilon, quantiles) tuple
+    :param solved: List of solved (epsilon, quantiles) tuples
+    """
+    if len(solved) == 0:
+        return None
+    dist = np.linalg.norm(_features(solved) - _features([point]), axis=1)
+    return solved[int(np.argmin(dist))]
@@ -1,9 +1,88 @@
+import csv
+import re
+from typing import Iterable, List, Optional, Tuple
 import pandas as pd
 
+# Bytes read to detect the separator and the decimal mark
+SNIFF_SIZE = 64 * 1024
 
-def read_expression_file(path):
-    if path.endswith(".tsv"):
-        df = pd.read_csv(path, sep="\t")
-    else:
-        df = pd.read_csv(path)
-    return df
+
+def sniff_format(path, sample_size: int = SNIFF_SIZE) -> Tuple[str, str]:
+    """
+    Detects the column separator (tab, comma, semicolon or |) and the decimal mark of
+    a delimited text file. Files with another separator than comma may use decimal
+    commas, e.g. the DESeq2 tables in data/RNA_seq_DE_result (31513,7395;2,708).
+    Falls back to the file extension (.tsv: tab, else comma) if the sample is not
+    conclusive.
+
+    :return: (sep, decimal)
+    """
+    with open(path, newline="") as f:
+        sample = f.read(sample_size)
+    # only complete lines
+    if len(sample) == sample_size and "\n" in sample:
+        sample = sample[: sample.rindex("\n")]
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters="\t,;|").delimiter
+    except csv.Error:
+        sep = "\t" if str(path).endswith(".tsv") else ","
+
+    decimal = "."
+    if sep != ",":
+        s = re.escape(sep)
+        decimal_comma = re.compile(
+            rf'(?:^|{s})"?-?\d+,\d+(?:[eE][-+]?\d+)?"?(?={s}|\r?$)', re.MULTILINE
+        )
+        if decimal_comma.search(sample):
+            decimal = ","
+    return sep, decimal
+
+
+def read_expression_file(
+    path,
+    geneColName: Optional[str] = None,
+    expressionColNames: Optional[List[str]] = None,
+    idColNames: Optional[List[str]] = None,
+    genes: Optional[Iterable[str]] = None,
+    chunksize: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Reads an expression table with sniffed separator and decimal mark (see
+    sniff_format).
+
+    :param geneColName: Column with the gene ids, read as str
+    :param expressionColNames: Expression columns to read as float, with geneColName
+        only these columns are read. Default all columns.
+    :param idColNames: Further gene id columns to read as str
+    :param genes: Optional gene ids, other rows are dropped while reading (needs
+        geneColName)
+    :param chunksize: Rows per chunk, large multi-sample tables are read in chunks
+        of which only the rows of genes are kept
+    """
+    sep, decimal = sniff_format(path)
+    usecols, dtype = None, None
+    if geneColName is not None:
+        idColNames = list(idColNames or [])
+        dtype = dict.fromkeys([geneColName] + idColNames, str)
+        if expressionColNames is not None:
+            usecols = [geneColName] + idColNames + list(expressionColNames)
+            dtype.update(dict.fromkeys(expressionColNames, float))
+    elif genes is not None:
+        raise ValueError("Filtering by genes needs the geneColName")
+
+    reader = pd.read_csv(
+        path,
+        sep=sep,
+        decimal=decimal,
+        usecols=usecols,
+        dtype=dtype,
+        chunksize=chunksize,
+    )
+    if chunksize is None:
+        reader = [reader]
+    keep = set(genes) if genes is not None else None
+    chunks = [
+        chunk if keep is None else chunk[chunk[geneColName].isin(keep)]
+        for chunk in reader
+    ]
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
@@ -0,0 +1,33 @@
+from cobra import Model
+import numpy as np
+import optlang
+from optlang.interface import OPTIMAL
+
+# optlang versions whose glpk interface has the private _run_glp_simplex used below
+# (checked against optlang 1.9), other versions take the public slim_optimize
+GLPK_SIMPLEX_OPTLANG_VERSIONS = ("1.9.",)
+
+
+def _glpk_simplex(solver) -> bool:
+    return optlang.__version__.startswith(GLPK_SIMPLEX_OPTLANG_VERSIONS) and hasattr(
+        solver, "_run_glp_simplex"
+    )
+
+
+def solve_from_basis(model: Model) -> bool:
+    """
+    Solves the LP of the model from its current basis, returns True if it is optimal.
+    glpk problems are not scaled again: optlang scales the (unchanged) matrix before
+    every solve, which takes as long as a warm started simplex on genome-scale
+    models (DynamicFVA is about 2x slower through slim_optimize). This calls the
+    private glpk simplex of optlang, so it is only done for the optlang versions in
+    GLPK_SIMPLEX_OPTLANG_VERSIONS. Other versions and solvers go through
+    slim_optimize.
+    """
+    solver = model.solver
+    if _glpk_simplex(solver):
+        solver.update()
+        if solver._run_glp_simplex() == OPTIMAL:
+            return True
+    model.slim_optimize(error_value=np.nan)
+    return model.solver.status == OPTIMAL
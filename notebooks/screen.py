@@ -1,3 +1,4 @@
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -7,12 +8,14 @@ from cobra.io import read_sbml_model, write_sbml_model
 from cobra.flux_analysis import flux_variability_analysis
 from tqdm import tqdm
 
-from imatpy.model_utils import read_model
 from imatpy.parse_gpr import gene_to_rxn_weights
 from imatpy.imat import imat
 
-# Read in the model
-M_xanthus = read_model("../M_xanthus_model.sbml")
+sys.path.insert(0, "../IntegrationPackage")
+from utils.ModelLoader import load_model
+
+# Read in the model (parsed once, then loaded from the model cache)
+M_xanthus = load_model("../M_xanthus_model.sbml")
 
 # Set the solver to glpk
 Configuration().solver = "glpk"